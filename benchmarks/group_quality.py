@@ -0,0 +1,167 @@
+"""Benchmark the quality and cost of building raid groups.
+
+Builds groups for seeded synthetic rosters shaped like Project 1999 raids:
+the usual class spread, levels 50 to 60 (mostly 60), and level 60 shamans
+and magicians for the torpor and CotH slots. Each roster size is built once
+per seed with each strategy, and the final score, the variance of the score
+across seeds, group score evaluations per second, wall time and peak memory
+are reported.
+
+With --output, the results are also written as JSON, and with --baseline
+they are compared against an earlier run's JSON, to catch a change that
+makes groups worse or building them slower.
+
+Run from the repository root:
+
+    python -m benchmarks.group_quality --sizes 18 36 54 72 --output new.json
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+
+from benchmarks import group_solvers
+from ninjalooter import constants
+from ninjalooter import models
+from ninjalooter import raidgroups
+
+# Roughly the class spread of a Project 1999 raid
+CLASS_WEIGHTS = {
+    constants.WARRIOR: 9, constants.PALADIN: 4, constants.SHADOW_KNIGHT: 4,
+    constants.CLERIC: 10, constants.DRUID: 5, constants.SHAMAN: 5,
+    constants.BARD: 4, constants.ENCHANTER: 5, constants.MONK: 5,
+    constants.MAGICIAN: 4, constants.WIZARD: 6, constants.NECROMANCER: 4,
+    constants.RANGER: 4, constants.ROGUE: 6,
+}
+# Chance of each level, from 50 to 60
+LEVEL_WEIGHTS = (1, 1, 1, 1, 1, 2, 2, 3, 4, 6, 40)
+# At least this many of each are level 60, with torpor or CotH
+MIN_TORP_SHAMANS = 2
+MIN_COTH_MAGICIANS = 1
+
+
+def build_roster(size, seed):
+    rng = random.Random(seed)
+    classes = rng.choices(list(CLASS_WEIGHTS), list(CLASS_WEIGHTS.values()),
+                          k=size)
+    levels = rng.choices(range(50, 61), LEVEL_WEIGHTS, k=size)
+    players = [models.Player("Raider%d" % number, pclass, level, "Venerate")
+               for number, (pclass, level) in enumerate(zip(classes, levels))]
+    for pclass, count in ((constants.SHAMAN, MIN_TORP_SHAMANS),
+                          (constants.MAGICIAN, MIN_COTH_MAGICIANS)):
+        have = sum(1 for player in players
+                   if player.pclass == pclass and player.level == 60)
+        spare = [player for player in players
+                 if player.pclass not in (constants.SHAMAN,
+                                          constants.MAGICIAN)]
+        for player in rng.sample(spare, min(max(count - have, 0),
+                                            len(spare))):
+            player.pclass = pclass
+            player.level = 60
+    return players
+
+
+class CountingGroupBuilder(raidgroups.GroupBuilder):
+    """GroupBuilder that counts how many groups it scores."""
+
+    def __init__(self, rng=None):
+        super().__init__(rng=rng)
+        self.evaluations = 0
+
+    def score_group(self, group_type, members) -> int:
+        self.evaluations += 1
+        return super().score_group(group_type, members)
+
+
+def run(strategy, players, seed, args):
+    builder = CountingGroupBuilder(rng=random.Random(seed))
+    start = time.perf_counter()
+    score = strategy(builder, list(players), args)
+    elapsed = time.perf_counter() - start
+
+    # measured separately, as tracing slows everything down
+    tracemalloc.start()
+    strategy(CountingGroupBuilder(rng=random.Random(seed)), list(players),
+             args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dict(seed=seed, score=score, wall_time=elapsed,
+                evaluations=builder.evaluations, peak_memory=peak)
+
+
+def summarize(size, name, runs):
+    scores = [result["score"] for result in runs]
+    wall_time = sum(result["wall_time"] for result in runs)
+    return dict(
+        size=size, strategy=name, runs=runs,
+        mean_score=statistics.mean(scores),
+        score_variance=statistics.pvariance(scores),
+        evaluations_per_second=(
+            sum(result["evaluations"] for result in runs) / wall_time
+            if wall_time else 0),
+        wall_time=wall_time / len(runs),
+        peak_memory=max(result["peak_memory"] for result in runs))
+
+
+def compare(results, baseline):
+    old = {(result["size"], result["strategy"]): result
+           for result in baseline["results"]}
+    for result in results:
+        before = old.get((result["size"], result["strategy"]))
+        if before is None:
+            continue
+        print("%3d players  %-14s score %+8.1f  time %+6.1f%%  "
+              "memory %+6.1f%%" % (
+                  result["size"], result["strategy"],
+                  result["mean_score"] - before["mean_score"],
+                  100 * (result["wall_time"] / before["wall_time"] - 1),
+                  100 * (result["peak_memory"] / before["peak_memory"] - 1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[18, 36, 54, 72])
+    parser.add_argument("--seeds", type=int, nargs="+",
+                        default=[1, 2, 3, 4, 5])
+    parser.add_argument("--roster-seed", type=int, default=1)
+    parser.add_argument("--strategies", nargs="+",
+                        default=[name for name, _ in group_solvers.STRATEGIES],
+                        choices=[name for name, _ in group_solvers.STRATEGIES])
+    parser.add_argument("--polish-moves", type=int, default=2000)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    args = parser.parse_args()
+
+    strategies = dict(group_solvers.STRATEGIES)
+    results = []
+    print("players  strategy        score   variance   evals/s    time  "
+          "peak memory")
+    for size in args.sizes:
+        players = build_roster(size, args.roster_seed)
+        for name in args.strategies:
+            result = summarize(size, name, [
+                run(strategies[name], players, seed, args)
+                for seed in args.seeds])
+            results.append(result)
+            print("%7d  %-14s %6.1f %10.1f %9.0f %6.3fs %9.1f KiB" % (
+                size, name, result["mean_score"], result["score_variance"],
+                result["evaluations_per_second"], result["wall_time"],
+                result["peak_memory"] / 1024))
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(dict(python=platform.python_version(),
+                           roster_seed=args.roster_seed, seeds=args.seeds,
+                           polish_moves=args.polish_moves, results=results),
+                      output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            compare(results, json.load(baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark the greedy raid group solver against annealing.
+
+Builds groups for synthetic raids of 6 to 72 players with each strategy:
+annealing (GroupBuilder.build_groups), filling the template slots by
+assignment (build_groups_greedy), and the same followed by a short annealing
+polish. Scores and times are averaged over the seeds.
+
+Run from the repository root:
+
+    python -m benchmarks.group_solvers --sizes 6 12 18 24 36 48 54 72
+"""
+import argparse
+import random
+import time
+
+from benchmarks.raidgroups import build_raid
+from ninjalooter import raidgroups
+
+
+def anneal(builder, players, args):
+    return builder.build_groups(players)
+
+
+def greedy(builder, players, args):
+    return builder.build_groups_greedy(players)
+
+
+def polished(builder, players, args):
+    return builder.build_groups_greedy(players,
+                                       polish_moves=args.polish_moves)
+
+
+STRATEGIES = (("anneal", anneal), ("greedy", greedy),
+              ("greedy+polish", polished))
+
+
+def run(strategy, players, seed, args):
+    builder = raidgroups.GroupBuilder(rng=random.Random(seed))
+    start = time.perf_counter()
+    score = strategy(builder, list(players), args)
+    return time.perf_counter() - start, score
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[6, 12, 18, 24, 36, 48, 54, 72])
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--polish-moves", type=int, default=2000)
+    args = parser.parse_args()
+
+    print("players  " + "  ".join("%-22s" % name for name, _ in STRATEGIES))
+    for size in args.sizes:
+        cells = []
+        for _, strategy in STRATEGIES:
+            runs = [run(strategy, build_raid(size, seed), seed, args)
+                    for seed in args.seeds]
+            cells.append("%8.1f in %8.4fs" % (
+                sum(score for _, score in runs) / len(runs),
+                sum(elapsed for elapsed, _ in runs) / len(runs)))
+        print("%7d  %s" % (size, "  ".join("%-22s" % c for c in cells)))
+
+
+if __name__ == "__main__":
+    main()
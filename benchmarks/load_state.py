@@ -0,0 +1,151 @@
+"""Benchmark decoding and loading a large state file.
+
+Generates a synthetic state.json of roughly `--size-mb` megabytes, modelled
+on a long run of raid nights that were never cleared, then times:
+
+ * json.load with the old recursive decoder (dateutil, getattr lookups)
+ * json.load with utils.JSONDecoder
+ * the full utils.load_state
+
+Run from the repository root:
+
+    python -m benchmarks.load_state --size-mb 50
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import tempfile
+import time
+
+import dateutil.parser
+
+from ninjalooter import config
+from ninjalooter import models
+from ninjalooter import utils
+
+CLASSES = ("Warrior", "Cleric", "Bard", "Magician", "Wizard", "Monk",
+           "Shaman", "Enchanter", "Rogue", "Necromancer", "Druid")
+GUILDS = ("Venerate", "Castle", "Black Lotus", "Kingdom", None)
+
+
+class LegacyJSONDecoder(json.JSONDecoder):
+    """The decoder as it was before state schema version 2."""
+
+    def __init__(self, *args, **kwargs):
+        json.JSONDecoder.__init__(
+            self, object_hook=self.object_hook, *args, **kwargs)
+
+    def object_hook(self, obj):  # pylint: disable=method-hidden
+        if isinstance(obj, dict):
+            if 'json_type' in obj:
+                json_type = obj.pop('json_type')
+                model_type = getattr(models, json_type)
+                if model_type and issubclass(model_type, models.DictEquals):
+                    # WhoLog.from_json used to parse times with dateutil
+                    if model_type is models.WhoLog:
+                        obj['time'] = dateutil.parser.parse(obj['time'])
+                        return model_type(**obj)
+                    return model_type.from_json(**obj)
+        if isinstance(obj, dict):
+            for key in list(obj):
+                obj[key] = self.object_hook(obj[key])
+        return obj
+
+
+def build_night(rng, night, roster):
+    start = datetime.datetime(2020, 1, 1, 20) + datetime.timedelta(
+        days=night)
+    attendance = []
+    for tick in range(12):
+        players = rng.sample(roster, 70)
+        attendance.append(models.WhoLog(
+            start + datetime.timedelta(minutes=30 * tick),
+            {player.name: player for player in players},
+            raidtick=True, zone="Plane of Sky"))
+    auctions = {}
+    for number in range(60):
+        item = models.ItemDrop(
+            "Item %d" % rng.randrange(2000), rng.choice(roster).name,
+            (start + datetime.timedelta(minutes=number)).strftime(
+                "%a %b %d %H:%M:%S %Y"))
+        auction = models.DKPAuction(
+            item, "VCR", start_time=start.isoformat(), min_dkp=1)
+        for bid in range(1, rng.randrange(2, 10)):
+            auction.bids[float(bid * 5)] = rng.choice(roster).name
+        auctions[item.uuid] = auction
+    kills = [models.KillTimer(
+        (start + datetime.timedelta(minutes=kill)).strftime(
+            "%a %b %d %H:%M:%S %Y"), "a mob %d" % kill)
+        for kill in range(40)]
+    gratss = [models.GratssLog(
+        start.strftime("%a %b %d %H:%M:%S %Y"), rng.choice(roster).name,
+        "Gratss someone on an item for 10 DKP!", "raw gratss line")
+        for _ in range(30)]
+    return attendance, auctions, kills, gratss
+
+
+def build_state(size_mb, seed=1):
+    rng = random.Random(seed)
+    roster = [models.Player("Player%d" % number, rng.choice(CLASSES),
+                            rng.randrange(50, 61), rng.choice(GUILDS))
+              for number in range(400)]
+    config.PLAYER_DB = {player.name: player for player in roster}
+    config.ATTENDANCE_LOGS = []
+    config.HISTORICAL_AUCTIONS = {}
+    config.KILL_TIMERS = []
+    config.GRATSS_LOG = []
+    night = 0
+    while True:
+        attendance, auctions, kills, gratss = build_night(rng, night, roster)
+        config.ATTENDANCE_LOGS.extend(attendance)
+        config.HISTORICAL_AUCTIONS.update(auctions)
+        config.KILL_TIMERS.extend(kills)
+        config.GRATSS_LOG.extend(gratss)
+        night += 1
+        # Checking the size is expensive, so only do it now and then
+        if night % 100 == 0:
+            size = len(utils.serialize_state())
+            if size >= size_mb * 1024 * 1024:
+                return night, size
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    config.JOURNAL_ENABLED = False
+    nights, size = build_state(args.size_mb)
+    with tempfile.TemporaryDirectory() as tempdir:
+        state_file = os.path.join(tempdir, "state.json")
+        with open(state_file, 'w') as ssfp:
+            ssfp.write(utils.serialize_state())
+        print("State file: %.1f MB (%d raid nights)" %
+              (size / 1024 / 1024, nights))
+
+        def load_with(decoder):
+            with open(state_file, 'r') as ssfp:
+                json.load(ssfp, cls=decoder)
+
+        results = {
+            "json.load, legacy decoder": lambda: load_with(LegacyJSONDecoder),
+            "json.load, JSONDecoder": lambda: load_with(utils.JSONDecoder),
+            "utils.load_state": lambda: utils.load_state(state_file),
+        }
+        for name, func in results.items():
+            best = min(timed(func) for _ in range(args.repeat))
+            print("%-28s %8.2fs  %6.1f MB/s" %
+                  (name, best, size / 1024 / 1024 / best))
+
+
+if __name__ == "__main__":
+    main()
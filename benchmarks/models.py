@@ -0,0 +1,159 @@
+"""Benchmark memory and speed of the state models.
+
+Builds a 5,000 player PLAYER_DB and a season of attendance from the old
+__dict__ based models, the slotted models with a copy of each player in
+every tick, and the slotted models with interned player snapshots shared
+between ticks (as the /who handlers now make them), then compares:
+
+ * memory allocated to hold them (tracemalloc)
+ * time to copy.copy every player snapshot
+ * time to compare every snapshot with its PLAYER_DB entry
+ * time to to_json every snapshot
+
+Run from the repository root:
+
+    python -m benchmarks.models --players 5000 --nights 40
+"""
+import argparse
+import copy
+import datetime
+import gc
+import random
+import time
+import tracemalloc
+
+from ninjalooter import models
+
+CLASSES = ("Warrior", "Cleric", "Bard", "Magician", "Wizard", "Monk",
+           "Shaman", "Enchanter", "Rogue", "Necromancer", "Druid")
+GUILDS = ("Venerate", "Castle", "Black Lotus", "Kingdom", None)
+
+
+class LegacyDictEquals:
+    """DictEquals as it was before models declared their fields."""
+
+    def __eq__(self, other):
+        if not isinstance(other, self.__class__):
+            return False
+        self_dict = {key: self.__dict__[key] for key in self.__dict__
+                     if not key.startswith("_")}
+        other_dict = {key: other.__dict__[key] for key in other.__dict__
+                      if not key.startswith("_")}
+        return self_dict == other_dict
+
+    def to_json(self):
+        json_dict = {key: self.__dict__[key] for key in self.__dict__
+                     if not key.startswith("_")}
+        return {
+            'json_type': self.__class__.__name__,
+            **json_dict
+        }
+
+
+class LegacyPlayer(LegacyDictEquals):
+    name = None
+    pclass = None
+    level = None
+    guild = None
+
+    def __init__(self, name, pclass=None, level=None, guild=""):
+        self.name = name
+        self.pclass = pclass
+        try:
+            self.level = int(level)
+        except (ValueError, TypeError):
+            self.level = 0
+        self.guild = guild
+
+
+class LegacyWhoLog(LegacyDictEquals):
+    time = None
+    log = None
+    raidtick = False
+    tick_name = None
+    zone = None
+
+    def __init__(self, time, log, raidtick=False, tick_name=None, zone=None):
+        self.time = time
+        self.log = log
+        self.raidtick = raidtick
+        self.tick_name = tick_name
+        self.zone = zone
+
+
+def build(player_type, who_log_type, snapshot, players, nights, seed=1):
+    rng = random.Random(seed)
+    player_db = {}
+    for number in range(players):
+        name = "Player%d" % number
+        player_db[name] = player_type(
+            name, rng.choice(CLASSES), rng.randrange(50, 61),
+            rng.choice(GUILDS))
+    names = list(player_db)
+    attendance = []
+    start = datetime.datetime(2020, 1, 1, 20)
+    for night in range(nights):
+        raid = rng.sample(names, 70)
+        for tick in range(12):
+            tick_time = start + datetime.timedelta(days=night,
+                                                   minutes=30 * tick)
+            attendance.append(who_log_type(
+                tick_time,
+                {name: snapshot(player_db[name]) for name in raid},
+                raidtick=True))
+    return player_db, attendance
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def measure(label, player_type, who_log_type, snapshot, args):
+    gc.collect()
+    tracemalloc.start()
+    player_db, attendance = build(player_type, who_log_type, snapshot,
+                                  args.players, args.nights)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    snapshots = [player for who_log in attendance
+                 for player in who_log.log.values()]
+
+    def copy_all():
+        for player in snapshots:
+            copy.copy(player)
+
+    def compare_all():
+        for player in snapshots:
+            _ = player == player_db[player.name]
+
+    def json_all():
+        for player in snapshots:
+            player.to_json()
+
+    print("%-9s %7.1f MB  copy %6.3fs  eq %6.3fs  to_json %6.3fs  "
+          "(%d snapshots)" % (
+              label, memory / 1024 / 1024,
+              min(timed(copy_all) for _ in range(args.repeat)),
+              min(timed(compare_all) for _ in range(args.repeat)),
+              min(timed(json_all) for _ in range(args.repeat)),
+              len(snapshots)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--nights", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    measure("legacy", LegacyPlayer, LegacyWhoLog, copy.copy, args)
+    measure("slotted", models.Player, models.WhoLog, copy.copy, args)
+    measure("interned", models.Player, models.WhoLog,
+            models.PlayerSnapshot.of, args)
+
+
+if __name__ == "__main__":
+    main()
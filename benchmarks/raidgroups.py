@@ -0,0 +1,177 @@
+"""Benchmark building raid groups.
+
+Builds groups for synthetic 54 and 72 player raids with a fixed seed, using
+both GroupBuilder and the old builder that refilled and rescored every
+group on every move, then checks that they made the same groups and
+compares their run times.
+
+With --warm, it then swaps a few raiders out for new ones and compares
+building groups for the new roster from scratch with starting from the
+groups already built, including how many raiders each had to move.
+
+Run from the repository root:
+
+    python -m benchmarks.raidgroups --sizes 54 72 --seeds 1 2 3 --warm
+"""
+import argparse
+import math
+import random
+import time
+
+from ninjalooter import constants
+from ninjalooter import models
+from ninjalooter import raidgroups
+
+# Roughly the class spread of a large raid
+CLASS_WEIGHTS = {
+    constants.WARRIOR: 8, constants.PALADIN: 3, constants.SHADOW_KNIGHT: 3,
+    constants.CLERIC: 10, constants.DRUID: 4, constants.SHAMAN: 5,
+    constants.BARD: 4, constants.ENCHANTER: 4, constants.MONK: 4,
+    constants.MAGICIAN: 3, constants.WIZARD: 4, constants.NECROMANCER: 3,
+    constants.RANGER: 3, constants.ROGUE: 5,
+}
+
+
+class LegacyGroupBuilder(raidgroups.GroupBuilder):
+    """GroupBuilder as it was before moves were scored incrementally."""
+
+    def build_groups(self, master_player_list) -> int:
+        random.shuffle(master_player_list)
+        player_count = len(master_player_list)
+        self.raid.add_empty_groups(player_count)
+        temp = 1.0 * self.INITIAL_ANNEAL_TEMP
+        current_score = -999
+        converged = False
+        while not converged:
+            accepted_moves = 0
+            loop_count = self.INNER_LOOP_X * player_count
+            while loop_count > 0:
+                from_pos = random.randrange(player_count)
+                to_pos = from_pos
+                while to_pos == from_pos:
+                    to_pos = random.randrange(player_count)
+                master_player_list[to_pos], master_player_list[from_pos] = (
+                    master_player_list[from_pos], master_player_list[to_pos])
+                for group_ndx, gg in enumerate(self.raid.groups):
+                    gg.player_list[:] = master_player_list[
+                        group_ndx * 6:(group_ndx + 1) * 6]
+                    gg.score()
+                new_score = sum(gg.group_score for gg in self.raid.groups)
+                chance = math.exp(
+                    -1.0 * abs((new_score - current_score)) / temp)
+                rv = random.random()
+                if new_score > current_score or (
+                        new_score < current_score and rv < chance):
+                    current_score = new_score
+                    accepted_moves += 1
+                    for gg in self.raid.groups:
+                        gg.max_group_score = gg.group_score
+                else:
+                    (master_player_list[to_pos],
+                     master_player_list[from_pos]) = (
+                        master_player_list[from_pos],
+                        master_player_list[to_pos])
+                loop_count -= 1
+            if accepted_moves == 0:
+                converged = True
+            else:
+                temp *= self.COOLING_RATE
+        # the groups were left with the last move even if it was undone;
+        # place the groups that were kept, as GroupBuilder does
+        for group_ndx, gg in enumerate(self.raid.groups):
+            gg.player_list[:] = master_player_list[
+                group_ndx * 6:(group_ndx + 1) * 6]
+            gg.group_score = gg.max_group_score
+        return current_score
+
+
+def build_raid(size, seed=1):
+    rng = random.Random(seed)
+    classes = rng.choices(list(CLASS_WEIGHTS), list(CLASS_WEIGHTS.values()),
+                          k=size)
+    return [models.Player("Raider%d" % number, pclass,
+                          rng.choice((58, 59, 60, 60, 60)), "Venerate")
+            for number, pclass in enumerate(classes)]
+
+
+def run(builder_type, players, seed):
+    builder = builder_type()
+    random.seed(seed)
+    start = time.perf_counter()
+    score = builder.build_groups(list(players))
+    elapsed = time.perf_counter() - start
+    groups = [[player.name for player in group.player_list]
+              for group in builder.raid.groups]
+    return elapsed, score, groups
+
+
+def run_warm(players, seed, changes, move_cost):
+    builder = raidgroups.GroupBuilder(rng=random.Random(seed))
+    builder.build_groups(list(players))
+    previous = builder.raid
+    old_groups = {player.name: group_ndx
+                  for group_ndx, gg in enumerate(previous.groups)
+                  for player in gg.player_list}
+
+    rng = random.Random(seed)
+    roster = rng.sample(players, len(players) - changes)
+    joined = build_raid(changes, seed + 1000)
+    for player in joined:
+        player.name = "Joined" + player.name
+    roster.extend(joined)
+
+    timings = []
+    for start in (None, previous):
+        builder = raidgroups.GroupBuilder(rng=random.Random(seed))
+        started = time.perf_counter()
+        builder.build_groups(list(roster), previous=start,
+                             move_cost=move_cost if start else 0)
+        elapsed = time.perf_counter() - started
+        # the group scores, without any move costs
+        score = sum(gg.max_group_score for gg in builder.raid.groups)
+        moved = sum(1 for group_ndx, gg in enumerate(builder.raid.groups)
+                    for player in gg.player_list
+                    if old_groups.get(player.name, group_ndx) != group_ndx)
+        timings.append((elapsed, score, moved))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[54, 72])
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--warm", action="store_true")
+    parser.add_argument("--changes", type=int, default=3)
+    parser.add_argument("--move-cost", type=int, default=30)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        players = build_raid(size)
+        for seed in args.seeds:
+            legacy_time, legacy_score, legacy_groups = run(
+                LegacyGroupBuilder, players, seed)
+            new_time, score, groups = run(
+                raidgroups.GroupBuilder, players, seed)
+            print("%3d players  seed %-3d  legacy %6.2fs  incremental "
+                  "%6.2fs  (%4.1fx)  score %d  %s" % (
+                      size, seed, legacy_time, new_time,
+                      legacy_time / new_time, score,
+                      "same groups" if (legacy_score, legacy_groups) ==
+                      (score, groups) else "DIFFERENT"))
+
+    if not args.warm:
+        return
+    for size in args.sizes:
+        players = build_raid(size)
+        for seed in args.seeds:
+            (cold_time, cold_score, cold_moved), (
+                warm_time, warm_score, warm_moved) = run_warm(
+                    players, seed, args.changes, args.move_cost)
+            print("%3d players  seed %-3d  %d joined/left  scratch %6.2fs "
+                  "score %d moved %2d  warm %6.2fs score %d moved %2d" % (
+                      size, seed, args.changes, cold_time, cold_score,
+                      cold_moved, warm_time, warm_score, warm_moved))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
 from ninjalooter.cmd import run
 
-print("Starting")
-run.run()
+# Raid groups are built in worker processes, which import this script again
+# where processes are spawned rather than forked
+if __name__ == "__main__":
+    print("Starting")
+    run.run()
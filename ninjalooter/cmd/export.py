@@ -0,0 +1,40 @@
+import argparse
+import sys
+
+from ninjalooter import config
+from ninjalooter import logger
+from ninjalooter import textexport
+from ninjalooter import utils
+
+LOG = logger.getLogger(__name__)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Export the saved raid history as CSV or JSON Lines.")
+    parser.add_argument("kind", choices=list(textexport.KINDS))
+    parser.add_argument("filename", help="the file to write, or - for stdout")
+    parser.add_argument("--format", choices=textexport.FORMATS,
+                        help="defaults to the file's extension, or csv")
+    parser.add_argument("--since", type=textexport.parse_since,
+                        help="only export records from this time on")
+    parser.add_argument("--state", default=config.SAVE_STATE_FILE,
+                        help="the state file to read")
+    args = parser.parse_args(argv)
+
+    if not utils.load_state(args.state):
+        LOG.error("Nothing to export, couldn't load %s.", args.state)
+        return 1
+    export_format = args.format or textexport.guess_format(args.filename)
+    if args.filename == "-":
+        textexport.write(args.kind, export_format, sys.stdout,
+                         since=args.since)
+        return 0
+    if not textexport.export(args.kind, export_format, args.filename,
+                             since=args.since):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
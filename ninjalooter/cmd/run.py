@@ -1,3 +1,4 @@
+import multiprocessing
 import sys
 import traceback
 
@@ -32,6 +33,9 @@ def run():
 
 
 if __name__ == "__main__":
+    # Raid groups are built in worker processes, which start by running
+    # this again in a frozen build
+    multiprocessing.freeze_support()
     try:
         run()
     except:  # noqa
@@ -96,6 +96,8 @@ ALLOW_EXCEL_EXPORT = CONF.getboolean("default", "allow_excel_export",
                                      fallback=False)
 EXPORT_TIME_IN_EASTERN = CONF.getboolean("default", "export_time_in_eastern",
                                          fallback=False)
+EXPORT_ATTENDANCE_TABLE = CONF.getboolean(
+    "default", "export_attendance_table", fallback=False)
 LAST_RUN_VERSION = CONF.get("default", "last_run_version", fallback=None)
 OVERVIEW_CLASS_ORDER = CONF.get(
     "default", "overview_class_order",
@@ -105,6 +107,46 @@ OVERVIEW_CLASS_ORDER = [
 CONF.set("default", "overview_class_order", ', '.join(OVERVIEW_CLASS_ORDER))
 REMEMBER_PLAYER_DATA = CONF.getboolean(
     "default", "remember_player_data", fallback=True)
+FUZZY_ITEM_MATCH = CONF.getboolean(
+    "default", "fuzzy_item_match", fallback=False)
+FUZZY_MAX_DISTANCE = CONF.getint(
+    "default", "fuzzy_max_distance", fallback=2)
+
+if not CONF.has_section("state"):
+    CONF.add_section("state")
+JOURNAL_ENABLED = CONF.getboolean("state", "journal_enabled", fallback=True)
+JOURNAL_SYNC_RECORDS = CONF.getint(
+    "state", "journal_sync_records", fallback=20)
+JOURNAL_SYNC_SECONDS = CONF.getfloat(
+    "state", "journal_sync_seconds", fallback=5)
+JOURNAL_COMPACT_RECORDS = CONF.getint(
+    "state", "journal_compact_records", fallback=500)
+STATE_SAVE_DELAY = CONF.getfloat("state", "save_delay", fallback=2)
+SQLITE_ENABLED = CONF.getboolean("state", "sqlite_enabled", fallback=False)
+SQLITE_FILE = CONF.get("state", "sqlite_file", fallback="history.db")
+LAZY_HISTORY = CONF.getboolean("state", "lazy_history", fallback=True)
+DETAIL_CACHE_SIZE = CONF.getint("state", "detail_cache_size", fallback=64)
+SESSIONS_DIR = CONF.get("state", "sessions_dir", fallback="sessions")
+
+if not CONF.has_section("raid_groups"):
+    CONF.add_section("raid_groups")
+RAID_GROUP_CHAINS = CONF.getint("raid_groups", "chains", fallback=8)
+RAID_GROUP_SEED = CONF.get("raid_groups", "seed", fallback="").strip()
+RAID_GROUP_SEED = int(RAID_GROUP_SEED) if RAID_GROUP_SEED else None
+RAID_GROUP_TIME_BUDGET = CONF.getfloat(
+    "raid_groups", "time_budget", fallback=10)
+RAID_GROUP_PROCESSES = CONF.getint("raid_groups", "processes", fallback=0)
+RAID_GROUP_WARM_START = CONF.getboolean(
+    "raid_groups", "warm_start", fallback=True)
+RAID_GROUP_MOVE_COST = CONF.getint("raid_groups", "move_cost", fallback=30)
+RAID_GROUP_SWAP_CANDIDATES = CONF.getint(
+    "raid_groups", "swap_candidates", fallback=1)
+RAID_GROUP_STRATEGY = CONF.get("raid_groups", "strategy", fallback="anneal")
+RAID_GROUP_POLISH_MOVES = CONF.getint(
+    "raid_groups", "polish_moves", fallback=2000)
+RAID_GROUP_TEMPLATES_FILE = CONF.get(
+    "raid_groups", "templates_file",
+    fallback=os.path.join(PROJECT_DIR, "data", "group_templates.ini"))
 
 
 if not CONF.has_section("min_dkp"):
@@ -185,13 +227,13 @@ CREDITT_LOG = list()
 GRATSS_LOG = list()
 KILL_TIMERS = list()
 RAID_GROUPS = None
+RAID_GROUP_SOLVER = None
 CREDITT_SASH_POS = 400
 GRATSS_SASH_POS = 150
 ACTIVE_SASH_POS = 215
 HISTORICAL_SASH_POS = 215
 RAIDTICK_ALERT_TIMER = None
 RAIDTICK_REMINDER_COUNT = 0
-AUCTION_ALERT_TIMERS = list()
 RAID_OVERVIEW_GUILDS_ENABLED_CACHE = dict()
 TAB_SELECTION = 0
 
@@ -203,6 +245,13 @@ for alliance, guilds in ALLIANCES.items():
     for guild in guilds:
         ALLIANCE_MAP[guild] = alliance
 TRIE = None
+FUZZY_INDEX = None
+JOURNAL = None
+STATE_WRITER = None
+SCHEDULER = None
+SQL_STORE = None
+DETAIL_RECORDS = None
+SESSION_ARCHIVE = None
 ITEMS = dict()
 SPELLS = dict()
 LAST_RAIDTICK = datetime.datetime.now()
@@ -214,6 +263,7 @@ WX_FILESYSTEM_WATCHER = None
 # Constants
 BASE_WIKI_URL = 'http://wiki.project1999.com'
 SAVE_STATE_FILE = 'state.json'
+SAVE_JOURNAL_FILE = 'state.journal'
 
 # Regexes
 TIMESTAMP = r"\[(?P<time>\w{3} \w{3} \d{2} \d\d:\d\d:\d\d \d{4})\] +"
@@ -0,0 +1,293 @@
+"""Random access storage for the bulky detail of historical records.
+
+Attendance ticks and completed auctions are listed by their summary (time,
+zone and populations, or item, winner and price), but most of their size is
+in the player list or the bids. When `lazy_history` is enabled, checkpoints
+move those dicts into a records file next to state.json, and the state file
+only keeps a reference (offset and size) plus the summary. On load, each
+reference becomes a LazyDict that reads its record the first time it is
+used, keeping a bounded number of decoded records in memory.
+
+Records are appended, so references written by an earlier checkpoint stay
+valid until the state file stops using them. Once most of the file is
+unreferenced, the next checkpoint rewrites the live records into a new
+generation of the file.
+"""
+import collections
+import collections.abc
+import hashlib
+import json
+import os
+import threading
+
+from ninjalooter import logger
+
+# This is the app logger, not related to EQ logs
+LOG = logger.getLogger(__name__)
+
+REF_TYPE = 'DetailRef'
+# Don't bother compacting small files, however much of them is unused
+COMPACT_MIN_BYTES = 1024 * 1024
+
+
+class RecordFile:
+    """A file of JSON records addressed by byte offset."""
+
+    def __init__(self, encoder: type, decoder: type, cache_size: int = 64,
+                 filename: str = None):
+        self.encoder = encoder
+        self.decoder = decoder
+        self.cache_size = cache_size
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._cache = collections.OrderedDict()
+        # Records written by this process, so that unchanged detail isn't
+        # appended again by every checkpoint
+        self._written = {}
+        # Bytes used by the last checkpoint, unknown until there is one
+        self.live_bytes = None
+        self._rfp = None
+        self._wfp = None
+
+    def set_filename(self, filename: str) -> None:
+        """Name the file once it is known, e.g. after the state is parsed."""
+        self.filename = filename
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.filename)
+        except (OSError, TypeError):
+            return 0
+
+    def close(self) -> None:
+        with self._lock:
+            for handle in (self._rfp, self._wfp):
+                if handle:
+                    handle.close()
+            self._rfp = self._wfp = None
+            self._cache.clear()
+
+    def read_raw(self, offset: int, size: int) -> bytes:
+        with self._lock:
+            return self._read_raw(offset, size)
+
+    def _read_raw(self, offset: int, size: int) -> bytes:
+        if self._wfp:
+            self._wfp.flush()
+        if self._rfp is None:
+            self._rfp = open(self.filename, 'rb')
+        self._rfp.seek(offset)
+        data = self._rfp.read(size)
+        if len(data) != size:
+            raise ValueError("Truncated record at %d in %s" %
+                             (offset, self.filename))
+        return data
+
+    def read(self, offset: int, size: int) -> dict:
+        """Return the record at `offset`, which must not be modified."""
+        with self._lock:
+            record = self._cache.get(offset)
+            if record is not None:
+                self._cache.move_to_end(offset)
+                return record
+            pairs = json.loads(self._read_raw(offset, size).decode('utf-8'),
+                               cls=self.decoder)
+            record = {key: value for key, value in pairs}
+            self._cache[offset] = record
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return record
+
+    def is_cached(self, offset: int) -> bool:
+        return offset in self._cache
+
+    def prime(self, offset: int, record: dict) -> None:
+        with self._lock:
+            self._cache[offset] = record
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def should_compact(self) -> bool:
+        """Whether most of the file is no longer used by the state."""
+        if self.live_bytes is None:
+            return False
+        size = self.size()
+        return size > COMPACT_MIN_BYTES and size > 2 * self.live_bytes
+
+    def append(self, data: bytes) -> (int, int):
+        """Append encoded record data and return its (offset, size)."""
+        digest = hashlib.sha1(data).digest()
+        with self._lock:
+            if digest in self._written:
+                return self._written[digest]
+            if self._wfp is None:
+                self._wfp = open(self.filename, 'ab')
+            offset = self._wfp.seek(0, os.SEEK_END)
+            self._wfp.write(data + b'\n')
+            self._written[digest] = (offset, len(data))
+            return offset, len(data)
+
+    def encode(self, value: collections.abc.Mapping) -> bytes:
+        # Pairs rather than an object, so that numeric keys such as bids
+        # keep their type
+        return json.dumps([[key, item] for key, item in value.items()],
+                          cls=self.encoder).encode('utf-8')
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._wfp:
+                self._wfp.flush()
+                os.fsync(self._wfp.fileno())
+
+
+class LazyDict(collections.abc.MutableMapping):
+    """A dict that is read from a RecordFile when it is first used.
+
+    Its length and a summary are known without reading the record. Reading
+    only goes through the record file's cache, so untouched records can be
+    evicted again; the first change copies the record into this object,
+    which then owns it until the next checkpoint stores it.
+    """
+
+    def __init__(self, records: RecordFile, offset: int, size: int,
+                 count: int = 0, summary=None):
+        self._ref = (records, offset, size)
+        self._count = count
+        self._summary = summary
+        self._data = None
+        # Bumped by every change, so a checkpoint can tell whether what it
+        # stored is still current
+        self.version = 0
+
+    @property
+    def ref(self) -> tuple:
+        """The (record file, offset, size) of the stored record."""
+        return self._ref
+
+    @property
+    def dirty(self) -> bool:
+        return self._data is not None
+
+    @property
+    def loaded(self) -> bool:
+        records, offset, _ = self._ref
+        return self._data is not None or records.is_cached(offset)
+
+    @property
+    def summary(self):
+        """The summary stored with the record, or None once it's changed."""
+        return None if self.dirty else self._summary
+
+    def rebind(self, records: RecordFile, offset: int, size: int,
+               summary=None, version: int = None) -> None:
+        """Point at a stored copy of the contents as of `version`."""
+        if version is not None and version != self.version:
+            # Changed again since it was stored
+            return
+        if self._data is not None:
+            self._count = len(self._data)
+            records.prime(offset, self._data)
+        self._ref = (records, offset, size)
+        self._summary = summary
+        self._data = None
+
+    def _get(self) -> dict:
+        if self._data is not None:
+            return self._data
+        records, offset, size = self._ref
+        try:
+            return records.read(offset, size)
+        except (OSError, ValueError):
+            LOG.exception("Failed to read detail record at %d in %s.",
+                          offset, records.filename)
+            return {}
+
+    def _own(self) -> dict:
+        if self._data is None:
+            self._data = dict(self._get())
+        self.version += 1
+        return self._data
+
+    def __getitem__(self, key):
+        return self._get()[key]
+
+    def __setitem__(self, key, value):
+        self._own()[key] = value
+
+    def __delitem__(self, key):
+        del self._own()[key]
+
+    def __iter__(self):
+        return iter(self._get())
+
+    def __len__(self):
+        if self._data is not None:
+            return len(self._data)
+        return self._count
+
+    def __contains__(self, key):
+        return key in self._get()
+
+    def __repr__(self):
+        return "LazyDict(%r)" % self._get()
+
+    def keys(self):
+        return self._get().keys()
+
+    def items(self):
+        return self._get().items()
+
+    def values(self):
+        return self._get().values()
+
+    def get(self, key, default=None):
+        return self._get().get(key, default)
+
+    def clear(self):
+        self._data = {}
+        self.version += 1
+
+
+class RecordWriter:
+    """Store detail dicts for one checkpoint of the state."""
+
+    def __init__(self, records: RecordFile):
+        self.records = records
+        self.live_bytes = 0
+        self._rebinds = []
+
+    def store(self, value: collections.abc.Mapping, summary=None):
+        """Return a reference to `value` in the record file.
+
+        Empty dicts aren't worth a record and are returned unchanged.
+        """
+        if not value:
+            return value
+        if isinstance(value, LazyDict) and not value.dirty:
+            old_records, offset, size = value.ref
+            if old_records is not self.records:
+                # Carry the record over to a new file without decoding it
+                offset, size = self.records.append(
+                    old_records.read_raw(offset, size))
+                self._rebinds.append(
+                    (value, offset, size, summary, value.version))
+        else:
+            offset, size = self.records.append(self.records.encode(value))
+            if isinstance(value, LazyDict):
+                self._rebinds.append(
+                    (value, offset, size, summary, value.version))
+        self.live_bytes += size + 1
+        return {
+            'json_type': REF_TYPE,
+            'offset': offset,
+            'size': size,
+            'count': len(value),
+            'summary': summary,
+        }
+
+    def commit(self) -> None:
+        """Repoint lazy dicts once the state file refers to the new copy."""
+        for lazy, offset, size, summary, version in self._rebinds:
+            lazy.rebind(self.records, offset, size, summary, version)
+        self._rebinds = []
+        self.records.live_bytes = self.live_bytes
@@ -0,0 +1,198 @@
+"""Approximate item-name matching for misspelled drop calls.
+
+Exact matching is handled by the Aho-Corasick trie in `utils.setup_aho`. This
+module is only consulted for drop-channel lines where the trie found nothing,
+so it is tuned to reject a line quickly: candidates are pulled from a trigram
+inverted index and filtered by the q-gram count lemma before any edit distance
+is computed.
+"""
+import collections
+import math
+import re
+import string
+import urllib.parse
+
+from ninjalooter import logger
+
+# This is the app logger, not related to EQ logs
+LOG = logger.getLogger(__name__)
+
+RE_NOT_NAME_CHAR = re.compile(r"[^A-Z0-9' ]+")
+RE_SPACES = re.compile(r" {2,}")
+
+# Names shorter than this are too easy to hit by accident in normal chatter
+MIN_NAME_LENGTH = 6
+# Names shorter than this only get a single edit, regardless of config
+SHORT_NAME_LENGTH = 10
+# Only verify this many of the best trigram candidates per line
+MAX_CANDIDATES = 16
+# Trigrams shared by more names than this ("OF ", "ING") are not indexed
+MAX_POSTINGS = 300
+
+
+def normalize(text: str) -> str:
+    text = text.upper().replace("`", "'")
+    text = RE_NOT_NAME_CHAR.sub(" ", text)
+    return RE_SPACES.sub(" ", text).strip()
+
+
+def trigrams(text: str) -> set:
+    padded = " %s " % text
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_distance(first: str, second: str, limit: int) -> int:
+    """Return the edit distance between two strings, or `limit + 1`.
+
+    Uses the optimal string alignment distance (Levenshtein plus adjacent
+    transpositions), only filling the diagonal band that can still produce a
+    result within `limit`.
+    """
+    len_first, len_second = len(first), len(second)
+    if abs(len_first - len_second) > limit:
+        return limit + 1
+    over = limit + 1
+    before = None
+    previous = list(range(len_second + 1))
+    for i in range(1, len_first + 1):
+        current = [over] * (len_second + 1)
+        if i <= limit:
+            current[0] = i
+        low = max(1, i - limit)
+        high = min(len_second, i + limit)
+        row_min = current[0]
+        char_first = first[i - 1]
+        for j in range(low, high + 1):
+            cost = 0 if char_first == second[j - 1] else 1
+            value = min(previous[j] + 1,
+                        current[j - 1] + 1,
+                        previous[j - 1] + cost)
+            if (before is not None and cost and j > 1 and
+                    char_first == second[j - 2] and
+                    first[i - 2] == second[j - 1]):
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return over
+        before, previous = previous, current
+    return min(previous[len_second], over)
+
+
+def display_name(item_key: str, wiki_link: str) -> str:
+    """Recover the properly cased item name from its wiki link."""
+    name = urllib.parse.unquote(wiki_link.rsplit('/', 1)[-1]).replace('_', ' ')
+    if name.upper() != item_key:
+        name = string.capwords(item_key.lower())
+    return name
+
+
+class TrigramIndex:
+    """Trigram inverted index over item names with bounded verification."""
+
+    def __init__(self, items: dict, max_distance: int = 2):
+        self.max_distance = max_distance
+        self.names = []
+        self.keys = []
+        self.word_counts = []
+        self.limits = []
+        self.thresholds = []
+        postings = collections.defaultdict(list)
+        item_grams = []
+        seen = set()
+        for item_key, wiki_link in items.items():
+            key = normalize(item_key)
+            if len(key) < MIN_NAME_LENGTH or key in seen:
+                continue
+            seen.add(key)
+            item_id = len(self.keys)
+            grams = trigrams(key)
+            for gram in grams:
+                postings[gram].append(item_id)
+            item_grams.append(frozenset(grams))
+            self.names.append(display_name(item_key, wiki_link))
+            self.keys.append(key)
+            self.word_counts.append(key.count(" ") + 1)
+            self.limits.append(
+                1 if len(key) < SHORT_NAME_LENGTH else max_distance)
+
+        # Tuples are cheaper to hand to Counter.update than lists
+        self.postings = {gram: tuple(ids) for gram, ids in postings.items()
+                         if len(ids) <= MAX_POSTINGS}
+        self.grams = item_grams
+        for item_id, grams in enumerate(item_grams):
+            indexed = sum(1 for gram in grams if gram in self.postings)
+            self.thresholds.append(max(
+                1,
+                indexed - 3 * self.limits[item_id],
+                math.ceil(indexed / 2)))
+        LOG.info("Built fuzzy item index: %d names, %d trigrams",
+                 len(self.keys), len(self.postings))
+
+    def candidates(self, text: str) -> list:
+        """Return item ids that could be within their edit limit of `text`.
+
+        Each edit destroys at most three trigrams of a name, so a name with
+        `n` indexed trigrams that appears in the text within `k` edits must
+        still share at least `n - 3k` of them with it.
+        """
+        counts = collections.Counter()
+        postings = self.postings
+        for gram in trigrams(text):
+            ids = postings.get(gram)
+            if ids:
+                counts.update(ids)
+        thresholds = self.thresholds
+        found = [(shared, item_id) for item_id, shared in counts.items()
+                 if shared >= thresholds[item_id]]
+        found.sort(reverse=True)
+        return [item_id for _, item_id in found[:MAX_CANDIDATES]]
+
+    def search(self, text: str) -> list:
+        """Return the names of items misspelled in `text`, in text order."""
+        text = normalize(text)
+        if len(text) < MIN_NAME_LENGTH:
+            return []
+        words = text.split(" ")
+        windows = {}
+
+        matches = []
+        for item_id in self.candidates(text):
+            key = self.keys[item_id]
+            limit = self.limits[item_id]
+            width = self.word_counts[item_id]
+            key_grams = self.grams[item_id]
+            required = len(key_grams) - 3 * limit
+            best = None
+            for start in range(len(words) - width + 1):
+                window = windows.get((start, width))
+                if window is None:
+                    joined = " ".join(words[start:start + width])
+                    window = windows[(start, width)] = (
+                        joined, trigrams(joined))
+                # Same count filter as above, but against this window only
+                if (abs(len(window[0]) - len(key)) > limit or
+                        len(key_grams & window[1]) < required):
+                    continue
+                distance = bounded_distance(window[0], key, limit)
+                if distance <= limit and (best is None or
+                                          distance < best[0]):
+                    best = (distance, start)
+                    if distance == 0:
+                        break
+            if best:
+                matches.append((best[0], best[1], width, item_id))
+
+        # Prefer the closest names, and never report overlapping windows
+        matches.sort(key=lambda match: (match[0], -match[2]))
+        taken = set()
+        accepted = []
+        for _, start, width, item_id in matches:
+            span = set(range(start, start + width))
+            if span & taken:
+                continue
+            taken |= span
+            accepted.append((start, self.names[item_id]))
+        accepted.sort()
+        return [name for _, name in accepted]
@@ -0,0 +1,318 @@
+"""Raid group templates, and scoring groups against them.
+
+The makeup of each type of group, and which types a raid is split into, are
+read from a templates file (data/group_templates.ini unless templates_file
+is set in [raid_groups]). A GroupScorer compiles the templates for a list of
+players into tables of what each player scores in each slot, so scoring a
+group doesn't look at the players again.
+"""
+import collections
+import configparser
+import os
+import re
+
+from ninjalooter import config
+from ninjalooter import constants
+from ninjalooter import logger
+
+# This is the app logger, not related to EQ logs
+LOG = logger.getLogger(__name__)
+
+DEFAULT_TEMPLATES_FILE = os.path.join(
+    config.PROJECT_DIR, "data", "group_templates.ini")
+
+GROUP_SIZE = 6
+MAX_SLOT = 100  # slot filled with an exact match
+MIN_SLOT = 10  # slot filled with anyone
+LEVEL_PENALTY = 15  # per level less than 60
+CLASS_PENALTY = 50  # penalty if not an exact class match
+
+# Player predicates that templates can ask for, as bits of a mask
+ROLE_PREDICATES = (
+    'is_tank', 'is_war', 'is_knight', 'is_priest', 'is_torp_shaman',
+    'is_shaman', 'is_cleric', 'is_melee', 'is_bard', 'is_monk', 'is_caster',
+    'is_enchanter', 'is_necromancer', 'is_wizard', 'is_coth_magician',
+)
+ROLES = {name[3:]: 1 << bit for bit, name in enumerate(ROLE_PREDICATES)}
+
+
+def role_name(name: str) -> str:
+    return name.strip().lower().replace(' ', '_')
+
+
+# Classes are roles too, sharing a bit with the predicate of the same name
+CLASS_ROLES = {}
+for _pclass in sorted(constants.ALL_CLASSES):
+    if role_name(_pclass) not in ROLES:
+        ROLES[role_name(_pclass)] = 1 << len(ROLES)
+    CLASS_ROLES[_pclass] = ROLES[role_name(_pclass)]
+
+# One kind of slot in a group template: up to `count` of the best players
+# with any of the `roles`, less CLASS_PENALTY for those with any of the
+# `avoid` roles or without any of the `prefer` roles, times `weight`
+Slot = collections.namedtuple(
+    'Slot', ('roles', 'count', 'avoid', 'prefer', 'weight'),
+    defaults=(1, 0, 0, 1))
+
+# The slots of a group type, in the order they are filled. If `filler` is
+# set, each member left over without any of those roles scores MIN_SLOT.
+# The total is then multiplied by `weight`.
+GroupTemplate = collections.namedtuple(
+    'GroupTemplate', ('slots', 'filler', 'weight'), defaults=(None, 1))
+
+SLOT_RE = re.compile(r"^(?P<count>\d+)\s+(?P<roles>[^,]+)(?P<options>.*)$")
+
+
+class GroupLayout:
+    """Which types of group to split a raid into
+
+    :param full: group types by number of full groups
+    :param extra: the type of each full group past the largest in `full`
+    :param partial: the type of the group for players left over
+    :param order: the order to list group types in
+    """
+
+    def __init__(self, full: dict, extra: str, partial: str, order: list):
+        self.full = full
+        self.extra = extra
+        self.partial = partial
+        self.order = order
+
+    def group_types(self, player_count: int) -> list:
+        full_groups = player_count // GROUP_SIZE
+        group_types = [self.partial] if player_count % GROUP_SIZE else []
+        # the largest layout that fits, and extra groups for the rest
+        base = max((count for count in self.full if count <= full_groups),
+                   default=0)
+        group_types.extend(self.full.get(base, []))
+        group_types.extend([self.extra] * (full_groups - base))
+        order = {group_type: ndx for ndx, group_type in enumerate(self.order)}
+        group_types.sort(key=lambda group_type: order.get(group_type,
+                                                          len(order)))
+        return group_types
+
+
+Templates = collections.namedtuple('Templates', ('templates', 'layout'))
+
+
+def parse_roles(text: str) -> int:
+    roles = 0
+    for name in re.split(r"\s+or\s+|\s*,\s*", text.strip()):
+        if role_name(name) not in ROLES:
+            raise ValueError("Unknown role: %s" % name)
+        roles |= ROLES[role_name(name)]
+    return roles
+
+
+def parse_slot(text: str) -> Slot:
+    """Parse a slot like `1 priest, prefer torp_shaman`"""
+    match = SLOT_RE.match(text.strip())
+    if not match:
+        raise ValueError("Can't read slot: %s" % text)
+    options = {}
+    for option in match.group("options").split(",")[1:]:
+        key, _, value = option.strip().partition(" ")
+        if key not in ("avoid", "prefer", "weight") or not value:
+            raise ValueError("Can't read slot option: %s" % option)
+        options[key] = (float(value) if key == "weight"
+                        else parse_roles(value))
+    return Slot(parse_roles(match.group("roles")),
+                int(match.group("count")), **options)
+
+
+def parse(conf: configparser.ConfigParser) -> Templates:
+    """Read templates and a layout, as in data/group_templates.ini
+
+    :raises ValueError: if they don't make sense
+    """
+    templates = {}
+    for section in conf.sections():
+        if not section.startswith("template "):
+            continue
+        filler = conf.get(section, "filler_except", fallback=None)
+        if filler is not None:
+            # anyone can be filler if no roles are excepted
+            filler = parse_roles(filler) if filler.strip() else 0
+        templates[section[len("template "):].strip()] = GroupTemplate(
+            tuple(parse_slot(line)
+                  for line in conf.get(section, "slots").splitlines()
+                  if line.strip()),
+            filler=filler,
+            weight=conf.getfloat(section, "weight", fallback=1))
+
+    def group_types(text):
+        return [group_type.strip() for group_type in text.split(",")
+                if group_type.strip()]
+
+    full = {int(key[len("groups_"):]): group_types(value)
+            for key, value in conf.items("layout")
+            if key.startswith("groups_")}
+    layout = GroupLayout(
+        full, conf.get("layout", "extra"), conf.get("layout", "partial"),
+        group_types(conf.get("layout", "order", fallback="")))
+    for group_type in (layout.extra, layout.partial,
+                       *(t for types in full.values() for t in types)):
+        if group_type not in templates:
+            raise ValueError("No template for group type: %s" % group_type)
+    return Templates(templates, layout)
+
+
+def load(filename: str) -> Templates:
+    conf = configparser.ConfigParser()
+    with open(filename) as file_pointer:
+        conf.read_file(file_pointer)
+    return parse(conf)
+
+
+_LOADED = {}
+
+
+def get_templates() -> Templates:
+    """The templates from the configured file, read once
+
+    If that file can't be read, the default templates are used instead.
+    """
+    filename = config.RAID_GROUP_TEMPLATES_FILE
+    if filename not in _LOADED:
+        try:
+            _LOADED[filename] = load(filename)
+        except (OSError, ValueError, configparser.Error):
+            LOG.exception("Failed to read group templates from %s, using "
+                          "the defaults.", filename)
+            _LOADED[filename] = load(DEFAULT_TEMPLATES_FILE)
+    return _LOADED[filename]
+
+
+def player_roles(player) -> int:
+    """The mask of ROLES that a player has"""
+    roles = CLASS_ROLES.get(player.pclass, 0)
+    for name in ROLE_PREDICATES:
+        if getattr(player, name)():
+            roles |= ROLES[name[3:]]
+    return roles
+
+
+class GroupScorer:
+    """Scores groups from a fixed list of players against templates
+
+    Each player is looked at once, up front: their roles become a bitmask
+    and their level a base slot score. Each template is compiled the first
+    time it's used into a table of what each player would score in each of
+    its slots (None if they can't fill it), so scoring a group is only table
+    lookups. Ties between players for a slot go to the member listed first.
+    """
+
+    def __init__(self, players, templates: dict = None):
+        self.players = list(players)
+        self.templates = templates or get_templates().templates
+        self.roles = [player_roles(player) for player in self.players]
+        self.base = [self._base_score(player) for player in self.players]
+        self._tables = {}
+
+    @staticmethod
+    def _base_score(player) -> int:
+        try:
+            player_level = int(player.level)
+        except (ValueError, TypeError):
+            player_level = 0
+        return MAX_SLOT - (60 - player_level) * LEVEL_PENALTY
+
+    def table(self, group_type: str) -> tuple:
+        """The compiled template for a group type
+
+        :return: (count, score of each player) for each slot, the filler
+            score of each player or None, the group weight, and whether the
+            total needs rounding
+        """
+        table = self._tables.get(group_type)
+        if table is None:
+            table = self._tables[group_type] = self._compile(
+                self.templates[group_type])
+        return table
+
+    def _compile(self, template: GroupTemplate) -> tuple:
+        slots = []
+        for slot in template.slots:
+            scores = []
+            for roles, base in zip(self.roles, self.base):
+                if not roles & slot.roles:
+                    scores.append(None)
+                    continue
+                if roles & slot.avoid or (
+                        slot.prefer and not roles & slot.prefer):
+                    base -= CLASS_PENALTY
+                scores.append(base * slot.weight if slot.weight != 1
+                              else base)
+            slots.append((slot.count, tuple(scores)))
+        filler = None
+        if template.filler is not None:
+            filler = tuple(0 if roles & template.filler else MIN_SLOT
+                           for roles in self.roles)
+        rounded = template.weight != 1 or any(
+            slot.weight != 1 for slot in template.slots)
+        return tuple(slots), filler, template.weight, rounded
+
+    def score(self, group_type: str, members) -> int:
+        """Score a group given the indexes of its members"""
+        slots, filler, weight, rounded = self.table(group_type)
+        available = list(members)
+        total = 0
+        for count, scores in slots:
+            if count == 1:
+                best = best_score = None
+                for member in available:
+                    member_score = scores[member]
+                    if member_score is not None and (
+                            best is None or member_score > best_score):
+                        best, best_score = member, member_score
+                if best is not None:
+                    total += best_score
+                    available.remove(best)
+                continue
+            candidates = [member for member in available
+                          if scores[member] is not None]
+            # sort() is stable, so ties go to the first member listed
+            candidates.sort(key=lambda member: -scores[member])
+            for member in candidates[:count]:
+                total += scores[member]
+                available.remove(member)
+        if filler is not None:
+            total += sum(filler[member] for member in available)
+        if rounded:
+            total = round(total * weight)
+        return total
+
+    def swap_scores(self, groups, group_types, group_scores, moves,
+                    score=None) -> list:
+        """Score many candidate swaps of one assignment at once
+
+        :param groups: the member indexes of each group
+        :param group_types: the type of each group
+        :param group_scores: the current score of each group
+        :param moves: (from_pos, to_pos) pairs of raid positions to swap
+        :param score: scores a group given its type and members, such as
+            GroupBuilder.score_group; score() if not given
+        :return: the raid score after each swap, leaving `groups` unchanged
+        """
+        score = score or self.score
+        raid_score = sum(group_scores)
+        results = []
+        for from_pos, to_pos in moves:
+            from_ndx, from_slot = divmod(from_pos, GROUP_SIZE)
+            to_ndx, to_slot = divmod(to_pos, GROUP_SIZE)
+            from_members = list(groups[from_ndx])
+            if from_ndx == to_ndx:
+                from_members[from_slot], from_members[to_slot] = (
+                    from_members[to_slot], from_members[from_slot])
+                results.append(
+                    raid_score - group_scores[from_ndx] +
+                    score(group_types[from_ndx], from_members))
+                continue
+            to_members = list(groups[to_ndx])
+            from_members[from_slot], to_members[to_slot] = (
+                to_members[to_slot], from_members[from_slot])
+            results.append(
+                raid_score - group_scores[from_ndx] - group_scores[to_ndx] +
+                score(group_types[from_ndx], from_members) +
+                score(group_types[to_ndx], to_members))
+        return results
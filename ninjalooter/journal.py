@@ -0,0 +1,245 @@
+"""Append-only journal of state mutations.
+
+A full `store_state` serializes every global on each call. Instead, handlers
+describe what they changed as small mutation records, which are appended to
+the journal as JSON lines and fsync'd in batches. `utils.checkpoint_state`
+periodically folds the journal into a fresh snapshot, and `utils.load_state`
+rebuilds the state from the last snapshot plus any journal records newer
+than it.
+"""
+import json
+import os
+import threading
+import time
+
+from ninjalooter import logger
+from ninjalooter import models
+
+# This is the app logger, not related to EQ logs
+LOG = logger.getLogger(__name__)
+
+
+class Mutation:
+    """A single change to one of the state globals in `config`."""
+    op = None
+
+    def __init__(self, key: str, value=None, index=None):
+        self.key = key
+        self.value = value
+        self.index = index
+
+    def apply(self, target) -> None:
+        raise NotImplementedError()
+
+    def to_json(self) -> dict:
+        json_dict = {'op': self.op, 'key': self.key}
+        if self.index is not None:
+            json_dict['index'] = self.index
+        if self.value is not None:
+            json_dict['value'] = self.value
+        return json_dict
+
+    @staticmethod
+    def from_json(json_dict: dict) -> 'Mutation':
+        mutation_type = MUTATION_TYPES[json_dict['op']]
+        return mutation_type(json_dict['key'], value=json_dict.get('value'),
+                             index=json_dict.get('index'))
+
+    def __eq__(self, other):
+        return (isinstance(other, self.__class__) and
+                (self.key, self.index, self.value) ==
+                (other.key, other.index, other.value))
+
+    def __repr__(self):
+        return "{cls}({key!r}, index={index!r})".format(
+            cls=self.__class__.__name__, key=self.key, index=self.index)
+
+
+def _release(old, new) -> None:
+    # Replaced auctions would otherwise keep their alert timers running
+    if isinstance(old, models.Auction) and old is not new:
+        old.cancel()
+
+
+class Assign(Mutation):
+    """Replace a global entirely, e.g. `LAST_WHO_SNAPSHOT`."""
+    op = 'assign'
+
+    def apply(self, target) -> None:
+        setattr(target, self.key, self.value)
+
+
+class Append(Mutation):
+    """Append `value` to a list global."""
+    op = 'append'
+
+    def apply(self, target) -> None:
+        getattr(target, self.key).append(self.value)
+
+
+class Remove(Mutation):
+    """Remove the item with the uuid `index` from a list global."""
+    op = 'remove'
+
+    def apply(self, target) -> None:
+        container = getattr(target, self.key)
+        for item in container:
+            if getattr(item, 'uuid', None) == self.index:
+                container.remove(item)
+                return
+        LOG.warning("Journal found nothing to remove from %s for %s.",
+                    self.key, self.index)
+
+
+class Put(Mutation):
+    """Set `index` to `value` in a dict global."""
+    op = 'put'
+
+    def __init__(self, key: str, index=None, value=None):
+        super().__init__(key, value=value, index=index)
+
+    def apply(self, target) -> None:
+        container = getattr(target, self.key)
+        _release(container.get(self.index), self.value)
+        container[self.index] = self.value
+
+
+class Delete(Mutation):
+    """Remove `index` from a dict global."""
+    op = 'delete'
+
+    def apply(self, target) -> None:
+        getattr(target, self.key).pop(self.index, None)
+
+
+MUTATION_TYPES = {mutation.op: mutation
+                  for mutation in (Assign, Append, Remove, Put, Delete)}
+
+
+class StateJournal:
+    """Writes mutation records to an append-only journal file.
+
+    Every record is flushed to the OS as soon as it is written, but fsync is
+    only called once `sync_records` records or `sync_seconds` seconds have
+    accumulated, so a burst of bids costs one disk sync instead of many.
+    """
+
+    def __init__(self, filename: str, encoder: type, decoder: type,
+                 sync_records: int = 20, sync_seconds: float = 5):
+        self.filename = filename
+        self.encoder = encoder
+        self.decoder = decoder
+        self.sync_records = sync_records
+        self.sync_seconds = sync_seconds
+        self.seq = 0
+        self.records = 0
+        self._fp = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.RLock()
+
+    @property
+    def rotated_filename(self) -> str:
+        return self.filename + '.old'
+
+    def append(self, mutations: list) -> int:
+        with self._lock:
+            if self._fp is None:
+                self._fp = self._open()
+            lines = []
+            for mutation in mutations:
+                self.seq += 1
+                record = mutation.to_json()
+                record['seq'] = self.seq
+                lines.append(json.dumps(record, cls=self.encoder))
+            self._fp.write('\n'.join(lines) + '\n')
+            self._fp.flush()
+            self.records += len(lines)
+            self._unsynced += len(lines)
+            if (self._unsynced >= self.sync_records or
+                    time.monotonic() - self._last_sync >= self.sync_seconds):
+                self.sync()
+            return self.seq
+
+    def _open(self):
+        jfp = open(self.filename, 'ab+')
+        # Never glue a new record onto a partial one left by a crash
+        if jfp.seek(0, os.SEEK_END):
+            jfp.seek(-1, os.SEEK_END)
+            if jfp.read(1) != b'\n':
+                jfp.write(b'\n')
+        jfp.close()
+        return open(self.filename, 'a')
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._fp is not None and self._unsynced:
+                os.fsync(self._fp.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fp is not None:
+                self.sync()
+                self._fp.close()
+                self._fp = None
+
+    def rotate(self) -> int:
+        """Move the live journal aside ahead of a checkpoint.
+
+        Returns the sequence number the new snapshot will cover. The rotated
+        file must be kept until that snapshot is safely on disk, and is only
+        merged into (never replaced) if an earlier checkpoint didn't finish.
+        """
+        with self._lock:
+            self.close()
+            if os.path.exists(self.filename):
+                if os.path.exists(self.rotated_filename):
+                    with open(self.filename, 'r') as live, \
+                            open(self.rotated_filename, 'a') as rotated:
+                        rotated.write(live.read())
+                        rotated.flush()
+                        os.fsync(rotated.fileno())
+                    os.remove(self.filename)
+                else:
+                    os.replace(self.filename, self.rotated_filename)
+            self.records = 0
+            return self.seq
+
+    def discard_rotated(self) -> None:
+        try:
+            os.remove(self.rotated_filename)
+        except FileNotFoundError:
+            pass
+
+    def read(self, after_seq: int = 0):
+        """Yield mutations newer than `after_seq`, oldest first."""
+        for filename in (self.rotated_filename, self.filename):
+            try:
+                jfp = open(filename, 'r')
+            except FileNotFoundError:
+                continue
+            with jfp:
+                for line_number, line in enumerate(jfp, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line, cls=self.decoder)
+                    except json.JSONDecodeError:
+                        # A crash can leave a partial record at the end
+                        LOG.warning("Skipped damaged record in %s on line "
+                                    "%d.", filename, line_number)
+                        continue
+                    seq = record.pop('seq')
+                    self.seq = max(self.seq, seq)
+                    if seq > after_seq:
+                        yield Mutation.from_json(record)
+
+    def replay(self, target, after_seq: int = 0) -> int:
+        self.seq = max(self.seq, after_seq)
+        count = 0
+        for mutation in self.read(after_seq):
+            mutation.apply(target)
+            count += 1
+        return count
@@ -63,7 +63,8 @@ def parse_logfile(logfile: str, window: wx.Window, run: threading.Event):
                     match = matcher.match(line)
                     if match:
                         match_func = LOG_MATCHERS[matcher]
-                        result = match_func(match, window)
+                        with utils.STATE_LOCK:
+                            result = match_func(match, window)
                         if matcher == config.MATCH_RAND1:
                             last_rand_player = result
                 if result:
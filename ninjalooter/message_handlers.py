@@ -1,15 +1,14 @@
 # pylint: disable=no-member,unused-argument
 import collections
-import copy
 import datetime
 import re
-import threading
 
 import dateutil.parser
 import wx
 
 from ninjalooter import config
 from ninjalooter import extra_data
+from ninjalooter import journal
 from ninjalooter import logger
 from ninjalooter import models
 from ninjalooter import utils
@@ -49,6 +48,9 @@ def handle_creditt(match: re.Match, window: wx.Frame,
     creddit_entry = models.CredittLog(time, user, message, raw_message)
     config.CREDITT_LOG.append(creddit_entry)
     wx.PostEvent(window, models.CredittEvent())
+    if not skip_store:
+        utils.store_state(
+            mutations=[journal.Append('CREDITT_LOG', creddit_entry)])
     return True
 
 
@@ -80,6 +82,9 @@ def handle_gratss(match: re.Match, window: wx.Frame,
     gratss_entry = models.GratssLog(time, user, message, raw_message)
     config.GRATSS_LOG.append(gratss_entry)
     wx.PostEvent(window, models.GratssEvent())
+    if not skip_store:
+        utils.store_state(
+            mutations=[journal.Append('GRATSS_LOG', gratss_entry)])
     return True
 
 
@@ -105,9 +110,8 @@ def raidtick_reminder_alert() -> None:
     utils.alert_sound(config.RAIDTICK_REMINDER_SOUND)
     if config.RAIDTICK_REMINDER_COUNT < 5:
         config.RAIDTICK_REMINDER_COUNT += 1
-        config.RAIDTICK_ALERT_TIMER = threading.Timer(
+        config.RAIDTICK_ALERT_TIMER = utils.get_scheduler().schedule(
             10 * 60, raidtick_reminder_alert)
-        config.RAIDTICK_ALERT_TIMER.start()
 
 
 def handle_end_who(match: re.Match, window: wx.Frame,
@@ -125,16 +129,20 @@ def handle_end_who(match: re.Match, window: wx.Frame,
         if config.RAIDTICK_ALERT_TIMER:
             config.RAIDTICK_ALERT_TIMER.cancel()
         config.RAIDTICK_REMINDER_COUNT = 0
-        config.RAIDTICK_ALERT_TIMER = threading.Timer(
+        config.RAIDTICK_ALERT_TIMER = utils.get_scheduler().schedule(
             60 * 60, raidtick_reminder_alert)
-        config.RAIDTICK_ALERT_TIMER.start()
+    # Snapshots are interned, so the tick shares the record of any player
+    # whose data hasn't changed rather than holding a copy of it
     who_snapshot = collections.OrderedDict()
     for name in sorted(config.LAST_WHO_SNAPSHOT):
         if config.REMEMBER_PLAYER_DATA:
-            who_snapshot[name] = copy.copy(config.PLAYER_DB[name])
+            who_snapshot[name] = models.PlayerSnapshot.of(
+                config.PLAYER_DB[name])
         else:
-            who_snapshot[name] = config.LAST_WHO_SNAPSHOT[name]
-            print("Not remembering player: %s" % config.LAST_WHO_SNAPSHOT[name])
+            who_snapshot[name] = models.PlayerSnapshot.of(
+                config.LAST_WHO_SNAPSHOT[name])
+            LOG.debug("Not remembering player: %s",
+                      config.LAST_WHO_SNAPSHOT[name])
     log_entry = models.WhoLog(
         time=parsed_time,
         log=who_snapshot,
@@ -152,7 +160,13 @@ def handle_end_who(match: re.Match, window: wx.Frame,
     wx.PostEvent(window, models.WhoHistoryEvent())
     wx.PostEvent(window, models.WhoEndEvent())
     if not skip_store:
-        utils.store_state()
+        mutations = [
+            journal.Assign('LAST_WHO_SNAPSHOT', config.LAST_WHO_SNAPSHOT)]
+        mutations.extend(
+            journal.Put('PLAYER_DB', name, config.PLAYER_DB[name])
+            for name in config.LAST_WHO_SNAPSHOT if name in config.PLAYER_DB)
+        mutations.append(journal.Append('ATTENDANCE_LOGS', log_entry))
+        utils.store_state(mutations=mutations)
     return True
 
 
@@ -197,11 +211,13 @@ def handle_who(match: re.Match, window: wx.Frame, skip_store=False) -> bool:
     LOG.info("Adding player record for %s as guild %s",
              name, config.PLAYER_DB[name].guild)
     if config.REMEMBER_PLAYER_DATA:
-        config.LAST_WHO_SNAPSHOT[name] = copy.copy(config.PLAYER_DB[name])
+        config.LAST_WHO_SNAPSHOT[name] = models.PlayerSnapshot.of(
+            config.PLAYER_DB[name])
     else:
-        config.LAST_WHO_SNAPSHOT[name] = models.Player(
+        config.LAST_WHO_SNAPSHOT[name] = models.PlayerSnapshot(
             name, pclass, level, guild)
-        print("Not remembering player: %s" % config.LAST_WHO_SNAPSHOT[name])
+        LOG.debug("Not remembering player: %s",
+                  config.LAST_WHO_SNAPSHOT[name])
     wx.PostEvent(window, models.WhoEvent(name, pclass, level, guild))
     return True
 
@@ -228,7 +244,13 @@ def handle_drop(match: re.Match, window: wx.Frame, skip_store=False) -> list:
 
     # Handle text to return a list of items linked
     found_items = utils.get_items_from_text(text)
+    if not found_items and config.FUZZY_ITEM_MATCH:
+        found_items = utils.get_fuzzy_items_from_text(text)
+        if found_items:
+            LOG.info("Fuzzy matched items %s from text: %s",
+                     found_items, text)
     used_found_items = []
+    mutations = []
     now = datetime.datetime.now()
     skip = False
     for item in found_items:
@@ -251,9 +273,11 @@ def handle_drop(match: re.Match, window: wx.Frame, skip_store=False) -> list:
                 item in extra_data.EXTRA_ITEM_DATA and
                 not extra_data.EXTRA_ITEM_DATA[item].get('nodrop', True)):
             config.IGNORED_AUCTIONS.append(drop)
+            mutations.append(journal.Append('IGNORED_AUCTIONS', drop))
             LOG.info("Added droppable item to IGNORED AUCTIONS: %s", drop)
         else:
             config.PENDING_AUCTIONS.append(drop)
+            mutations.append(journal.Append('PENDING_AUCTIONS', drop))
             LOG.info("Added item to PENDING AUCTIONS: %s", drop)
             used_found_items.append(item)
     if not found_items:
@@ -265,7 +289,7 @@ def handle_drop(match: re.Match, window: wx.Frame, skip_store=False) -> list:
             '\n'.join(["\u00A0\u2022 %s" % drop for drop in used_found_items]))
         utils.alert_sound(config.NEW_DROP_SOUND)
     if not skip_store:
-        utils.store_state()
+        utils.store_state(mutations=mutations)
     return found_items
 
 
@@ -277,6 +301,9 @@ def handle_bid(match: re.Match, window: wx.Frame, skip_store=False) -> bool:
     alliance = config.ALLIANCE_MAP.get(guild)
     text = match.group("text")
     bid = float(match.group("bid"))
+    bid_time = dateutil.parser.parse(match.group("time"))
+    channel = next((key for key, matcher in config.BID_CHANNEL_OPTIONS.items()
+                    if matcher is match.re), None)
 
     if text.startswith("~"):
         return False
@@ -307,7 +334,7 @@ def handle_bid(match: re.Match, window: wx.Frame, skip_store=False) -> bool:
                 LOG.info("%s attempted to bid for %s, but is in the wrong "
                          "guild/alliance: %s/%s", name, item, guild, alliance)
                 return False
-            result = auc_item.add(bid, name)
+            result = auc_item.add(bid, name, bid_time, channel)
             wx.PostEvent(window, models.BidEvent(auc_item))
             # pylint: disable=protected-access
             if (config.SECOND_MAIN_REMINDER_DKP and
@@ -331,7 +358,8 @@ def handle_bid(match: re.Match, window: wx.Frame, skip_store=False) -> bool:
                 )
                 auc_item._alt_cap_alerted = True
             if not skip_store:
-                utils.store_state()
+                utils.store_state(mutations=[journal.Put(
+                    'ACTIVE_AUCTIONS', auc_item.item.uuid, auc_item)])
             return result
     LOG.info("%s attempted to bid for %s but it isn't active", name, item)
     return False
@@ -341,8 +369,21 @@ def handle_auc_start(match: re.Match, window: wx.Frame,
                      skip_store=False) -> bool:
     LOG.warning('AUCTION START for %s', match.groupdict())
     message_time = dateutil.parser.parse(match.group('time'))
+    mutations = utils.complete_old_auctions(
+        message_time - datetime.timedelta(minutes=30))
+    result = _start_auction(match, window, message_time, mutations)
+    if mutations and not skip_store:
+        utils.store_state(mutations=mutations)
+    return result
+
+
+def _start_auction(match: re.Match, window: wx.Frame, message_time,
+                   mutations: list) -> bool:
+    """Start the auction in an auction start message
+
+    Any changes to the auctions are added to `mutations`.
+    """
     item_name = match.group('item')
-    utils.complete_old_auctions(message_time - datetime.timedelta(minutes=30))
     pending_item = None
     for item in reversed(config.PENDING_AUCTIONS):
         if item.name.lower() == item_name.lower():
@@ -366,8 +407,12 @@ def handle_auc_start(match: re.Match, window: wx.Frame,
         if historical_auc:
             LOG.debug("Found historical auction for %s/%s/%s, restarting it.",
                       item_name, item_bidder[0][0], item_bidder[0][1])
-            config.HISTORICAL_AUCTIONS.pop(historical_auc.item.uuid)
-            config.ACTIVE_AUCTIONS[historical_auc.item.uuid] = historical_auc
+            uuid = historical_auc.item.uuid
+            config.HISTORICAL_AUCTIONS.pop(uuid)
+            config.ACTIVE_AUCTIONS[uuid] = historical_auc
+            mutations.extend([
+                journal.Delete('HISTORICAL_AUCTIONS', index=uuid),
+                journal.Put('ACTIVE_AUCTIONS', uuid, historical_auc)])
             return True
         LOG.debug("Failed to find historical auction for %s/%s/%s.",
                   item_name, item_bidder[0][0], item_bidder[0][1])
@@ -394,10 +439,15 @@ def handle_auc_start(match: re.Match, window: wx.Frame,
     if number:
         auc.number = number
     auc.start_time = message_time
+    auc.schedule_alert()
     if ('player' in match.groupdict() and
             match.group('player') is not None and
             match.group('bid') is not None):
-        auc.bids[int(match.group('bid'))] = match.group('player')
+        auc.bids.bid(int(match.group('bid')), match.group('player'),
+                     message_time)
+    mutations.extend([
+        journal.Remove('PENDING_AUCTIONS', index=pending_item.uuid),
+        journal.Put('ACTIVE_AUCTIONS', pending_item.uuid, auc)])
 
     window.bidding_frame.pending_list.SetObjects(config.PENDING_AUCTIONS)
     window.bidding_frame.active_list.SetObjects(
@@ -420,9 +470,13 @@ def handle_auc_end(match: re.Match, window: wx.Frame,
                   item_name)
         return False
 
-    config.HISTORICAL_AUCTIONS[active_item.item.uuid] = (
-        active_item)
-    config.ACTIVE_AUCTIONS.pop(active_item.item.uuid)
+    uuid = active_item.item.uuid
+    config.HISTORICAL_AUCTIONS[uuid] = active_item
+    config.ACTIVE_AUCTIONS.pop(uuid)
+    if not skip_store:
+        utils.store_state(mutations=[
+            journal.Delete('ACTIVE_AUCTIONS', index=uuid),
+            journal.Put('HISTORICAL_AUCTIONS', uuid, active_item)])
     window.bidding_frame.active_list.SetObjects(
         list(config.ACTIVE_AUCTIONS.values()))
     window.bidding_frame.history_list.SetObjects(
@@ -451,7 +505,8 @@ def handle_rand2(match: re.Match, window: wx.Frame, skip_store=False) -> bool:
             item_obj.add(rand_result, name)
             wx.PostEvent(window, models.BidEvent(item_obj))
             if not skip_store:
-                utils.store_state()
+                utils.store_state(mutations=[journal.Put(
+                    'ACTIVE_AUCTIONS', item_obj.item.uuid, item_obj)])
             return True
     LOG.info("%s rolled %d-%d but that doesn't apply to an active auction.",
              name, rand_from, rand_to)
@@ -466,5 +521,5 @@ def handle_kill(match: re.Match, window: wx.Frame, skip_store=False) -> bool:
     config.KILL_TIMERS.append(kt_obj)
     wx.PostEvent(window, models.KillEvent())
     if not skip_store:
-        utils.store_state()
+        utils.store_state(mutations=[journal.Append('KILL_TIMERS', kt_obj)])
     return True
@@ -1,10 +1,12 @@
 # pylint: disable=no-member,too-many-lines
 
 from __future__ import annotations
+import collections
+import collections.abc
 import datetime
-import math
-import threading
+import operator
 import uuid as uuid_lib
+import weakref
 
 import dateutil.parser
 import wx
@@ -12,14 +14,49 @@ import wx
 from ninjalooter import config
 from ninjalooter import constants
 from ninjalooter import extra_data
+from ninjalooter import grouptemplates
 from ninjalooter import logger
 
 # This is the app logger, not related to EQ logs
 LOG = logger.getLogger(__name__)
 
 
+def parse_time(value) -> datetime.datetime:
+    """Parse a saved timestamp, which is normally in ISO 8601 format."""
+    if isinstance(value, datetime.datetime):
+        return value
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return dateutil.parser.parse(value)
+
+
 class DictEquals:
+    """Equality and JSON serialization from a model's public attributes.
+
+    Models that declare `_fields` (and matching `__slots__`) compare and
+    serialize exactly those fields, in that order. Others fall back to the
+    public entries of their `__dict__`.
+    """
+    __slots__ = ()
+    _fields = None
+    _field_values = None
+    _fields_owner = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if '_fields' in cls.__dict__:
+            # Fetches every field as a tuple in a single call
+            cls._field_values = operator.attrgetter(*cls._fields)
+            cls._fields_owner = cls
+
     def __eq__(self, other):
+        if self._fields is not None:
+            # Compared as the model that declared the fields, so that
+            # subclasses such as PlayerSnapshot compare equal both ways
+            if not isinstance(other, self._fields_owner):
+                return False
+            return self._field_values(self) == self._field_values(other)
         if not isinstance(other, self.__class__):
             return False
         self_dict = {key: self.__dict__[key] for key in self.__dict__
@@ -29,8 +66,11 @@ class DictEquals:
         return self_dict == other_dict
 
     def to_json(self):
-        json_dict = {key: self.__dict__[key] for key in self.__dict__
-                     if not key.startswith("_")}
+        if self._fields is not None:
+            json_dict = dict(zip(self._fields, self._field_values(self)))
+        else:
+            json_dict = {key: self.__dict__[key] for key in self.__dict__
+                         if not key.startswith("_")}
         return {
             'json_type': self.__class__.__name__,
             **json_dict
@@ -42,10 +82,7 @@ class DictEquals:
 
 
 class Player(DictEquals):
-    name = None
-    pclass = None
-    level = None
-    guild = None
+    __slots__ = _fields = ('name', 'pclass', 'level', 'guild')
 
     def __init__(self, name, pclass=None, level=None, guild=""):
         self.name = name
@@ -140,15 +177,71 @@ class Player(DictEquals):
         return self.pclass == constants.MAGICIAN and has_coth
 
 
+class PlayerSnapshot(Player):
+    """An immutable record of a player's class, level and guild.
+
+    Snapshots are interned: creating one with the same fields as a live
+    snapshot returns that one, so /who dumps and attendance ticks share a
+    single record per player for as long as nothing about them changes.
+    Copying a snapshot gives a regular, mutable Player.
+    """
+    __slots__ = ('__weakref__',)
+    _interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, name, pclass=None, level=None, guild=""):
+        try:
+            level = int(level)
+        except (ValueError, TypeError):
+            level = 0
+        key = (name, pclass, level, guild)
+        snapshot = cls._interned.get(key)
+        if snapshot is None:
+            snapshot = super().__new__(cls)
+            for field, value in zip(cls._fields, key):
+                object.__setattr__(snapshot, field, value)
+            cls._interned[key] = snapshot
+        return snapshot
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, *args, **kwargs):
+        # Everything was set up by __new__
+        pass
+
+    @classmethod
+    def of(cls, player: Player) -> PlayerSnapshot:
+        if isinstance(player, cls):
+            return player
+        return cls(player.name, player.pclass, player.level, player.guild)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("PlayerSnapshot is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError("PlayerSnapshot is immutable")
+
+    def __copy__(self):
+        return Player(self.name, self.pclass, self.level, self.guild)
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    def __reduce__(self):
+        return self.__class__, (self.name, self.pclass, self.level,
+                                self.guild)
+
+    def to_json(self):
+        # Saved and loaded as a plain Player
+        return dict(super().to_json(), json_type='Player')
+
+
 class Group(DictEquals):
     """Class to represent an EQ Group"""
     # info to support assigning a score to this group reflecting how
-    # well it matches a target profile
-    MAX_SLOT = 100  # slot filled with an exact match
-    MIN_SLOT = 10  # slot filled with anyone
-    LEVEL_PENALTY = 15  # per level less than 60
-    CLASS_PENALTY = 50  # penalty if not an exact class match
-    GENERAL_PENALTY = 0.7  # penalize scores of players in general
+    # well it matches a target profile, see data/group_templates.ini
+    MAX_SLOT = grouptemplates.MAX_SLOT
+    MIN_SLOT = grouptemplates.MIN_SLOT
+    LEVEL_PENALTY = grouptemplates.LEVEL_PENALTY
+    CLASS_PENALTY = grouptemplates.CLASS_PENALTY
 
     def __init__(self, group_type=constants.GT_GENERAL):
         self.group_type = group_type
@@ -164,536 +257,10 @@ class Group(DictEquals):
         rv += '(SA score: {})'.format(self.max_group_score)
         return rv
 
-    def tank_score(self) -> int:
-        """Tank group
-
-        Generate a group score compared to ideal 'Tank' group makeup:
-          - War, War
-          - Shaman w/ Torpor
-          - Bard
-          - Enchanter
-          - Any
-        """
-        # running group score as positions are filled
-        self.group_score = 0
-
-        # keep track of whether a player has been used/counted
-        available_list = self.player_list.copy()
-
-        #
-        # find top 2 tanks
-        #
-        target_list = []  # list of (score, Player object) tuples
-        for p in available_list:
-            if p.is_tank():
-                # start with top score
-                player_score = self.MAX_SLOT
-
-                # penalty points for level < 60
-                try:
-                    player_level = int(p.level)
-                except (ValueError, TypeError):
-                    player_level = 0
-                player_score -= (60 - player_level) * self.LEVEL_PENALTY
-
-                # penalty points if not a warrior
-                if p.is_knight():
-                    player_score -= self.CLASS_PENALTY
-
-                # add to target list
-                target_list.append((player_score, p))
-
-        # sort target list to find highest-scoring targets
-        sorted_target_list = sorted(target_list,
-                                    key=lambda x: x[0],
-                                    reverse=True)
-
-        # add scores for top two tanks to group score, and remove top two
-        # tanks from available_list
-        target_count = min(len(sorted_target_list), 2)
-
-        while target_count > 0:
-            player_score, player = sorted_target_list.pop(0)
-            self.group_score += player_score
-            available_list.remove(player)
-            target_count -= 1
-
-        #
-        # find torp shaman
-        #
-        target_list.clear()
-        for p in available_list:
-            if p.is_priest():
-                # start with top score
-                player_score = self.MAX_SLOT
-
-                # penalty points for level < 60
-                try:
-                    player_level = int(p.level)
-                except (ValueError, TypeError):
-                    player_level = 0
-                player_score -= (60 - player_level) * self.LEVEL_PENALTY
-
-                # penalty points if not a torp shaman
-                if not p.is_torp_shaman():
-                    player_score -= self.CLASS_PENALTY
-
-                # add to list
-                target_list.append((player_score, p))
-
-        # sort target list to find highest-scoring targets
-        sorted_target_list = sorted(target_list,
-                                    key=lambda x: x[0],
-                                    reverse=True)
-
-        # add score for top target to group score, and remove target
-        # from available_list
-        target_count = len(sorted_target_list)
-        if target_count > 0:
-            player_score, player = sorted_target_list.pop(0)
-            self.group_score += player_score
-            available_list.remove(player)
-
-        #
-        # find bard
-        #
-        target_list.clear()
-        for p in available_list:
-            if p.is_bard():
-                # start with top score
-                player_score = self.MAX_SLOT
-
-                # penalty points for level < 60
-                try:
-                    player_level = int(p.level)
-                except (ValueError, TypeError):
-                    player_level = 0
-                player_score -= (60 - player_level) * self.LEVEL_PENALTY
-
-                # add to list
-                target_list.append((player_score, p))
-
-        # sort target list to find highest-scoring targets
-        sorted_target_list = sorted(target_list,
-                                    key=lambda x: x[0],
-                                    reverse=True)
-
-        # add score for top target to group score, and remove target from
-        # available_list
-        target_count = len(sorted_target_list)
-        if target_count > 0:
-            player_score, player = sorted_target_list.pop(0)
-            self.group_score += player_score
-            available_list.remove(player)
-
-        #
-        # find ench
-        #
-        target_list.clear()
-        for p in available_list:
-            if p.is_enchanter():
-                # start with top score
-                player_score = self.MAX_SLOT
-
-                # penalty points for level < 60
-                try:
-                    player_level = int(p.level)
-                except (ValueError, TypeError):
-                    player_level = 0
-                player_score -= (60 - player_level) * self.LEVEL_PENALTY
-
-                # add to list
-                target_list.append((player_score, p))
-
-        # sort target list to find highest-scoring targets
-        sorted_target_list = sorted(target_list,
-                                    key=lambda x: x[0],
-                                    reverse=True)
-
-        # add score for top target to group score, and remove top target from
-        # available_list
-        target_count = len(sorted_target_list)
-        if target_count > 0:
-            player_score, player = sorted_target_list.pop(0)
-            self.group_score += player_score
-            available_list.remove(player)
-
-        # add scores for remaining group members - we get at least a few
-        # points for having someone in a slot, rather than an empty slot
-        # however, try to avoid duplicates of the classes already added
-        for p in available_list:
-            if not (p.is_tank() or p.is_priest() or
-                    p.is_bard() or p.is_enchanter()):
-                self.group_score += self.MIN_SLOT
-
-        # return the sum of the player scores, as matched against the ideal
-        return self.group_score
-
-    def cleric_score(self) -> int:
-        """Cleric group
-
-        Generate a group score compared to ideal 'Cleric' group makeup
-          - Cleric x5
-          - Bard (or maybe Necromancer)
-        """
-        # running group score as positions are filled
-        self.group_score = 0
-
-        # keep track of whether a player has been used/counted
-        available_list = self.player_list.copy()
-
-        #
-        # find top 5 clerics
-        #
-        target_list = []  # list of (score, Player object) tuples
-        for p in available_list:
-            if p.is_priest():
-                # start with top score
-                player_score = self.MAX_SLOT
-
-                # penalty points for level < 60
-                try:
-                    player_level = int(p.level)
-                except (ValueError, TypeError):
-                    player_level = 0
-                player_score -= (60 - player_level) * self.LEVEL_PENALTY
-
-                # penalty points if not a cleric
-                if not p.is_cleric():
-                    player_score -= self.CLASS_PENALTY
-
-                # add to target list
-                target_list.append((player_score, p))
-
-        # sort target list to find highest-scoring targets
-        sorted_target_list = sorted(target_list,
-                                    key=lambda x: x[0],
-                                    reverse=True)
-
-        # add scores for top two tanks to group score, and remove top five
-        # clerics from available_list
-        target_count = min(len(sorted_target_list), 5)
-
-        while target_count > 0:
-            player_score, player = sorted_target_list.pop(0)
-            self.group_score += player_score
-            available_list.remove(player)
-            target_count -= 1
-
-        #
-        # find bard, or possibly necro
-        #
-        target_list.clear()
-        for p in available_list:
-            if p.is_bard() or p.is_necromancer():
-                # start with top score
-                player_score = self.MAX_SLOT
-
-                # penalty points for level < 60
-                try:
-                    player_level = int(p.level)
-                except (ValueError, TypeError):
-                    player_level = 0
-                player_score -= (60 - player_level) * self.LEVEL_PENALTY
-
-                # penalty points if not a torp shaman
-                if not p.is_bard():
-                    player_score -= self.CLASS_PENALTY
-
-                # add to list
-                target_list.append((player_score, p))
-
-        # sort target list to find highest-scoring targets
-        sorted_target_list = sorted(target_list,
-                                    key=lambda x: x[0],
-                                    reverse=True)
-
-        # add score for top target to group score, and remove target
-        # from available_list
-        target_count = len(sorted_target_list)
-        if target_count > 0:
-            player_score, player = sorted_target_list.pop(0)
-            self.group_score += player_score
-            available_list.remove(player)
-
-        # return the sum of the player scores, as matched against the ideal
-        return self.group_score
-
-    def pull_score(self) -> int:
-        """Pull group
-
-        Generate a group score compared to ideal 'Pull' group makeup
-          - Monk x3
-          - Mage w/ COTH
-          - Wiz
-          - Priest
-        """
-
-        # running group score as positions are filled
-        self.group_score = 0
-
-        # keep track of whether a player has been used/counted
-        available_list = self.player_list.copy()
-
-        #
-        # find top 3 monks
-        #
-        target_list = []  # list of (score, Player object) tuples
-        for p in available_list:
-            if p.is_monk():
-                # start with top score
-                player_score = self.MAX_SLOT
-
-                # penalty points for level < 60
-                try:
-                    player_level = int(p.level)
-                except (ValueError, TypeError):
-                    player_level = 0
-                player_score -= (60 - player_level) * self.LEVEL_PENALTY
-
-                # add to target list
-                target_list.append((player_score, p))
-
-        # sort target list to find highest-scoring targets
-        sorted_target_list = sorted(target_list,
-                                    key=lambda x: x[0],
-                                    reverse=True)
-
-        # add scores for top two tanks to group score, and remove top three
-        # monks from available_list
-        target_count = min(len(sorted_target_list), 3)
-
-        while target_count > 0:
-            player_score, player = sorted_target_list.pop(0)
-            self.group_score += player_score
-            available_list.remove(player)
-            target_count -= 1
-
-        #
-        # find coth mage
-        #
-        target_list.clear()
-        for p in available_list:
-            if p.is_coth_magician():
-                # start with top score
-                player_score = self.MAX_SLOT
-
-                # penalty points for level < 60
-                try:
-                    player_level = int(p.level)
-                except (ValueError, TypeError):
-                    player_level = 0
-                player_score -= (60 - player_level) * self.LEVEL_PENALTY
-
-                # add to list
-                target_list.append((player_score, p))
-
-        # sort target list to find highest-scoring targets
-        sorted_target_list = sorted(target_list,
-                                    key=lambda x: x[0],
-                                    reverse=True)
-
-        # add score for top target to group score, and remove target
-        # from available_list
-        target_count = len(sorted_target_list)
-        if target_count > 0:
-            player_score, player = sorted_target_list.pop(0)
-            self.group_score += player_score
-            available_list.remove(player)
-
-        #
-        # find wizard
-        #
-        target_list.clear()
-        for p in available_list:
-            if p.is_wizard():
-                # start with top score
-                player_score = self.MAX_SLOT
-
-                # penalty points for level < 60
-                try:
-                    player_level = int(p.level)
-                except (ValueError, TypeError):
-                    player_level = 0
-                player_score -= (60 - player_level) * self.LEVEL_PENALTY
-
-                # add to list
-                target_list.append((player_score, p))
-
-        # sort target list to find highest-scoring targets
-        sorted_target_list = sorted(target_list,
-                                    key=lambda x: x[0],
-                                    reverse=True)
-
-        # add score for top target to group score, and remove target
-        # from available_list
-        target_count = len(sorted_target_list)
-        if target_count > 0:
-            player_score, player = sorted_target_list.pop(0)
-            self.group_score += player_score
-            available_list.remove(player)
-
-        #
-        # find priest
-        #
-        target_list.clear()
-        for p in available_list:
-            if p.is_priest():
-                # start with top score
-                player_score = self.MAX_SLOT
-
-                # penalty points for level < 60
-                try:
-                    player_level = int(p.level)
-                except (ValueError, TypeError):
-                    player_level = 0
-                player_score -= (60 - player_level) * self.LEVEL_PENALTY
-
-                # add to list
-                target_list.append((player_score, p))
-
-        # sort target list to find highest-scoring targets
-        sorted_target_list = sorted(target_list,
-                                    key=lambda x: x[0],
-                                    reverse=True)
-
-        # add score for top target to group score, and remove target
-        # from available_list
-        target_count = len(sorted_target_list)
-        if target_count > 0:
-            player_score, player = sorted_target_list.pop(0)
-            self.group_score += player_score
-            available_list.remove(player)
-
-        # return the sum of the player scores, as matched against the ideal
-        return self.group_score
-
-    def general_score(self) -> int:
-        """General group
-
-        Generate a group score compared to ideal 'General' group makeup
-          - Priest
-          - Tank
-          - Slower (Enchanter or Shaman)
-          - 3x other
-        """
-
-        # running group score as positions are filled
-        self.group_score = 0
-
-        # keep track of whether a player has been used/counted
-        available_list = self.player_list.copy()
-
-        #
-        # find priest
-        #
-        target_list = []  # list of (score, Player object) tuples
-        for p in available_list:
-            if p.is_priest():
-                # start with top score
-                player_score = self.MAX_SLOT
-
-                # penalty points for level < 60
-                try:
-                    player_level = int(p.level)
-                except (ValueError, TypeError):
-                    player_level = 0
-                player_score -= (60 - player_level) * self.LEVEL_PENALTY
-
-                # add to list
-                target_list.append((player_score, p))
-
-        # sort target list to find highest-scoring targets
-        sorted_target_list = sorted(target_list,
-                                    key=lambda x: x[0],
-                                    reverse=True)
-
-        # add score for top target to group score, and remove target
-        # from available_list
-        target_count = len(sorted_target_list)
-        if target_count > 0:
-            player_score, player = sorted_target_list.pop(0)
-            self.group_score += player_score
-            available_list.remove(player)
-
-        #
-        # find a tank
-        #
-        target_list = []  # list of (score, Player object) tuples
-        for p in available_list:
-            if p.is_tank():
-                # start with top score
-                player_score = self.MAX_SLOT
-
-                # penalty points for level < 60
-                try:
-                    player_level = int(p.level)
-                except (ValueError, TypeError):
-                    player_level = 0
-                player_score -= (60 - player_level) * self.LEVEL_PENALTY
-
-                # add to target list
-                target_list.append((player_score, p))
-
-        # sort target list to find highest-scoring targets
-        sorted_target_list = sorted(target_list,
-                                    key=lambda x: x[0],
-                                    reverse=True)
-
-        # add score for top target to group score, and remove target
-        # from available_list
-        target_count = len(sorted_target_list)
-        if target_count > 0:
-            player_score, player = sorted_target_list.pop(0)
-            self.group_score += player_score
-            available_list.remove(player)
-
-        #
-        # find a slower
-        #
-        target_list.clear()
-        for p in available_list:
-            if p.is_shaman() or p.is_enchanter():
-                # start with top score
-                player_score = self.MAX_SLOT
-
-                # penalty points for level < 60
-                try:
-                    player_level = int(p.level)
-                except (ValueError, TypeError):
-                    player_level = 0
-                player_score -= (60 - player_level) * self.LEVEL_PENALTY
-
-                # add to list
-                target_list.append((player_score, p))
-
-        # sort target list to find highest-scoring targets
-        sorted_target_list = sorted(target_list,
-                                    key=lambda x: x[0],
-                                    reverse=True)
-
-        # add score for top target to group score, and remove target
-        # from available_list
-        target_count = len(sorted_target_list)
-        if target_count > 0:
-            player_score, player = sorted_target_list.pop(0)
-            self.group_score += player_score
-            available_list.remove(player)
-
-        # add scores for remaining group members - we get at least a few
-        # points for having someone in a slot, rather than an empty slot
-        # however, try to avoid duplicates of the classes already added
-        for p in available_list:
-            if not (p.is_priest() or p.is_tank() or
-                    p.is_shaman() or p.is_enchanter()):
-                self.group_score += self.MIN_SLOT
-
-        # penalize scores for players in General groups compared to the
-        # other more specific groups, to encourage their placement in
-        # specific groups
-        self.group_score = round(self.group_score * self.GENERAL_PENALTY)
-
-        # return the sum of the player scores, as matched against the ideal
+    def score(self) -> int:
+        """Score the group against the template for its type"""
+        self.group_score = grouptemplates.GroupScorer(self.player_list).score(
+            self.group_type, range(len(self.player_list)))
         return self.group_score
 
 
@@ -708,65 +275,17 @@ class Raid(DictEquals):
         self.groups = []
 
     def add_empty_groups(self, player_count) -> None:
-
-        full_groups_needed = math.floor(player_count / 6)
-        total_groups_needed = math.ceil(player_count / 6)
-
-        self.groups.clear()
-
-        # partial group needed?
-        if total_groups_needed > full_groups_needed:
-            self.groups.append(Group(constants.GT_GENERAL))
-
-        # 1-3 groups: All General
-        if full_groups_needed == 1:
-            self.groups.append(Group(constants.GT_GENERAL))
-        if full_groups_needed == 2:
-            self.groups.append(Group(constants.GT_GENERAL))
-            self.groups.append(Group(constants.GT_GENERAL))
-        if full_groups_needed == 3:
-            self.groups.append(Group(constants.GT_GENERAL))
-            self.groups.append(Group(constants.GT_GENERAL))
-            self.groups.append(Group(constants.GT_GENERAL))
-
-        # 4 groups: General, Tank, Cleric, Pull
-        if full_groups_needed >= 4:
-            self.groups.append(Group(constants.GT_GENERAL))
-            self.groups.append(Group(constants.GT_TANK))
-            self.groups.append(Group(constants.GT_CLERIC))
-            self.groups.append(Group(constants.GT_PULL))
-
-        # 5 groups: General, Tank, Cleric, Pull, Tank
-        if full_groups_needed >= 5:
-            self.groups.append(Group(constants.GT_TANK))
-
-        # 6 groups: General, Tank, Cleric, Pull, Tank, Cleric
-        if full_groups_needed >= 6:
-            self.groups.append(Group(constants.GT_CLERIC))
-
-        # 7+ groups: General, Tank, Cleric, Pull, Tank, Cleric, (n - 6) General
-        if full_groups_needed >= 7:
-            cnt = 7
-            while cnt <= full_groups_needed:
-                self.groups.append(Group(constants.GT_GENERAL))
-                cnt += 1
-
-        # now sort the groups into a sensible order
-        sort_order = {constants.GT_PULL: 0,
-                      constants.GT_TANK: 1,
-                      constants.GT_CLERIC: 2,
-                      constants.GT_GENERAL: 3}
-        self.groups.sort(key=lambda val: sort_order[val.group_type])
+        """Replace the groups with empty ones of the types in the layout"""
+        self.groups[:] = [
+            Group(group_type) for group_type in
+            grouptemplates.get_templates().layout.group_types(player_count)]
 
     def __repr__(self):
         return '\n'.join([str(g) for g in self.groups])
 
 
 class CredittLog(DictEquals):
-    time = None
-    user = None
-    message = None
-    raw_message = None
+    __slots__ = _fields = ('time', 'user', 'message', 'raw_message')
 
     def __init__(self, time, user, message, raw_message):
         self.time = time
@@ -784,10 +303,7 @@ class CredittLog(DictEquals):
 
 
 class GratssLog(DictEquals):
-    time = None
-    user = None
-    message = None
-    raw_message = None
+    __slots__ = _fields = ('time', 'user', 'message', 'raw_message')
 
     def __init__(self, time, user, message, raw_message):
         self.time = time
@@ -805,11 +321,10 @@ class GratssLog(DictEquals):
 
 
 class WhoLog(DictEquals):
-    time = None
-    log = None
-    raidtick = False
-    tick_name = None
-    zone = None
+    _fields = ('time', 'log', 'raidtick', 'tick_name', 'zone')
+    # export_cache holds the (settings, lines) last rendered for export by
+    # utils.parse_tick_for_export; it isn't saved or compared
+    __slots__ = _fields + ('export_cache',)
 
     def __init__(self, time, log, raidtick=False, tick_name=None, zone=None):
         super().__init__()
@@ -818,6 +333,11 @@ class WhoLog(DictEquals):
         self.raidtick = raidtick
         self.tick_name = tick_name
         self.zone = zone
+        self.export_cache = None
+
+    def changed(self):
+        """Call after adding or removing players, to render them again"""
+        self.export_cache = None
 
     def eqtime(self, allow_eastern=False) -> str:
         # import at runtime rather than on load to avoid circular error
@@ -829,20 +349,30 @@ class WhoLog(DictEquals):
     def raidtick_display(self):
         return "✔️" if self.raidtick else ""  # or "❌"?
 
-    def alliance_count(self):
+    def guild_counts(self) -> dict:
+        # Lazily loaded ticks know their counts without reading the players
+        summary = getattr(self.log, 'summary', None)
+        if summary is not None:
+            return summary
+        return dict(collections.Counter(
+            player.guild for player in self.log.values()))
+
+    def detail_summary(self) -> dict:
+        return self.guild_counts()
+
+    def alliance_pops(self) -> dict:
         pops = {alliance: 0 for alliance in config.ALLIANCES}
-        for player in self.log.values():
-            alliance = config.ALLIANCE_MAP.get(player.guild)
+        for guild, count in self.guild_counts().items():
+            alliance = config.ALLIANCE_MAP.get(guild)
             if alliance:
-                pops[alliance] += 1
-        return pops[config.DEFAULT_ALLIANCE]
+                pops[alliance] += count
+        return pops
+
+    def alliance_count(self):
+        return self.alliance_pops()[config.DEFAULT_ALLIANCE]
 
     def populations(self):
-        pops = {alliance: 0 for alliance in config.ALLIANCES}
-        for player in self.log.values():
-            alliance = config.ALLIANCE_MAP.get(player.guild)
-            if alliance:
-                pops[alliance] += 1
+        pops = self.alliance_pops()
         pop_text = None  # '1-24 BL // 25-48 Kingdom //49-61 VCR'
         for alliance, pop in pops.items():
             alliance_text = "{}: {}".format(alliance, pop)
@@ -854,7 +384,7 @@ class WhoLog(DictEquals):
 
     @classmethod
     def from_json(cls, **kwargs) -> DictEquals:
-        kwargs['time'] = dateutil.parser.parse(kwargs['time'])
+        kwargs['time'] = parse_time(kwargs['time'])
         return cls(**kwargs)
 
 
@@ -869,8 +399,7 @@ class PopulationPreview(DictEquals):
 
 
 class KillTimer(DictEquals):
-    time = None
-    name = None
+    __slots__ = _fields = ('time', 'name')
 
     def __init__(self, time, name):
         super().__init__()
@@ -882,11 +411,8 @@ class KillTimer(DictEquals):
 
 
 class ItemDrop(DictEquals):
-    name = None
-    reporter = None
-    timestamp = None
-    uuid = None
-    min_dkp_override = None
+    __slots__ = _fields = ('name', 'reporter', 'timestamp', 'uuid',
+                           'min_dkp_override')
 
     def __init__(self, name, reporter, timestamp, uuid=None,
                  min_dkp_override=None):
@@ -940,15 +466,25 @@ class Auction(DictEquals):
     def __init__(self, item: ItemDrop, start_time=None, **_):
         self.item = item
         if start_time:
-            self.start_time = dateutil.parser.DEFAULTPARSER.parse(start_time)
+            self.start_time = parse_time(start_time)
         else:
             self.start_time = datetime.datetime.now()
+        self.schedule_alert()
 
-        if self.time_remaining().seconds > 0:
-            self._alert_timer = threading.Timer(
-                self.time_remaining().seconds, self._do_alert)
-            config.AUCTION_ALERT_TIMERS.append(self._alert_timer)
-            self._alert_timer.start()
+    def schedule_alert(self):
+        """Time the ending alert for the time remaining, e.g. once changed."""
+        remaining = self.time_remaining().seconds
+        if self._alert_timer:
+            if remaining > 0:
+                self._alert_timer.reschedule(remaining)
+            else:
+                self._alert_timer.cancel()
+        elif remaining > 0:
+            # import at runtime rather than on load to avoid circular error
+            # pylint: disable=import-outside-toplevel
+            from ninjalooter import utils
+            self._alert_timer = utils.get_scheduler().schedule(
+                remaining, self._do_alert)
 
     def _do_alert(self):
         # import at runtime rather than on load to avoid circular error
@@ -958,7 +494,6 @@ class Auction(DictEquals):
             "Auction Ending Soon",
             "The auction for '%s' is ending soon!" % self.item.name
         )
-        config.AUCTION_ALERT_TIMERS.remove(self._alert_timer)
         utils.alert_sound(config.AUC_EXPIRING_SOUND)
 
     def add(self, number: int, player: str) -> bool:
@@ -967,6 +502,17 @@ class Auction(DictEquals):
     def highest(self) -> list:
         raise NotImplementedError()
 
+    def detail_summary(self) -> list:
+        return self.highest()
+
+    @staticmethod
+    def stored_highest(data) -> list:
+        """The highest bids saved with lazily loaded bids or rolls."""
+        summary = getattr(data, 'summary', None)
+        if summary is None:
+            return None
+        return [tuple(entry) for entry in summary]
+
     def bid_text(self) -> str:
         raise NotImplementedError()
 
@@ -1029,6 +575,177 @@ class Auction(DictEquals):
             self._alert_timer.cancel()
 
 
+class Bid(DictEquals):
+    """One entry in a DKP auction's bid ledger.
+
+    An entry without a player withdraws the bid of that amount.
+    """
+    __slots__ = _fields = ('time', 'player', 'number', 'channel')
+
+    def __init__(self, time, player, number, channel=None):
+        self.time = time
+        self.player = player
+        self.number = number
+        self.channel = channel
+
+    @classmethod
+    def from_json(cls, **kwargs) -> DictEquals:
+        if kwargs.get('time'):
+            kwargs['time'] = parse_time(kwargs['time'])
+        return cls(**kwargs)
+
+
+class BidLedger(collections.abc.MutableMapping):
+    """The bids of a DKP auction, kept as an append-only ledger.
+
+    Every bid is recorded in order with its time, bidder and channel, and
+    removing one (e.g. when bids are edited by hand) appends a withdrawal
+    rather than rewriting the history. The ledger is also the mapping of
+    amount to bidder that `DKPAuction.bids` has always been, and is saved
+    as one. The leader and each bidder's latest bid are kept up to date as
+    entries are added, rather than searched for on every refresh.
+
+    History that was stored lazily isn't read until it's needed.
+    """
+
+    def __init__(self, bids=None, history=None):
+        # Read on first use, from the history if there is one
+        self._source = (bids, history)
+        self._entries = None
+        self._current = None
+        self._latest = None
+        self._leader = None
+
+    def _load(self) -> None:
+        if self._entries is not None:
+            return
+        bids, history = self._source
+        self._source = (None, None)
+        self._entries = []
+        self._current = {}
+        self._latest = {}
+        if history is not None:
+            if isinstance(history, collections.abc.Mapping):
+                # Stored as a record, or saved from one
+                history = [history[key] for key in sorted(history, key=int)]
+            for entry in history:
+                self._apply(entry)
+        elif bids:
+            # Saved before there was a ledger, so only the amounts are known
+            for number in sorted(bids, key=float):
+                self._apply(Bid(None, bids[number], float(number)))
+
+    def _apply(self, entry: Bid) -> None:
+        self._entries.append(entry)
+        replaced = self._current.pop(entry.number, None)
+        if entry.player is not None:
+            self._current[entry.number] = entry
+            self._latest[entry.player] = entry
+            if self._leader is None or entry.number >= self._leader.number:
+                self._leader = entry
+        if replaced is not None and (
+                replaced is self._leader or
+                self._latest.get(replaced.player) is replaced):
+            self._reindex()
+
+    def _reindex(self) -> None:
+        self._latest = {}
+        self._leader = None
+        for entry in sorted(self._current.values(),
+                            key=lambda bid: bid.number):
+            self._latest[entry.player] = entry
+            self._leader = entry
+
+    def bid(self, number: float, player: str, time=None,
+            channel: str = None) -> Bid:
+        """Record a bid, which leads if it's at least the highest."""
+        self._load()
+        entry = Bid(time, player, number, channel)
+        self._apply(entry)
+        return entry
+
+    def leader(self) -> Bid:
+        self._load()
+        return self._leader
+
+    def latest(self, player: str) -> Bid:
+        """The last standing bid by `player`, if any."""
+        self._load()
+        return self._latest.get(player)
+
+    @property
+    def history(self) -> list:
+        """Every entry in the order it was made, which must not be changed."""
+        self._load()
+        return self._entries
+
+    def stored_bids(self):
+        """The amount to bidder mapping as it is to be saved, for older
+        versions, without reading lazily stored history if it came with one.
+        """
+        if self._entries is None:
+            bids, history = self._source
+            if bids is not None and history is not None:
+                return bids
+        return dict(self.items())
+
+    def stored_history(self):
+        """The history as it is to be saved, without reading it if unused."""
+        if self._entries is None:
+            bids, history = self._source
+            if history is not None:
+                return history
+        return self.history
+
+    @property
+    def loaded(self) -> bool:
+        if self._entries is not None:
+            return True
+        return all(getattr(source, 'loaded', True)
+                   for source in self._source if source is not None)
+
+    @property
+    def summary(self):
+        """The leader stored with lazily loaded history, until it's read."""
+        if self._entries is not None:
+            return None
+        bids, history = self._source
+        return getattr(history if history is not None else bids,
+                       'summary', None)
+
+    def __getitem__(self, number):
+        self._load()
+        return self._current[number].player
+
+    def __setitem__(self, number, player):
+        self.bid(number, player)
+
+    def __delitem__(self, number):
+        self._load()
+        if number not in self._current:
+            raise KeyError(number)
+        self._apply(Bid(None, None, number))
+
+    def __iter__(self):
+        self._load()
+        return iter(self._current)
+
+    def __len__(self):
+        self._load()
+        return len(self._current)
+
+    def __contains__(self, number):
+        self._load()
+        return number in self._current
+
+    def __repr__(self):
+        return "BidLedger(%r)" % dict(self.items())
+
+    def clear(self):
+        for number in list(self):
+            del self[number]
+
+
 class DKPAuction(Auction):
     bids = None
     min_dkp = None
@@ -1037,16 +754,24 @@ class DKPAuction(Auction):
     _second_main_cap_alerted = False
 
     def __init__(self, item: ItemDrop, alliance: str, bids=None,
-                 min_dkp=None, **kwargs):
+                 min_dkp=None, ledger=None, **kwargs):
         super().__init__(item, **kwargs)
         self.alliance = alliance
-        if bids:
-            self.bids = {float(bid): name for bid, name in bids.items()}
+        if isinstance(bids, BidLedger):
+            self.bids = bids
         else:
-            self.bids = dict()
+            self.bids = BidLedger(bids, ledger)
         self.min_dkp = min_dkp or self.item.min_dkp()
 
-    def add(self, number: float, player: str) -> bool:
+    def to_json(self):
+        auction_json = super().to_json()
+        # The bids are kept for older versions, which only know about those
+        auction_json['bids'] = self.bids.stored_bids()
+        auction_json['ledger'] = self.bids.stored_history()
+        return auction_json
+
+    def add(self, number: float, player: str, time=None,
+            channel: str = None) -> bool:
         if not number:
             # Not a real bid
             LOG.info("%s attempted to bid for %s but didn't post a number",
@@ -1057,9 +782,10 @@ class DKPAuction(Auction):
             LOG.info("%s attempted to bid for %s but bid too low: %.1f < %d",
                      player, self.item, number, self.min_dkp)
             return False
-        if not self.bids or number > max(self.bids):
+        leader = self.bids.leader()
+        if leader is None or number > leader.number:
             # Valid bid
-            self.bids[number] = player
+            self.bids.bid(number, player, time, channel)
             LOG.info("Bid added for %s: %s = %.1f",
                      self.item, player, number)
             return True
@@ -1069,12 +795,14 @@ class DKPAuction(Auction):
         return False
 
     def highest(self) -> list:
-        if not self.bids:
+        stored = self.stored_highest(self.bids)
+        if stored is not None:
+            return stored
+        leader = self.bids.leader()
+        if leader is None:
             # LOG.debug("No bids yet for %s", self.item)
             return list()
-        bid = max(self.bids)
-        bidder = self.bids[bid]
-        return [(bidder, bid)]  # noqa
+        return [(leader.player, leader.number)]  # noqa
 
     def bid_text(self) -> str:
         current_bid = self.highest_number()
@@ -1189,6 +917,9 @@ class RandomAuction(Auction):
         return True
 
     def highest(self) -> list:
+        stored = self.stored_highest(self.rolls)
+        if stored is not None:
+            return stored
         if not self.rolls:
             LOG.debug("No rolls yet for %s", self.item)
             return list()
@@ -1251,6 +982,7 @@ EVT_SHOW_RAID_OVERVIEW = wx.NewId()
 EVT_APP_CLEAR = wx.NewId()
 EVT_APP_RELOAD = wx.NewId()
 EVT_IGNORE = wx.NewId()
+EVT_SCHEDULED_TASK = wx.NewId()
 
 
 class LogEvent(wx.PyEvent):
@@ -1335,8 +1067,12 @@ class GratssEvent(LogEvent):  # pylint: disable=too-few-public-methods
 
 
 class CalcRaidGroupsEvent(LogEvent):  # pylint: disable=too-few-public-methods
-    def __init__(self):
+    def __init__(self, raid=None, score=None, solver=None, done=True):
         super().__init__()
+        self.raid = raid
+        self.score = score
+        self.solver = solver
+        self.done = done
         self.SetEventType(EVT_CALC_RAIDGROUPS)
 
 
@@ -1364,3 +1100,11 @@ class IgnoreEvent(LogEvent):  # pylint: disable=too-few-public-methods
     def __init__(self):
         super().__init__()
         self.SetEventType(EVT_IGNORE)
+
+
+class ScheduledTaskEvent(LogEvent):  # pylint: disable=too-few-public-methods
+    def __init__(self, func, args):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.SetEventType(EVT_SCHEDULED_TASK)
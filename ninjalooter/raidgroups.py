@@ -1,9 +1,131 @@
+import collections
+import concurrent.futures
+import multiprocessing
+import os
 import random
 import math
+import threading
+import time
 
-from ninjalooter import constants
+from ninjalooter import grouptemplates
+from ninjalooter import logger
 from ninjalooter import models
 
+# This is the app logger, not related to EQ logs
+LOG = logger.getLogger(__name__)
+
+GROUP_SIZE = grouptemplates.GROUP_SIZE
+
+# The outcome of GroupBuilder.build_groups_parallel: the master seed the
+# chain seeds were drawn from, the seed and score of the best chain, the
+# (seed, score) of every chain that finished, and how many chains were cut
+# short or didn't finish within the time budget
+MultiStartResult = collections.namedtuple(
+    'MultiStartResult',
+    ('master_seed', 'seed', 'score', 'scores', 'incomplete'))
+
+# Set in worker processes, to stop their chains early
+_WORKER_STOP = None
+
+
+def chain_seeds(master_seed: int, chains: int) -> list:
+    """The seeds of each annealing chain started from a master seed"""
+    rng = random.Random(master_seed)
+    return [rng.getrandbits(32) for _ in range(chains)]
+
+
+def _init_worker(stop) -> None:
+    global _WORKER_STOP
+    _WORKER_STOP = stop
+
+
+def _run_chain(players, seed, deadline, max_moves=None, cancel=None,
+               progress=None, previous=None, move_cost=0, candidates=1):
+    """Build groups with one seeded chain
+
+    Runs in a worker process, so players come back as indexes into the list
+    that was passed in.
+    """
+    positions = {id(player): ndx for ndx, player in enumerate(players)}
+    builder = GroupBuilder(rng=random.Random(seed))
+    score = builder.build_groups(
+        list(players), deadline=deadline, cancel=cancel or _WORKER_STOP,
+        progress=progress, max_moves=max_moves, keep_best=True,
+        previous=previous, move_cost=move_cost, candidates=candidates)
+    groups = [[positions[id(player)] for player in gg.player_list]
+              for gg in builder.raid.groups]
+    group_scores = [(gg.group_score, gg.max_group_score)
+                    for gg in builder.raid.groups]
+    return score, groups, group_scores, builder.stopped_early
+
+
+def _make_raid(players, groups, group_scores) -> models.Raid:
+    raid = models.Raid()
+    raid.add_empty_groups(len(players))
+    for gg, members, (group_score, max_score) in zip(
+            raid.groups, groups, group_scores):
+        gg.player_list = [players[ndx] for ndx in members]
+        gg.group_score = group_score
+        gg.max_group_score = max_score
+    return raid
+
+
+def min_cost_assignment(cost) -> list:
+    """Assign each row of a cost matrix to its own column, at least cost
+
+    This is the Hungarian algorithm, in O(rows^2 * columns).
+
+    :param cost: a list of rows of costs, with no more rows than columns
+    :return: the column assigned to each row
+    """
+    rows = len(cost)
+    cols = len(cost[0]) if rows else 0
+    # potentials, and the row (1-based) matched to each column; column 0 is
+    # where the row being added starts
+    row_pot = [0] * (rows + 1)
+    col_pot = [0] * (cols + 1)
+    match = [0] * (cols + 1)
+    way = [0] * (cols + 1)
+    for row in range(1, rows + 1):
+        match[0] = row
+        col0 = 0
+        min_slack = [math.inf] * (cols + 1)
+        used = [False] * (cols + 1)
+        while True:
+            used[col0] = True
+            row0 = match[col0]
+            row_cost = cost[row0 - 1]
+            delta = math.inf
+            col1 = 0
+            for col in range(1, cols + 1):
+                if not used[col]:
+                    slack = row_cost[col - 1] - row_pot[row0] - col_pot[col]
+                    if slack < min_slack[col]:
+                        min_slack[col] = slack
+                        way[col] = col0
+                    if min_slack[col] < delta:
+                        delta = min_slack[col]
+                        col1 = col
+            for col in range(cols + 1):
+                if used[col]:
+                    row_pot[match[col]] += delta
+                    col_pot[col] -= delta
+                else:
+                    min_slack[col] -= delta
+            col0 = col1
+            if match[col0] == 0:
+                break
+        # flip the augmenting path
+        while col0:
+            col1 = way[col0]
+            match[col0] = match[col1]
+            col0 = col1
+    assignment = [None] * rows
+    for col in range(1, cols + 1):
+        if match[col]:
+            assignment[match[col] - 1] = col - 1
+    return assignment
+
 
 class GroupBuilder:
     """Group Builder
@@ -14,28 +136,345 @@ class GroupBuilder:
     INITIAL_ANNEAL_TEMP = 1500.0
     COOLING_RATE = 0.9
     INNER_LOOP_X = 10
+    # starting temperature when starting from previous groups
+    WARM_ANNEAL_TEMP = 100.0
+    # how often to check on chains running in other processes, in seconds
+    POLL_INTERVAL = 0.1
+    # group scores to remember before starting over, to bound memory
+    SCORE_CACHE_SIZE = 50000
 
-    def __init__(self):
+    def __init__(self, rng=None):
         self.raid = models.Raid()
+        # random.Random to draw from, or the random module itself
+        self.rng = rng or random
+        self.scorer = None
+        # whether the last build was stopped before converging
+        self.stopped_early = False
+        # group score by group type and members, as the same groups come up
+        # again and again while annealing
+        self._score_cache = {}
+
+    def score_group(self, group_type: str, members) -> int:
+        """Score a group, or look up its score if it has been seen before
+
+        Ties between candidates for a slot go to the first member listed, so
+        the order of the members is part of what is looked up. The cache is
+        emptied once it holds SCORE_CACHE_SIZE groups; groups seen early on
+        in a search rarely come up again once it has cooled.
+        """
+        key = (group_type, tuple(members))
+        score = self._score_cache.get(key)
+        if score is None:
+            if len(self._score_cache) >= self.SCORE_CACHE_SIZE:
+                self._score_cache.clear()
+            score = self._score_cache[key] = self.scorer.score(
+                group_type, members)
+        return score
+
+    def build_groups_parallel(self, master_player_list, chains=8,
+                              master_seed=None, budget=None, processes=None,
+                              max_moves=None, cancel=None, progress=None,
+                              previous=None, move_cost=0,
+                              candidates=1) -> MultiStartResult:
+        """Build groups with several annealing chains and keep the best
+
+        Each chain is seeded from `master_seed`, so the same players and
+        master seed give the same groups, as long as every chain finishes
+        within the `budget` seconds. Chains still running at the deadline, or
+        when `cancel` is set, stop with the best groups they have found, and
+        chains that haven't started are dropped.
+
+        :param master_player_list: a list of Player objects, reordered like
+            build_groups does
+        :param chains: how many chains to run
+        :param master_seed: seed for the chain seeds, random if not given
+        :param budget: wall-clock seconds to allow, unlimited if not given
+        :param processes: worker processes, one per CPU if not given; with
+            1 the chains run one after another in this process
+        :param max_moves: moves to allow each chain, unlimited if not given
+        :param cancel: a threading.Event to stop early with
+        :param progress: called with the score and Raid of each better set
+            of groups found
+        :param previous: a Raid for each chain to start from, as in
+            build_groups
+        :param move_cost: the cost of moving a player from their group in
+            `previous`
+        :param candidates: swaps to score for each move, as in build_groups
+        :return: the seeds and scores of the run
+        """
+        if master_seed is None:
+            master_seed = random.SystemRandom().getrandbits(32)
+        seeds = chain_seeds(master_seed, chains)
+        players = list(master_player_list)
+        # worker processes don't share a monotonic clock with us
+        deadline = time.time() + budget if budget is not None else None
+        processes = min(processes or os.cpu_count() or 1, chains)
+        best_score = None
+
+        def report(score, raid):
+            nonlocal best_score
+            if best_score is None or score > best_score:
+                best_score = score
+                if progress:
+                    progress(score, raid)
+
+        def stopped():
+            return ((cancel is not None and cancel.is_set()) or
+                    (deadline is not None and time.time() >= deadline))
+
+        results = [None] * chains
+        if processes == 1:
+            for chain, seed in enumerate(seeds):
+                if stopped():
+                    break
+                results[chain] = _run_chain(
+                    players, seed, deadline, max_moves, cancel, report,
+                    previous, move_cost, candidates)
+        else:
+            stop = multiprocessing.Event()
+            executor = concurrent.futures.ProcessPoolExecutor(
+                processes, initializer=_init_worker, initargs=(stop,))
+            futures = {}
+            try:
+                futures = {
+                    executor.submit(_run_chain, players, seed, deadline,
+                                    max_moves, None, None, previous,
+                                    move_cost, candidates): chain
+                    for chain, seed in enumerate(seeds)}
+                pending = set(futures)
+                while pending:
+                    if stopped():
+                        # allow running chains to hand in their best so far
+                        stop.set()
+                        done, pending = concurrent.futures.wait(pending, 1)
+                        pending = ()
+                    else:
+                        done, pending = concurrent.futures.wait(
+                            pending, self.POLL_INTERVAL,
+                            concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        result = results[futures[future]] = future.result()
+                        report(result[0], _make_raid(players, *result[1:3]))
+            finally:
+                # shutdown() only takes cancel_futures from Python 3.9
+                for future in futures:
+                    future.cancel()
+                executor.shutdown(wait=False)
+
+        finished = [chain for chain, result in enumerate(results) if result]
+        if not finished:
+            # not even one chain finished in time; at least return groups
+            finished = [0]
+            results[0] = _run_chain(players, seeds[0], time.time(),
+                                    previous=previous, move_cost=move_cost,
+                                    candidates=candidates)
+        # ties go to the first chain, to keep results reproducible
+        best = max(finished, key=lambda chain: results[chain][0])
+        score, groups, group_scores, _ = results[best]
+
+        self.raid = _make_raid(players, groups, group_scores)
+        master_player_list[:] = [player for gg in self.raid.groups
+                                 for player in gg.player_list]
+
+        return MultiStartResult(
+            master_seed, seeds[best], score,
+            [(seeds[chain], results[chain][0]) for chain in finished],
+            sum(1 for result in results if not result or result[3]))
+
+    def _draw_swap(self, player_count) -> tuple:
+        """Two different raid positions to swap"""
+        from_pos = self.rng.randrange(player_count)
+        # ensure from/to aren't the same position
+        to_pos = from_pos
+        while to_pos == from_pos:
+            to_pos = self.rng.randrange(player_count)
+        return from_pos, to_pos
+
+    def _warm_start(self, players, group_types, groups, previous):
+        """Lay out players the way the previous groups had them
+
+        Previous groups are matched to new ones by type, in order, so the
+        first Cleric group is still the first Cleric group even if the
+        number of groups changed.
 
-    def build_groups(self, master_player_list) -> int:
+        :return: the new groups, and the index of each player's group or
+            None if they are new here
+        """
+        by_type = collections.defaultdict(list)
+        for group_ndx, group_type in enumerate(group_types):
+            by_type[group_type].append(group_ndx)
+        positions = {player.name: ndx for ndx, player in enumerate(players)}
+        warm_groups = [[] for _ in groups]
+        home = [None] * len(players)
+        for group_type, names in previous:
+            if not by_type[group_type]:
+                continue
+            group_ndx = by_type[group_type].pop(0)
+            for name in names:
+                ndx = positions.get(name)
+                if (ndx is not None and home[ndx] is None and
+                        len(warm_groups[group_ndx]) < len(groups[group_ndx])):
+                    warm_groups[group_ndx].append(ndx)
+                    home[ndx] = group_ndx
+        rest = iter([ndx for ndx in range(len(players)) if home[ndx] is None])
+        for members, size in zip(warm_groups, map(len, groups)):
+            members.extend(next(rest) for _ in range(size - len(members)))
+        return warm_groups, home
+
+    def build_groups_greedy(self, master_player_list, polish_moves=0) -> int:
+        """Fill the template slots of each group directly, without annealing
+
+        Every slot of every group is given a value for each player, from
+        the same tables the groups are scored with: what the player scores
+        in that slot, or as a filler if they can't fill it. Players are then
+        assigned to slots for the highest total value with
+        min_cost_assignment. This is deterministic and takes a fraction of
+        the time of annealing, though the groups are scored by filling
+        slots in order, so they can score a little differently than the
+        assignment valued them.
+
+        :param master_player_list: a list of Player objects, reordered to
+            match the groups
+        :param polish_moves: if set, improve the groups with a short
+            annealing run of about this many moves, starting from them
+        :return: the group's score
+        """
+        self.stopped_early = False
+        player_count = len(master_player_list)
+        self.raid.add_empty_groups(player_count)
+        self.scorer = grouptemplates.GroupScorer(master_player_list)
+        self._score_cache.clear()
+        players = self.scorer.players
+
+        # one column of values for each place in each group
+        columns = []
+        column_groups = []
+        for group_ndx, gg in enumerate(self.raid.groups):
+            size = min(GROUP_SIZE, player_count - group_ndx * GROUP_SIZE)
+            slots, filler, weight, _ = self.scorer.table(gg.group_type)
+            filler = filler or (0,) * player_count
+            places = [[filler[ndx] if score is None else score
+                       for ndx, score in enumerate(scores)]
+                      for count, scores in slots
+                      for _ in range(count)][:size]
+            places.extend([filler] * (size - len(places)))
+            columns.extend([value * weight for value in place]
+                           for place in places)
+            column_groups.extend([group_ndx] * size)
+
+        # highest value is lowest cost
+        assignment = min_cost_assignment(
+            [[-column[ndx] for column in columns]
+             for ndx in range(player_count)])
+        # members in the order of their places, so ties go the same way
+        groups = [[] for _ in self.raid.groups]
+        for ndx in sorted(range(player_count), key=assignment.__getitem__):
+            groups[column_groups[assignment[ndx]]].append(ndx)
+        score = 0
+        for gg, members in zip(self.raid.groups, groups):
+            gg.player_list = [players[ndx] for ndx in members]
+            gg.group_score = gg.max_group_score = self.score_group(
+                gg.group_type, members)
+            score += gg.group_score
+        master_player_list[:] = [player for gg in self.raid.groups
+                                 for player in gg.player_list]
+
+        if polish_moves:
+            score = self.build_groups(
+                master_player_list, max_moves=polish_moves, keep_best=True,
+                previous=self.raid)
+        return score
+
+    def build_groups(self, master_player_list, deadline=None, cancel=None,
+                     progress=None, max_moves=None, keep_best=False,
+                     previous=None, move_cost=0, candidates=1) -> int:
         """Use simulated annealing to generate groups from the a player list
 
+        Players are encoded by a GroupScorer once, then moved around as
+        indexes. Each move swaps two players, so at most two groups change
+        and only those are rescored; the raid score is kept as a running
+        total.
+
+        The search can be stopped early with a deadline, a cancel token or a
+        number of moves, which are checked after each temperature level. The
+        best groups found by the end of a level are kept, and are what is
+        returned if the search is stopped, or with `keep_best` even if it
+        converged on something worse.
+
+        Given the `previous` groups of the raid, players start in the same
+        group as before where they can, and only new players and those
+        whose group is gone or full are placed fresh. The search then starts
+        cooler, and each player moved away from their group costs
+        `move_cost` points, so a few joins or leaves don't reshuffle
+        everyone.
+
+        With more than one `candidates`, each move draws that many swaps,
+        scores them all with GroupScorer.swap_scores, and tries the best of
+        them, so each level takes fewer moves to find improvements.
+
         :param master_player_list: a list of Player objects
         :type master_player_list: list(ninjalooter.models.Player)
-        :return: the group's score
+        :param deadline: time.time() to stop by, even if not converged
+        :param cancel: stop once this threading.Event is set
+        :param progress: called with the score and Raid of each better set
+            of groups found at the end of a level
+        :param max_moves: stop after about this many moves
+        :param keep_best: return the best groups found at the end of a level
+            rather than the last
+        :param previous: a Raid to start from
+        :param move_cost: the cost of moving a player from their group in
+            `previous`
+        :param candidates: how many swaps to score for each move
+        :return: the group's score, less any move costs
         """
+        rng = self.rng
+        self.stopped_early = False
 
-        # start by shuffling the input, just for good measure
-        random.shuffle(master_player_list)
+        if previous is None:
+            # start by shuffling the input, just for good measure
+            rng.shuffle(master_player_list)
+        else:
+            # read it before self.raid is refilled, in case they're the same
+            previous = [(gg.group_type, [player.name
+                                         for player in gg.player_list])
+                        for gg in previous.groups]
 
         # how many groups are needed?  get them created and added to raid
         player_count = len(master_player_list)
         self.raid.add_empty_groups(player_count)
+        self.scorer = grouptemplates.GroupScorer(master_player_list)
+        self._score_cache.clear()
+        players = self.scorer.players
+
+        # fill the groups in order from the player list, or from where
+        # players were before, and score them
+        group_types = [gg.group_type for gg in self.raid.groups]
+        groups = [list(range(group_ndx * GROUP_SIZE,
+                             min((group_ndx + 1) * GROUP_SIZE, player_count)))
+                  for group_ndx in range(len(group_types))]
+        home = None
+        if previous is not None:
+            groups, home = self._warm_start(players, group_types, groups,
+                                            previous)
+        group_scores = [self.score_group(group_type, members)
+                        for group_type, members in zip(group_types, groups)]
+        max_group_scores = list(group_scores)
+        raid_score = sum(group_scores)
+        moved = 0
 
         # initial conditions for SA iteration
-        temp = 1.0 * self.INITIAL_ANNEAL_TEMP
-        current_score = -999
+        if home is None:
+            temp = 1.0 * self.INITIAL_ANNEAL_TEMP
+            current_score = -999
+        else:
+            temp = 1.0 * self.WARM_ANNEAL_TEMP
+            current_score = raid_score
+
+        # the best groups at the end of a level, in case we stop early
+        best_score = current_score
+        best_groups = ([list(members) for members in groups],
+                       list(max_group_scores))
+        moves = 0
 
         # SA iteration outer loop_count
         converged = False
@@ -45,87 +484,143 @@ class GroupBuilder:
             # result in improvements
             accepted_moves = 0
             loop_count = self.INNER_LOOP_X * player_count
+            moves += loop_count
             while loop_count > 0:
 
                 # swap two random players
-                from_pos = random.randrange(player_count)
-
-                # ensure from/to aren't the same position
-                to_pos = from_pos
-                while to_pos == from_pos:
-                    to_pos = random.randrange(player_count)
+                from_pos, to_pos = self._draw_swap(player_count)
+                if candidates > 1:
+                    # or the best of several
+                    swaps = [(from_pos, to_pos)]
+                    swaps.extend(self._draw_swap(player_count)
+                                 for _ in range(candidates - 1))
+                    swap_scores = self.scorer.swap_scores(
+                        groups, group_types, group_scores, swaps,
+                        score=self.score_group)
+                    from_pos, to_pos = swaps[
+                        swap_scores.index(max(swap_scores))]
 
                 # do the swap
-                master_player_list[to_pos], master_player_list[from_pos] = (
-                    master_player_list[from_pos], master_player_list[to_pos])
-
-                # fill the groups with the revised player list
-                player_ndx = 0
-                group_ndx = 0
-                gg = None
-                while player_ndx < player_count:
-
-                    # use mod function to know when to get next group
-                    if (player_ndx % 6) == 0:
-                        gg = self.raid.groups[group_ndx]
-                        gg.player_list.clear()
-                        group_ndx += 1
-
-                    gg.player_list.append(master_player_list[player_ndx])
-                    player_ndx += 1
-
-                # get group score depending on what template type is
-                # being requested
-                for gg in self.raid.groups:
-                    if gg.group_type == constants.GT_TANK:
-                        gg.tank_score()
-                    elif gg.group_type == constants.GT_CLERIC:
-                        gg.cleric_score()
-                    elif gg.group_type == constants.GT_PULL:
-                        gg.pull_score()
-                    elif gg.group_type == constants.GT_GENERAL:
-                        gg.general_score()
-
-                # what is score of new combination
-                new_score = 0
-                for gg in self.raid.groups:
-                    new_score += gg.group_score
+                from_ndx, from_slot = divmod(from_pos, GROUP_SIZE)
+                to_ndx, to_slot = divmod(to_pos, GROUP_SIZE)
+                from_members = groups[from_ndx]
+                to_members = groups[to_ndx]
+                from_members[from_slot], to_members[to_slot] = (
+                    to_members[to_slot], from_members[from_slot])
+
+                # rescore only the groups the players moved between
+                old_scores = (group_scores[from_ndx], group_scores[to_ndx])
+                group_scores[from_ndx] = self.score_group(
+                    group_types[from_ndx], from_members)
+                new_raid_score = (raid_score - old_scores[0] +
+                                  group_scores[from_ndx])
+                new_moved = moved
+                if from_ndx != to_ndx:
+                    group_scores[to_ndx] = self.score_group(
+                        group_types[to_ndx], to_members)
+                    new_raid_score += group_scores[to_ndx] - old_scores[1]
+                    if home is not None:
+                        # players without a home group can go anywhere
+                        for ndx, left, joined in (
+                                (to_members[to_slot], from_ndx, to_ndx),
+                                (from_members[from_slot], to_ndx, from_ndx)):
+                            if home[ndx] is not None:
+                                new_moved += ((home[ndx] != joined) -
+                                              (home[ndx] != left))
+                new_score = new_raid_score - move_cost * new_moved
 
                 # in this case, higher scores = better
                 chance = math.exp(-1.0*abs((new_score-current_score))/temp)
-                rv = random.random()
+                rv = rng.random()
 
-                # always accept an improved score
-                if new_score > current_score:
+                # always accept an improved score, and maybe accept a
+                # degraded score, depending on simulated annealing
+                # tempterature
+                if new_score > current_score or (
+                        (new_score < current_score) and (rv < chance)):
                     current_score = new_score
+                    raid_score = new_raid_score
+                    moved = new_moved
                     accepted_moves += 1
-                    for gg in self.raid.groups:
-                        gg.max_group_score = gg.group_score
-
-                # maybe accept a degraded score, depending on simulated
-                # annealing tempterature
-                elif (new_score < current_score) and (rv < chance):
-                    current_score = new_score
-                    accepted_moves += 1
-                    for gg in self.raid.groups:
-                        gg.max_group_score = gg.group_score
+                    max_group_scores[:] = group_scores
 
                 # if we aren't going to accept the swap, then undo it
                 else:
-                    (master_player_list[to_pos],
-                     master_player_list[from_pos]) = (
-                        master_player_list[from_pos],
-                        master_player_list[to_pos])
+                    from_members[from_slot], to_members[to_slot] = (
+                        to_members[to_slot], from_members[from_slot])
+                    group_scores[from_ndx], group_scores[to_ndx] = old_scores
 
                 # inner loop counter
                 loop_count -= 1
 
+            if current_score > best_score:
+                best_score = current_score
+                best_groups = ([list(members) for members in groups],
+                               list(max_group_scores))
+                if progress:
+                    progress(best_score, _make_raid(
+                        players, best_groups[0],
+                        [(score, score) for score in best_groups[1]]))
+
             # continue these loops until the inner loops of random moves
             # generates no accepted moves
             if accepted_moves == 0:
                 converged = True
+            elif ((deadline is not None and time.time() >= deadline) or
+                    (cancel is not None and cancel.is_set()) or
+                    (max_moves is not None and moves >= max_moves)):
+                converged = self.stopped_early = True
             else:
                 # cool the system a bit, then loop again
                 temp *= self.COOLING_RATE
 
+        if (keep_best or self.stopped_early) and best_score > current_score:
+            groups, max_group_scores = best_groups
+            group_scores = list(max_group_scores)
+            current_score = best_score
+
+        master_player_list[:] = [players[ndx]
+                                 for members in groups for ndx in members]
+
+        for gg, members, score, max_score in zip(
+                self.raid.groups, groups, group_scores, max_group_scores):
+            gg.player_list = [players[ndx] for ndx in members]
+            gg.group_score = score
+            gg.max_group_score = max_score
+
         return current_score
+
+
+class GroupSolver(threading.Thread):
+    """Builds raid groups in the background
+
+    Runs GroupBuilder.build_groups_parallel with the given options. Each
+    better set of groups found is passed to `progress` as a score and Raid,
+    and the MultiStartResult to `done` at the end, both from this thread.
+    Cancelling stops the search with the best groups found so far.
+    """
+
+    def __init__(self, builder: GroupBuilder, players, progress=None,
+                 done=None, **options):
+        super().__init__(name="GroupSolver", daemon=True)
+        self.builder = builder
+        self.players = list(players)
+        self.progress = progress
+        self.done = done
+        self.options = options
+        self.cancelled = threading.Event()
+        self.result = None
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    def run(self):
+        try:
+            self.result = self.builder.build_groups_parallel(
+                self.players, cancel=self.cancelled, progress=self.progress,
+                **self.options)
+        except Exception:
+            LOG.exception("Failed to build raid groups.")
+            return
+        if self.done:
+            self.done(self.result)
@@ -0,0 +1,152 @@
+"""Run callbacks at given times from a single thread.
+
+Auction alerts and raidtick reminders used to start a threading.Timer each,
+which is an OS thread apiece. The scheduler keeps them all in one heap
+ordered by due time instead. Cancelling or rescheduling a task doesn't
+search the heap; its old entry is just left behind as stale and skipped
+when it reaches the top.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+from ninjalooter import logger
+
+# This is the app logger, not related to EQ logs
+LOG = logger.getLogger(__name__)
+
+
+class ScheduledTask:
+    """A handle on a callback that is waiting to run."""
+
+    def __init__(self, scheduler, func, args):
+        self.scheduler = scheduler
+        self.func = func
+        self.args = args
+        self.due = None
+        # Matches the task's live heap entry, None once it ran or was
+        # cancelled
+        self.seq = None
+
+    @property
+    def pending(self) -> bool:
+        return self.seq is not None
+
+    def cancel(self) -> None:
+        self.scheduler.cancel(self)
+
+    def reschedule(self, delay: float) -> None:
+        """Run `delay` seconds from now instead, even if it already ran."""
+        self.scheduler.reschedule(self, delay)
+
+    def __repr__(self):
+        return "ScheduledTask(%r, due=%r)" % (self.func, self.due)
+
+
+class Scheduler(threading.Thread):
+    """Runs scheduled tasks on one background thread.
+
+    `clock` returns the current time in seconds, and can be replaced to
+    drive the scheduler by hand with `run_pending`. Due tasks are passed to
+    `dispatch` as `(func, args)`; by default they are called right away, but
+    the app posts them to the main window so they run on the UI thread like
+    any other event.
+    """
+
+    def __init__(self, clock=time.monotonic, dispatch=None):
+        super().__init__(name="Scheduler", daemon=True)
+        self.clock = clock
+        self.dispatch = dispatch or self._call
+        self._heap = []
+        self._counter = itertools.count()
+        self._running = True
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def _call(func, args) -> None:
+        func(*args)
+
+    def schedule(self, delay: float, func, *args) -> ScheduledTask:
+        """Call `func(*args)` once, `delay` seconds from now."""
+        task = ScheduledTask(self, func, args)
+        self._push(task, delay)
+        return task
+
+    def reschedule(self, task: ScheduledTask, delay: float) -> None:
+        self._push(task, delay)
+
+    def cancel(self, task: ScheduledTask) -> None:
+        with self._condition:
+            task.seq = None
+
+    def clear(self) -> None:
+        """Cancel every pending task."""
+        with self._condition:
+            for _, _, task in self._heap:
+                task.seq = None
+            self._heap = []
+
+    def _push(self, task: ScheduledTask, delay: float) -> None:
+        with self._condition:
+            task.due = self.clock() + delay
+            task.seq = next(self._counter)
+            heapq.heappush(self._heap, (task.due, task.seq, task))
+            if self._heap[0][2] is task:
+                # The thread may be waiting for something later
+                self._condition.notify_all()
+
+    def _first(self) -> ScheduledTask:
+        # Drop stale entries from the top of the heap
+        while self._heap:
+            _, seq, task = self._heap[0]
+            if task.seq == seq:
+                return task
+            heapq.heappop(self._heap)
+        return None
+
+    def __len__(self):
+        with self._condition:
+            return sum(1 for _, seq, task in self._heap if task.seq == seq)
+
+    def next_due(self) -> float:
+        """When the next task is due, or None if there isn't one."""
+        with self._condition:
+            task = self._first()
+            return task.due if task else None
+
+    def run_pending(self) -> int:
+        """Run every task that is due, and return how many there were."""
+        ran = 0
+        while True:
+            with self._condition:
+                task = self._first()
+                if task is None or task.due > self.clock():
+                    return ran
+                heapq.heappop(self._heap)
+                task.seq = None
+            try:
+                self.dispatch(task.func, task.args)
+            except Exception:
+                LOG.exception("Scheduled task %r failed.", task.func)
+            ran += 1
+
+    def stop(self, timeout: float = None) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self.is_alive():
+            self.join(timeout)
+
+    def run(self):
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                task = self._first()
+                wait = task.due - self.clock() if task else None
+                if wait is None or wait > 0:
+                    # Woken early by anything scheduled sooner
+                    self._condition.wait(wait)
+                    continue
+            self.run_pending()
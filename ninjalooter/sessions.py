@@ -0,0 +1,131 @@
+"""Archive of past raid sessions as compressed segments.
+
+Only the current session is kept in the state globals. When it is cleared,
+its attendance, auctions, kills and chat logs are written to their own
+gzip'd JSON segment, and a line describing it is appended to an index. The
+index is all that is read to list past sessions; a segment is only read
+when that session is looked at or switched back to, so neither costs more
+than the size of the one session involved.
+"""
+import datetime
+import gzip
+import json
+import os
+import threading
+
+from ninjalooter import logger
+
+# This is the app logger, not related to EQ logs
+LOG = logger.getLogger(__name__)
+
+INDEX_FILE = 'index.jsonl'
+SEGMENT_SUFFIX = '.json.gz'
+
+
+class SessionArchive:
+    def __init__(self, directory: str, encoder: type, decoder: type):
+        self.directory = directory
+        self.encoder = encoder
+        self.decoder = decoder
+        self._lock = threading.Lock()
+        # The last segment read, since a session is usually looked at a few
+        # times in a row
+        self._loaded = (None, None)
+
+    @property
+    def index_file(self) -> str:
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def segment_file(self, session_id: str) -> str:
+        return os.path.join(self.directory, session_id + SEGMENT_SUFFIX)
+
+    def sessions(self) -> list:
+        """Return the index entries of all archived sessions, oldest first."""
+        entries = {}
+        try:
+            with open(self.index_file, 'r') as ifp:
+                for line in ifp:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        LOG.warning("Skipping damaged session index line.")
+                        continue
+                    if entry.get('removed'):
+                        entries.pop(entry['id'], None)
+                    else:
+                        entries[entry['id']] = entry
+        except FileNotFoundError:
+            pass
+        return list(entries.values())
+
+    def archive(self, segment: dict, summary: dict) -> dict:
+        """Write one session's data and add it to the index."""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            session_id = self._new_id()
+            filename = self.segment_file(session_id)
+            temp_name = filename + '.tmp'
+            try:
+                with open(temp_name, 'wb') as tfp:
+                    with gzip.GzipFile(fileobj=tfp, mode='wb') as gfp:
+                        gfp.write(json.dumps(
+                            segment, cls=self.encoder).encode('utf-8'))
+                    tfp.flush()
+                    os.fsync(tfp.fileno())
+                os.replace(temp_name, filename)
+            except (OSError, RuntimeError):
+                # Don't leave a partial segment behind, e.g. on a full disk
+                if os.path.exists(temp_name):
+                    os.remove(temp_name)
+                raise
+            entry = dict(summary, id=session_id,
+                         archived=datetime.datetime.now().isoformat())
+            self._append_index(entry)
+        LOG.info("Archived session %s to %s.", session_id, filename)
+        return entry
+
+    def load(self, session_id: str, prepare=None) -> dict:
+        """Read back an archived session's data.
+
+        `prepare` is applied to the decoded segment before it is cached.
+        """
+        with self._lock:
+            if self._loaded[0] == session_id:
+                return self._loaded[1]
+            with gzip.open(self.segment_file(session_id), 'rt',
+                           encoding='utf-8') as gfp:
+                segment = json.load(gfp, cls=self.decoder)
+            if prepare:
+                segment = prepare(segment)
+            self._loaded = (session_id, segment)
+            return segment
+
+    def remove(self, session_id: str) -> None:
+        """Drop a session, e.g. once it has been switched back to."""
+        with self._lock:
+            self._append_index({'id': session_id, 'removed': True})
+            if self._loaded[0] == session_id:
+                self._loaded = (None, None)
+            try:
+                os.remove(self.segment_file(session_id))
+            except OSError:
+                LOG.warning("Couldn't remove archived session %s.",
+                            session_id)
+
+    def _new_id(self) -> str:
+        base_id = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        session_id = base_id
+        count = 1
+        while os.path.exists(self.segment_file(session_id)):
+            count += 1
+            session_id = "{}-{}".format(base_id, count)
+        return session_id
+
+    def _append_index(self, entry: dict) -> None:
+        with open(self.index_file, 'a') as ifp:
+            ifp.write(json.dumps(entry) + '\n')
+            ifp.flush()
+            os.fsync(ifp.fileno())
@@ -0,0 +1,360 @@
+"""Optional SQLite history of players, attendance, auctions and chat logs.
+
+The in-memory globals in `config` only hold the current raid session. When
+`sqlite_enabled` is set, every journaled mutation is also written here, as
+are attendance edits (which are saved without the journal), and the whole
+session is archived before "Clear Data" empties it, so months of history can
+be searched and paged through without loading it all at startup.
+"""
+import collections
+import datetime
+import itertools
+import json
+import sqlite3
+import threading
+
+from ninjalooter import logger
+
+# This is the app logger, not related to EQ logs
+LOG = logger.getLogger(__name__)
+
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    pclass TEXT,
+    level INTEGER,
+    guild TEXT
+);
+CREATE TABLE IF NOT EXISTS ticks (
+    id INTEGER PRIMARY KEY,
+    time TEXT NOT NULL UNIQUE,
+    raidtick INTEGER NOT NULL DEFAULT 0,
+    tick_name TEXT,
+    zone TEXT
+);
+CREATE TABLE IF NOT EXISTS attendance (
+    tick_id INTEGER NOT NULL REFERENCES ticks (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    pclass TEXT,
+    level INTEGER,
+    guild TEXT,
+    PRIMARY KEY (tick_id, name)
+);
+CREATE INDEX IF NOT EXISTS attendance_name ON attendance (name, tick_id);
+CREATE TABLE IF NOT EXISTS auctions (
+    uuid TEXT PRIMARY KEY,
+    time TEXT,
+    item TEXT NOT NULL,
+    winner TEXT,
+    amount INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS auctions_time ON auctions (time);
+CREATE INDEX IF NOT EXISTS auctions_item ON auctions (item COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS auctions_winner ON auctions (winner);
+CREATE TABLE IF NOT EXISTS kills (
+    time TEXT NOT NULL,
+    victim TEXT NOT NULL,
+    PRIMARY KEY (time, victim)
+);
+CREATE TABLE IF NOT EXISTS chat (
+    kind TEXT NOT NULL,
+    time TEXT NOT NULL,
+    user TEXT NOT NULL,
+    message TEXT NOT NULL,
+    raw_message TEXT,
+    PRIMARY KEY (kind, time, user, message)
+);
+CREATE INDEX IF NOT EXISTS chat_user ON chat (user, time);
+"""
+EQ_TIME_FORMAT = "%a %b %d %H:%M:%S %Y"
+CHAT_KINDS = {'CREDITT_LOG': 'creditt', 'GRATSS_LOG': 'gratss'}
+
+
+def sortable_time(value) -> str:
+    """Return an ISO timestamp for a datetime or an EQ log timestamp."""
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    try:
+        return datetime.datetime.strptime(value, EQ_TIME_FORMAT).isoformat()
+    except (TypeError, ValueError):
+        return value
+
+
+class SQLStore:
+    def __init__(self, filename: str, encoder: type):
+        self.filename = filename
+        self.encoder = encoder
+        self._lock = threading.Lock()
+        # The parse thread writes and the GUI thread pages, so the single
+        # connection is shared behind a lock
+        self._db = sqlite3.connect(filename, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("PRAGMA foreign_keys=ON")
+            self._db.executescript(SCHEMA)
+            self._db.execute(
+                "INSERT OR IGNORE INTO meta VALUES ('schema_version', ?)",
+                (str(SCHEMA_VERSION),))
+            version = int(self._db.execute(
+                "SELECT value FROM meta WHERE key = 'schema_version'"
+            ).fetchone()[0])
+            if version < 2:
+                self._migrate_amounts()
+
+    def _migrate_amounts(self) -> None:
+        # Version 1 stored amounts as text, which sorted "9" after "10"
+        LOG.info("Migrating %s to schema version 2.", self.filename)
+        for index in ('auctions_time', 'auctions_item', 'auctions_winner'):
+            self._db.execute("DROP INDEX IF EXISTS %s" % index)
+        self._db.execute("ALTER TABLE auctions RENAME TO auctions_v1")
+        self._db.executescript(SCHEMA)
+        self._db.execute(
+            "INSERT INTO auctions SELECT uuid, time, item, winner,"
+            " CAST(amount AS NUMERIC), data FROM auctions_v1")
+        self._db.execute("DROP TABLE auctions_v1")
+        self._db.execute(
+            "UPDATE meta SET value = ? WHERE key = 'schema_version'",
+            (str(SCHEMA_VERSION),))
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    # Writes
+
+    def apply(self, mutations: list) -> None:
+        """Write the parts of journal mutations that belong in history."""
+        with self._lock, self._db:
+            for mutation in mutations:
+                if mutation.op == 'put' and mutation.key == 'PLAYER_DB':
+                    self._put_player(mutation.value)
+                elif (mutation.op == 'append' and
+                      mutation.key == 'ATTENDANCE_LOGS'):
+                    self._put_tick(mutation.value)
+                elif (mutation.op == 'put' and
+                      mutation.key == 'HISTORICAL_AUCTIONS'):
+                    self._put_auction(mutation.value)
+                elif (mutation.op == 'delete' and
+                      mutation.key == 'HISTORICAL_AUCTIONS'):
+                    self._db.execute("DELETE FROM auctions WHERE uuid = ?",
+                                     (mutation.index,))
+                elif (mutation.op == 'append' and
+                      mutation.key == 'KILL_TIMERS'):
+                    self._put_kill(mutation.value)
+                elif mutation.op == 'append' and mutation.key in CHAT_KINDS:
+                    self._put_chat(CHAT_KINDS[mutation.key], mutation.value)
+
+    def import_state(self, state) -> None:
+        """Archive a whole session, e.g. before it is cleared.
+
+        Safe to repeat: rows already in the store are updated in place.
+        Ticks, auctions and chat that were deleted from the session since it
+        was last written are deleted here too. Only rows from between the
+        first and last record of the session are compared, so the history
+        of earlier sessions is kept.
+        """
+        chat = {kind: getattr(state, key) for key, kind in CHAT_KINDS.items()}
+        times = [sortable_time(record.time) for record in itertools.chain(
+            state.ATTENDANCE_LOGS, state.KILL_TIMERS, *chat.values())]
+        times.extend(sortable_time(auction.start_time)
+                     for auction in state.HISTORICAL_AUCTIONS.values())
+        span = (min(times), max(times)) if times else None
+        with self._lock, self._db:
+            for player in state.PLAYER_DB.values():
+                self._put_player(player)
+            if span:
+                self._prune(span, "ticks", "time", (
+                    sortable_time(who_log.time)
+                    for who_log in state.ATTENDANCE_LOGS))
+                self._prune(span, "auctions", "uuid",
+                            state.HISTORICAL_AUCTIONS)
+                for kind, entries in chat.items():
+                    self._prune(
+                        span, "chat", "time || '|' || user || '|' || message",
+                        ("|".join((sortable_time(entry.time), entry.user,
+                                   entry.message)) for entry in entries),
+                        "kind = '%s'" % kind)
+            for who_log in state.ATTENDANCE_LOGS:
+                self._put_tick(who_log)
+            for auction in state.HISTORICAL_AUCTIONS.values():
+                self._put_auction(auction)
+            for kill in state.KILL_TIMERS:
+                self._put_kill(kill)
+            for kind, entries in chat.items():
+                for entry in entries:
+                    self._put_chat(kind, entry)
+        LOG.info("Archived session to %s.", self.filename)
+
+    def _prune(self, span: tuple, table: str, key: str, keys,
+               where: str = None) -> None:
+        """Delete the rows from within `span` whose `key` isn't in `keys`"""
+        # The keys are compared in a temporary table, as there may be more
+        # of them than SQLite allows as parameters
+        self._db.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS keep (key TEXT PRIMARY KEY)")
+        self._db.execute("DELETE FROM keep")
+        self._db.executemany("INSERT OR IGNORE INTO keep VALUES (?)",
+                             ((key_value,) for key_value in keys))
+        self._db.execute(
+            "DELETE FROM {table} WHERE time BETWEEN ? AND ?{where}"
+            " AND {key} NOT IN (SELECT key FROM keep)".format(
+                table=table, key=key,
+                where=" AND " + where if where else ""),
+            span)
+
+    def put_tick(self, who_log) -> None:
+        """Record a tick again after it was edited in place"""
+        with self._lock, self._db:
+            self._put_tick(who_log)
+
+    def delete_chat(self, key: str, entry) -> None:
+        """Forget a creditt or gratss message that was ignored"""
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM chat WHERE kind = ? AND time = ? AND user = ?"
+                " AND message = ?",
+                (CHAT_KINDS[key], sortable_time(entry.time), entry.user,
+                 entry.message))
+
+    def _put_player(self, player) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO players VALUES (?, ?, ?, ?)",
+            (player.name, player.pclass, player.level, player.guild))
+
+    def _put_tick(self, who_log) -> None:
+        # A tick edited after it was first recorded replaces the original
+        time = sortable_time(who_log.time)
+        self._db.execute("DELETE FROM ticks WHERE time = ?", (time,))
+        tick_id = self._db.execute(
+            "INSERT INTO ticks (time, raidtick, tick_name, zone) "
+            "VALUES (?, ?, ?, ?)",
+            (time, bool(who_log.raidtick), who_log.tick_name,
+             who_log.zone)).lastrowid
+        self._db.executemany(
+            "INSERT OR REPLACE INTO attendance VALUES (?, ?, ?, ?, ?)",
+            ((tick_id, name, player.pclass, player.level, player.guild)
+             for name, player in who_log.log.items()))
+
+    def _put_auction(self, auction) -> None:
+        highest = auction.highest()
+        winner, amount = highest[0] if highest else (None, None)
+        self._db.execute(
+            "INSERT OR REPLACE INTO auctions VALUES (?, ?, ?, ?, ?, ?)",
+            (auction.item.uuid, sortable_time(auction.start_time),
+             auction.name(), winner, amount,
+             json.dumps(auction, cls=self.encoder)))
+
+    def _put_kill(self, kill) -> None:
+        self._db.execute("INSERT OR IGNORE INTO kills VALUES (?, ?)",
+                         (sortable_time(kill.time), kill.name))
+
+    def _put_chat(self, kind: str, entry) -> None:
+        self._db.execute(
+            "INSERT OR IGNORE INTO chat VALUES (?, ?, ?, ?, ?)",
+            (kind, sortable_time(entry.time), entry.user, entry.message,
+             entry.raw_message))
+
+    # Reads
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def count_auctions(self, search: str = None) -> int:
+        where, params = self._auction_filter(search)
+        return self._query(
+            "SELECT COUNT(*) AS count FROM auctions" + where,
+            params)[0]['count']
+
+    def auctions_page(self, offset: int, limit: int,
+                      search: str = None) -> list:
+        where, params = self._auction_filter(search)
+        return self._query(
+            "SELECT uuid, time, item, winner, amount FROM auctions" + where +
+            " ORDER BY time DESC LIMIT ? OFFSET ?",
+            params + (limit, offset))
+
+    @staticmethod
+    def _auction_filter(search: str) -> tuple:
+        if not search:
+            return "", ()
+        return (" WHERE item LIKE ? OR winner LIKE ?",
+                ("%{}%".format(search),) * 2)
+
+    def count_ticks(self, player: str = None) -> int:
+        if player:
+            return self._query(
+                "SELECT COUNT(*) AS count FROM attendance WHERE name = ?",
+                (player,))[0]['count']
+        return self._query("SELECT COUNT(*) AS count FROM ticks")[0]['count']
+
+    def ticks_page(self, offset: int, limit: int, player: str = None) -> list:
+        where, params = "", ()
+        if player:
+            where = (" WHERE t.id IN (SELECT tick_id FROM attendance"
+                     " WHERE name = ?)")
+            params = (player,)
+        return self._query(
+            "SELECT t.id, t.time, t.raidtick, t.tick_name, t.zone,"
+            " (SELECT COUNT(*) FROM attendance a WHERE a.tick_id = t.id)"
+            " AS players FROM ticks t" + where +
+            " ORDER BY t.time DESC LIMIT ? OFFSET ?",
+            params + (limit, offset))
+
+    def tick_players(self, tick_id: int) -> list:
+        return self._query(
+            "SELECT name, pclass, level, guild FROM attendance"
+            " WHERE tick_id = ? ORDER BY name", (tick_id,))
+
+    def get_player(self, name: str) -> dict:
+        rows = self._query("SELECT * FROM players WHERE name = ?", (name,))
+        return rows[0] if rows else None
+
+
+class PagedQuery:
+    """Sequence over query results that fetches one page at a time.
+
+    Meant as the object getter for a virtual list, which asks for rows by
+    index as they scroll into view.
+    """
+
+    def __init__(self, count_func, page_func, page_size: int = 100,
+                 max_pages: int = 20):
+        self.count_func = count_func
+        self.page_func = page_func
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._count = None
+        self._pages = collections.OrderedDict()
+
+    def refresh(self) -> None:
+        self._count = None
+        self._pages.clear()
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.count_func()
+        return self._count
+
+    def __getitem__(self, index: int):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        page_number, offset = divmod(index, self.page_size)
+        page = self._pages.get(page_number)
+        if page is None:
+            page = self.page_func(page_number * self.page_size,
+                                  self.page_size)
+            self._pages[page_number] = page
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page_number)
+        return page[offset] if offset < len(page) else None
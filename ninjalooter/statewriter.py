@@ -0,0 +1,88 @@
+import threading
+import time
+
+from ninjalooter import logger
+
+# This is the app logger, not related to EQ logs
+LOG = logger.getLogger(__name__)
+
+
+class StateWriter(threading.Thread):
+    """Saves the state on a background thread.
+
+    Callers only mark the state as dirty. The writer waits `delay` seconds
+    after the first notification so that a burst of changes is written once,
+    then calls `write_func`, which should return the number of bytes saved.
+    """
+
+    def __init__(self, write_func, delay: float = 2):
+        super().__init__(name="StateWriter", daemon=True)
+        self.write_func = write_func
+        self.delay = delay
+        self.saves = 0
+        self.last_latency = None
+        self.last_bytes = None
+        self._dirty = False
+        self._writing = False
+        self._running = True
+        self._flush_requested = False
+        self._condition = threading.Condition()
+
+    def mark_dirty(self) -> None:
+        with self._condition:
+            self._dirty = True
+            self._condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Write any pending changes now, and wait until they are saved."""
+        with self._condition:
+            if not self._dirty and not self._writing:
+                return True
+            self._flush_requested = True
+            self._condition.notify_all()
+            return self._condition.wait_for(
+                lambda: (not self._dirty and not self._writing or
+                         not self.is_alive()), timeout)
+
+    def stop(self, timeout: float = None) -> None:
+        self.flush(timeout)
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self.join(timeout)
+
+    def run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._dirty or not self._running)
+                if not self._running:
+                    return
+                # Let further changes pile up before writing
+                deadline = time.monotonic() + self.delay
+                self._condition.wait_for(
+                    lambda: (self._flush_requested or not self._running or
+                             time.monotonic() >= deadline),
+                    self.delay)
+                self._dirty = False
+                self._writing = True
+                self._flush_requested = False
+            try:
+                self._write()
+            finally:
+                with self._condition:
+                    self._writing = False
+                    self._condition.notify_all()
+
+    def _write(self) -> None:
+        start = time.perf_counter()
+        try:
+            written = self.write_func()
+        except Exception:
+            LOG.exception("Failed to save state.")
+            return
+        self.last_latency = time.perf_counter() - start
+        self.last_bytes = written
+        self.saves += 1
+        LOG.info("Saved state in %.1fms (%s bytes).",
+                 self.last_latency * 1000, written)
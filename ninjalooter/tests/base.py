@@ -138,6 +138,15 @@ class NLTestBase(unittest.TestCase):
         config.ALLIANCES = SAMPLE_ALLIANCES
         config.ALLIANCE_MAP = SAMPLE_ALLIANCE_MAP
 
+        records_patcher = mock.patch.object(config, 'DETAIL_RECORDS', None)
+        records_patcher.start()
+        self.addCleanup(records_patcher.stop)
+
+        # Alerts are queued on a scheduler that is never started
+        scheduler_patcher = mock.patch.object(config, 'SCHEDULER', None)
+        scheduler_patcher.start()
+        self.addCleanup(scheduler_patcher.stop)
+
         thread_patcher1 = mock.patch('threading.Timer')
         thread_patcher1.start()
         self.addCleanup(thread_patcher1.stop)
@@ -0,0 +1,165 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import dateutil.parser
+
+from ninjalooter import config
+from ninjalooter import detail
+from ninjalooter import models
+from ninjalooter.tests import base
+from ninjalooter import utils
+
+
+class TestDetail(base.NLTestBase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+
+    def test_lazy_dict(self):
+        records = utils.new_detail_records(
+            os.path.join(self.tempdir, 'state.1.records'))
+        self.addCleanup(records.close)
+        writer = detail.RecordWriter(records)
+        ref = writer.store({10.0: 'Tim', 15.0: 'Jim'}, [['Jim', 15.0]])
+        # Storing the same detail again doesn't append another record
+        self.assertEqual(ref, writer.store({10.0: 'Tim', 15.0: 'Jim'},
+                                           [['Jim', 15.0]]))
+        self.assertEqual({}, writer.store({}))
+
+        lazy = detail.LazyDict(records, ref['offset'], ref['size'],
+                               ref['count'], ref['summary'])
+        self.assertEqual(2, len(lazy))
+        self.assertFalse(lazy.loaded)
+        self.assertEqual({10.0: 'Tim', 15.0: 'Jim'}, lazy)
+        self.assertTrue(lazy.loaded)
+        self.assertEqual([['Jim', 15.0]], lazy.summary)
+
+        # Changes are kept by the lazy dict, not the shared cached record
+        lazy[20.0] = 'Bill'
+        self.assertTrue(lazy.dirty)
+        self.assertIsNone(lazy.summary)
+        self.assertEqual(2, len(records.read(ref['offset'], ref['size'])))
+
+        writer = detail.RecordWriter(records)
+        new_ref = writer.store(lazy, [['Bill', 20.0]])
+        writer.commit()
+        self.assertFalse(lazy.dirty)
+        self.assertEqual((records, new_ref['offset'], new_ref['size']),
+                         lazy.ref)
+        self.assertEqual(3, len(lazy))
+        self.assertEqual('Bill', lazy[20.0])
+
+    def test_cache_is_bounded(self):
+        records = utils.new_detail_records(
+            os.path.join(self.tempdir, 'state.1.records'))
+        records.cache_size = 1
+        self.addCleanup(records.close)
+        writer = detail.RecordWriter(records)
+        first = writer.store({'Jim': 1})
+        second = writer.store({'Tim': 2})
+
+        records.read(first['offset'], first['size'])
+        self.assertTrue(records.is_cached(first['offset']))
+        records.read(second['offset'], second['size'])
+        self.assertFalse(records.is_cached(first['offset']))
+        self.assertTrue(records.is_cached(second['offset']))
+
+    def test_load_state_lazily(self):
+        state_file = os.path.join(self.tempdir, 'state.json')
+        jim = models.Player('Jim', 'Cleric', 60, 'Venerate')
+        tim = models.Player('Tim', 'Warrior', 60, 'Black Lotus')
+        logs = [
+            models.WhoLog(dateutil.parser.parse("Mon Aug 17 07:15:39 2020"),
+                          {'Jim': jim, 'Tim': tim}, raidtick=True),
+            models.WhoLog(dateutil.parser.parse("Mon Aug 17 08:15:39 2020"),
+                          {}, raidtick=True),
+        ]
+        item = models.ItemDrop('Copper Disc', 'Jim', 'timestamp')
+        auction = models.DKPAuction(item, 'VCR')
+        auction.add(10, 'Tim')
+        populations = logs[0].populations()
+
+        with mock.patch.object(config, 'SAVE_STATE_FILE', state_file), \
+                mock.patch.object(config, 'JOURNAL_ENABLED', False), \
+                mock.patch.object(config, 'LAZY_HISTORY', True), \
+                mock.patch.object(config, 'DETAIL_RECORDS', None), \
+                mock.patch.object(config, 'ATTENDANCE_LOGS', logs), \
+                mock.patch.object(config, 'HISTORICAL_AUCTIONS',
+                                  {item.uuid: auction}):
+            utils.checkpoint_state()
+            self.assertTrue(
+                os.path.exists(os.path.join(self.tempdir, 'state.1.records')))
+            config.ATTENDANCE_LOGS = []
+            config.HISTORICAL_AUCTIONS = {}
+            utils.load_state(state_file)
+
+            loaded_tick = config.ATTENDANCE_LOGS[0]
+            loaded_auction = config.HISTORICAL_AUCTIONS[item.uuid]
+            self.assertIsInstance(loaded_tick.log, detail.LazyDict)
+            # Summaries don't need the detail
+            self.assertEqual(2, len(loaded_tick.log))
+            self.assertEqual(populations, loaded_tick.populations())
+            self.assertEqual([('Tim', 10.0)], loaded_auction.highest())
+            self.assertFalse(loaded_tick.log.loaded)
+            self.assertFalse(loaded_auction.bids.loaded)
+
+            # The bids are saved for older versions, without reading the
+            # ledger again
+            utils.checkpoint_state()
+            self.assertFalse(loaded_auction.bids.loaded)
+            with open(state_file) as ssfp:
+                saved = json.load(ssfp)
+            self.assertEqual(
+                {'10': 'Tim'},
+                saved['HISTORICAL_AUCTIONS'][item.uuid]['bids'])
+
+            self.assertEqual(logs, config.ATTENDANCE_LOGS)
+            self.assertEqual({10.0: 'Tim'}, loaded_auction.bids)
+
+            # Edits are saved by the next checkpoint
+            del loaded_tick.log['Tim']
+            utils.checkpoint_state()
+            utils.load_state(state_file)
+            self.assertEqual({'Jim': jim}, config.ATTENDANCE_LOGS[0].log)
+            config.DETAIL_RECORDS.close()
+
+    def test_compact_records(self):
+        state_file = os.path.join(self.tempdir, 'state.json')
+        raid = {name: models.Player(name, 'Cleric', 60, 'Venerate')
+                for name in ('Jim', 'Tim', 'Bill', 'Ted', 'John', 'Fred')}
+        logs = [
+            models.WhoLog(dateutil.parser.parse("Mon Aug 17 07:15:39 2020"),
+                          raid),
+            models.WhoLog(dateutil.parser.parse("Mon Aug 17 08:15:39 2020"),
+                          {'Jim': raid['Jim']}),
+        ]
+
+        with mock.patch.object(config, 'SAVE_STATE_FILE', state_file), \
+                mock.patch.object(config, 'JOURNAL_ENABLED', False), \
+                mock.patch.object(config, 'LAZY_HISTORY', True), \
+                mock.patch.object(config, 'DETAIL_RECORDS', None), \
+                mock.patch.object(config, 'ATTENDANCE_LOGS', logs), \
+                mock.patch.object(detail, 'COMPACT_MIN_BYTES', 0):
+            utils.checkpoint_state()
+            utils.load_state(state_file)
+            # Most of the records file is now unused, which the next
+            # checkpoint notices
+            config.ATTENDANCE_LOGS.pop(0)
+            utils.checkpoint_state()
+            self.assertEqual(
+                ['state.1.records', 'state.json'],
+                sorted(os.listdir(self.tempdir)))
+            utils.checkpoint_state()
+            self.assertEqual(
+                ['state.2.records', 'state.json'],
+                sorted(os.listdir(self.tempdir)))
+            self.assertEqual({'Jim': raid['Jim']},
+                             config.ATTENDANCE_LOGS[0].log)
+            utils.load_state(state_file)
+            self.assertEqual({'Jim': raid['Jim']},
+                             config.ATTENDANCE_LOGS[0].log)
+            config.DETAIL_RECORDS.close()
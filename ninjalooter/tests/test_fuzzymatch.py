@@ -0,0 +1,79 @@
+from ninjalooter import config
+from ninjalooter import fuzzymatch
+from ninjalooter.tests import base
+from ninjalooter import utils
+
+SAMPLE_ITEMS = {
+    'BELT OF INIQUITY': 'https://wiki.project1999.com/Belt_of_Iniquity',
+    'COPPER DISC': 'https://wiki.project1999.com/Copper_Disc',
+    'SHINY PAULDRONS': 'https://wiki.project1999.com/Shiny_Pauldrons',
+    'CLOAK OF FLAMES': 'https://wiki.project1999.com/Cloak_of_Flames',
+    'RING': 'https://wiki.project1999.com/Ring',
+}
+
+
+class TestFuzzyMatch(base.NLTestBase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.index = fuzzymatch.TrigramIndex(SAMPLE_ITEMS)
+
+    def test_normalize(self):
+        self.assertEqual("BELT OF INIQUITY",
+                         fuzzymatch.normalize("  belt of, iniquity!! "))
+        self.assertEqual("SMITH'S HAMMER",
+                         fuzzymatch.normalize("Smith`s Hammer"))
+
+    def test_bounded_distance(self):
+        self.assertEqual(0, fuzzymatch.bounded_distance("DISC", "DISC", 2))
+        self.assertEqual(1, fuzzymatch.bounded_distance("DISC", "DISK", 2))
+        # Adjacent transposition is a single edit
+        self.assertEqual(1, fuzzymatch.bounded_distance("DISC", "DSIC", 2))
+        self.assertEqual(2, fuzzymatch.bounded_distance("DISC", "DSK", 2))
+        # Anything over the limit is reported as limit + 1
+        self.assertEqual(3, fuzzymatch.bounded_distance("DISC", "PLATE", 2))
+        self.assertEqual(2, fuzzymatch.bounded_distance("A", "ABCDEF", 1))
+
+    def test_display_name(self):
+        self.assertEqual(
+            "Belt of Iniquity",
+            fuzzymatch.display_name(
+                'BELT OF INIQUITY',
+                'https://wiki.project1999.com/Belt_of_Iniquity'))
+        self.assertEqual(
+            "Smith's Hammer",
+            fuzzymatch.display_name(
+                "SMITH'S HAMMER",
+                'https://wiki.project1999.com/Smith%27s_Hammer'))
+        # Fall back to the key when the link doesn't match it
+        self.assertEqual(
+            "Copper Disc",
+            fuzzymatch.display_name(
+                'COPPER DISC', 'https://wiki.project1999.com/Copper'))
+
+    def test_search(self):
+        self.assertListEqual(
+            ['Belt of Iniquity'], self.index.search('Belt of Iniquty'))
+        self.assertListEqual(
+            ['Shiny Pauldrons'], self.index.search('shiny pauldron'))
+        self.assertListEqual(
+            ['Belt of Iniquity', 'Copper Disc'],
+            self.index.search('Belt of Iniqiuty, Coper Disc'))
+        self.assertListEqual(
+            ['Cloak of Flames', 'Copper Disc'],
+            self.index.search('Cloak of Flame, Copr Disc'))
+
+    def test_search_rejects_chatter(self):
+        self.assertListEqual([], self.index.search('lfg'))
+        self.assertListEqual([], self.index.search('Hail, Paul'))
+        self.assertListEqual(
+            [], self.index.search('need a rez at the zone in'))
+        # Short names are never fuzzy matched
+        self.assertListEqual([], self.index.search('rung'))
+
+    def test_get_fuzzy_items_from_text(self):
+        utils.setup_aho()
+        config.FUZZY_INDEX = None
+        self.assertListEqual(
+            ['Belt of Iniquity', 'Copper Disc'],
+            utils.get_fuzzy_items_from_text('Belt of Iniquty, Cooper Disc'))
+        self.assertIsNotNone(config.FUZZY_INDEX)
@@ -0,0 +1,106 @@
+import configparser
+from unittest import mock
+
+from ninjalooter import config
+from ninjalooter import constants as c
+from ninjalooter import grouptemplates
+from ninjalooter import models
+from ninjalooter.tests import base
+
+CUSTOM_TEMPLATES = """
+[layout]
+groups_2 = Melee, Melee
+extra = Melee
+partial = Melee
+order = Melee
+
+[template Melee]
+slots =
+    2 rogue or monk, prefer rogue
+    1 bard, weight 2
+filler_except =
+weight = 0.5
+"""
+
+
+class TestGroupTemplates(base.NLTestBase):
+    def test_default_scores(self):
+        cases = {
+            c.GT_TANK: ([
+                models.Player('War60', c.WARRIOR, 60, 'FoW'),
+                models.Player('Shd60', c.SHADOW_KNIGHT, 60, 'FoW'),
+                models.Player('Shm59', c.SHAMAN, 59, 'FoW'),
+                models.Player('Brd57', c.BARD, 57, 'FoW'),
+                models.Player('Enc60', c.ENCHANTER, 60, 'FoW'),
+                models.Player('Rog60', c.ROGUE, 60, 'FoW')], 400),
+            c.GT_CLERIC: ([
+                models.Player('Clr60', c.CLERIC, 60, 'FoW'),
+                models.Player('Dru60', c.DRUID, 60, 'FoW'),
+                models.Player('Shm59', c.SHAMAN, 59, 'FoW'),
+                models.Player('Nec60', c.NECROMANCER, 60, 'FoW')], 235),
+            c.GT_PULL: ([
+                models.Player('Mnk60', c.MONK, 60, 'FoW'),
+                models.Player('Mag60', c.MAGICIAN, 60, 'FoW'),
+                models.Player('Wiz60', c.WIZARD, 60, 'FoW'),
+                models.Player('Clr58', c.CLERIC, 58, 'FoW'),
+                models.Player('Rng60', c.RANGER, 60, 'FoW')], 370),
+            c.GT_GENERAL: ([
+                models.Player('Clr60', c.CLERIC, 60, 'FoW'),
+                models.Player('Pal59', c.PALADIN, 59, 'FoW'),
+                models.Player('Enc60', c.ENCHANTER, 60, 'FoW'),
+                models.Player('Rog60', c.ROGUE, 60, 'FoW'),
+                models.Player('Rng60', c.RANGER, 60, 'FoW')], 214),
+        }
+        for group_type, (players, expected_score) in cases.items():
+            group = models.Group(group_type)
+            group.player_list = players
+            self.assertEqual(expected_score, group.score())
+
+    def test_default_layout(self):
+        layout = grouptemplates.get_templates().layout
+        self.assertListEqual([], layout.group_types(0))
+        self.assertListEqual([c.GT_GENERAL], layout.group_types(5))
+        self.assertListEqual([c.GT_GENERAL] * 3, layout.group_types(18))
+        self.assertListEqual(
+            [c.GT_PULL, c.GT_TANK, c.GT_CLERIC, c.GT_GENERAL, c.GT_GENERAL],
+            layout.group_types(29))
+        self.assertListEqual(
+            [c.GT_PULL, c.GT_TANK, c.GT_TANK, c.GT_CLERIC, c.GT_CLERIC] +
+            [c.GT_GENERAL] * 3,
+            layout.group_types(48))
+
+        raid = models.Raid()
+        raid.add_empty_groups(36)
+        self.assertListEqual(
+            [c.GT_PULL, c.GT_TANK, c.GT_TANK, c.GT_CLERIC, c.GT_CLERIC,
+             c.GT_GENERAL],
+            [group.group_type for group in raid.groups])
+
+    def test_custom_templates(self):
+        conf = configparser.ConfigParser()
+        conf.read_string(CUSTOM_TEMPLATES)
+        templates = grouptemplates.parse(conf)
+        self.assertListEqual(['Melee'] * 3,
+                             templates.layout.group_types(17))
+
+        players = [
+            models.Player('Mnk60', c.MONK, 60, 'FoW'),
+            models.Player('Rog59', c.ROGUE, 59, 'FoW'),
+            models.Player('Brd60', c.BARD, 60, 'FoW'),
+            models.Player('Clr60', c.CLERIC, 60, 'FoW'),
+        ]
+        scorer = grouptemplates.GroupScorer(players, templates.templates)
+        # (rogue 85 + monk 50 + bard 200 + cleric filler 10) * 0.5, rounded
+        self.assertEqual(172, scorer.score('Melee', range(4)))
+
+        for bad_slot in ("2 ogre", "two rogue", "1 rogue, ignore monk"):
+            self.assertRaises(ValueError, grouptemplates.parse_slot, bad_slot)
+        conf.set('layout', 'extra', 'Caster')
+        self.assertRaises(ValueError, grouptemplates.parse, conf)
+
+    def test_get_templates_fallback(self):
+        with mock.patch.object(config, 'RAID_GROUP_TEMPLATES_FILE',
+                               '/nonexistent/group_templates.ini'), \
+                mock.patch.dict(grouptemplates._LOADED, clear=True):
+            templates = grouptemplates.get_templates()
+        self.assertIn(c.GT_TANK, templates.templates)
@@ -0,0 +1,197 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import dateutil.parser
+
+from ninjalooter import config
+from ninjalooter import journal
+from ninjalooter import logreplay
+from ninjalooter import message_handlers
+from ninjalooter import models
+from ninjalooter.tests import base
+from ninjalooter import utils
+
+STATE_KEYS = ('PENDING_AUCTIONS', 'IGNORED_AUCTIONS', 'ACTIVE_AUCTIONS',
+              'HISTORICAL_AUCTIONS', 'PLAYER_DB', 'ATTENDANCE_LOGS',
+              'KILL_TIMERS', 'LAST_WHO_SNAPSHOT')
+
+
+class TestJournal(base.NLTestBase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        state_file = os.path.join(self.tempdir, 'state.json')
+        journal_file = os.path.join(self.tempdir, 'state.journal')
+        for name, value in (('SAVE_STATE_FILE', state_file),
+                            ('SAVE_JOURNAL_FILE', journal_file),
+                            ('JOURNAL', None),
+                            ('JOURNAL_ENABLED', True)):
+            patcher = mock.patch.object(config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.close_journal)
+
+        config.PENDING_AUCTIONS = []
+        config.IGNORED_AUCTIONS = []
+        config.ACTIVE_AUCTIONS = {}
+        config.HISTORICAL_AUCTIONS = {}
+        config.PLAYER_DB = {}
+        config.ATTENDANCE_LOGS = []
+        config.KILL_TIMERS = []
+        config.LAST_WHO_SNAPSHOT = {}
+
+    @staticmethod
+    def close_journal():
+        if config.JOURNAL:
+            config.JOURNAL.close()
+
+    @staticmethod
+    def current_state():
+        return {key: getattr(config, key) for key in STATE_KEYS}
+
+    def reload(self):
+        self.close_journal()
+        config.JOURNAL = None
+        for key in STATE_KEYS:
+            setattr(config, key, type(getattr(config, key))())
+        utils.load_state(config.SAVE_STATE_FILE)
+        return self.current_state()
+
+    def journal_some_changes(self):
+        belt = models.ItemDrop('Belt of Iniquity', 'Jim', 'timestamp')
+        disc = models.ItemDrop('Copper Disc', 'Jim', 'timestamp')
+        config.PENDING_AUCTIONS.extend([belt, disc])
+        utils.store_state(mutations=[
+            journal.Append('PENDING_AUCTIONS', belt),
+            journal.Append('PENDING_AUCTIONS', disc)])
+
+        auc = utils.start_auction_dkp(belt, 'VCR')
+        auc.add(10, 'Tim')
+        utils.store_state(mutations=[
+            journal.Remove('PENDING_AUCTIONS', index=belt.uuid),
+            journal.Put('ACTIVE_AUCTIONS', belt.uuid, auc)])
+
+        kill = models.KillTimer('Sun Aug 16 22:47:31 2020', 'a shark')
+        config.KILL_TIMERS.append(kill)
+        utils.store_state(mutations=[journal.Append('KILL_TIMERS', kill)])
+
+        config.PLAYER_DB['Jim'] = models.Player('Jim', 'Cleric', 60, 'Guild')
+        config.LAST_WHO_SNAPSHOT = {'Jim': config.PLAYER_DB['Jim']}
+        who = models.WhoLog(
+            dateutil.parser.parse("Mon Aug 17 07:15:39 2020"),
+            {'Jim': config.PLAYER_DB['Jim']})
+        config.ATTENDANCE_LOGS.append(who)
+        utils.store_state(mutations=[
+            journal.Assign('LAST_WHO_SNAPSHOT', config.LAST_WHO_SNAPSHOT),
+            journal.Put('PLAYER_DB', 'Jim', config.PLAYER_DB['Jim']),
+            journal.Append('ATTENDANCE_LOGS', who)])
+
+        config.HISTORICAL_AUCTIONS[belt.uuid] = config.ACTIVE_AUCTIONS.pop(
+            belt.uuid)
+        utils.store_state(mutations=[
+            journal.Delete('ACTIVE_AUCTIONS', index=belt.uuid),
+            journal.Put('HISTORICAL_AUCTIONS', belt.uuid, auc)])
+
+    def test_mutation_records(self):
+        for mutation in (journal.Append('KILL_TIMERS', value=[1]),
+                         journal.Put('PLAYER_DB', 'Jim', 'x'),
+                         journal.Delete('PLAYER_DB', index='Jim'),
+                         journal.Remove('PENDING_AUCTIONS', index='uuid'),
+                         journal.Assign('TAB_SELECTION', 2)):
+            self.assertEqual(
+                mutation, journal.Mutation.from_json(mutation.to_json()))
+
+    def test_replay_after_snapshot(self):
+        utils.store_state()
+        self.journal_some_changes()
+        expected = self.current_state()
+        self.assertFalse(os.path.exists(
+            os.path.join(self.tempdir, 'state.journal.old')))
+
+        self.assertEqual(expected, self.reload())
+        # Replaying compacts the journal into a fresh snapshot
+        self.assertEqual(0, config.JOURNAL.records)
+        self.assertEqual(expected, self.reload())
+
+    def test_replay_without_snapshot(self):
+        self.journal_some_changes()
+        expected = self.current_state()
+        self.assertEqual(expected, self.reload())
+
+    def test_replay_interrupted_checkpoint(self):
+        utils.store_state()
+        self.journal_some_changes()
+        expected = self.current_state()
+
+        # Crash after the journal was rotated but before the snapshot landed
+        config.JOURNAL.rotate()
+        kill = models.KillTimer('Sun Aug 16 23:00:00 2020', 'a whale')
+        config.KILL_TIMERS.append(kill)
+        utils.store_state(mutations=[journal.Append('KILL_TIMERS', kill)])
+        expected['KILL_TIMERS'] = list(config.KILL_TIMERS)
+
+        self.assertEqual(expected, self.reload())
+
+    def test_replay_skips_damaged_tail(self):
+        utils.store_state()
+        self.journal_some_changes()
+        expected = self.current_state()
+        config.JOURNAL.close()
+        with open(config.SAVE_JOURNAL_FILE, 'a') as jfp:
+            jfp.write('{"op": "append", "key": "KILL_TI')
+
+        self.assertEqual(expected, self.reload())
+
+    def test_compaction_threshold(self):
+        with mock.patch.object(config, 'JOURNAL_COMPACT_RECORDS', 3), \
+                mock.patch.object(utils, 'compact_state_async') as compact:
+            kill = models.KillTimer('Sun Aug 16 22:47:31 2020', 'a shark')
+            utils.store_state(mutations=[journal.Append('KILL_TIMERS', kill)])
+            utils.store_state(mutations=[journal.Append('KILL_TIMERS', kill)])
+            compact.assert_not_called()
+            utils.store_state(mutations=[journal.Append('KILL_TIMERS', kill)])
+            compact.assert_called_once_with()
+
+    def test_auction_handlers(self):
+        belt = models.ItemDrop('Belt of Iniquity', 'Jim',
+                               'Mon Aug 17 07:00:00 2020')
+        disc = models.ItemDrop('Copper Disc', 'Jim',
+                               'Mon Aug 17 07:40:00 2020')
+        config.PENDING_AUCTIONS.extend([belt, disc])
+        utils.store_state()
+        window = mock.MagicMock()
+
+        def handle(handler, matcher, line):
+            return handler(matcher.match(line), window)
+
+        self.assertTrue(handle(
+            message_handlers.handle_auc_start,
+            logreplay.MATCH_START_AUCTION_DKP,
+            "[Mon Aug 17 07:00:00 2020] You say to your guild, "
+            "'[Belt of Iniquity] - BID IN /GU. You MUST include the item "
+            "name in your bid! Closing in 2 minutes.'"))
+        self.assertEqual(belt.uuid, self.reload()['ACTIVE_AUCTIONS'][
+            belt.uuid].item.uuid)
+
+        # Starting another auction a while later completes the old one
+        self.assertTrue(handle(
+            message_handlers.handle_auc_start,
+            logreplay.MATCH_START_AUCTION_DKP,
+            "[Mon Aug 17 07:40:00 2020] You say to your guild, "
+            "'[Copper Disc] - BID IN /GU. You MUST include the item "
+            "name in your bid! Closing in 2 minutes.'"))
+        self.assertTrue(handle(
+            message_handlers.handle_auc_end,
+            logreplay.MATCH_END_AUCTION_DKP,
+            "[Mon Aug 17 07:42:00 2020] You say to your guild, "
+            "'Gratss Tim on [Copper Disc] (10 DKP)!'"))
+        self.assertEqual([], config.PENDING_AUCTIONS)
+        self.assertEqual({}, config.ACTIVE_AUCTIONS)
+        self.assertEqual({belt.uuid, disc.uuid},
+                         set(config.HISTORICAL_AUCTIONS))
+
+        expected = self.current_state()
+        self.assertEqual(expected, self.reload())
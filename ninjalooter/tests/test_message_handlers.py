@@ -133,6 +133,11 @@ class TestMessageHandlers(base.NLTestBase):
         message_handlers.handle_end_who(match, mock.ANY, skip_store=True)
         self.assertEqual('Guild', config.ATTENDANCE_LOGS[0].log['Jim'].guild)
 
+        # Ticks where nothing changed share the same player records
+        message_handlers.handle_end_who(match, mock.ANY, skip_store=True)
+        self.assertIs(config.ATTENDANCE_LOGS[0].log['Jim'],
+                      config.ATTENDANCE_LOGS[1].log['Jim'])
+
     @mock.patch('ninjalooter.config.AUDIO_ALERTS', True)
     @mock.patch('ninjalooter.utils.store_state')
     @mock.patch('wx.PostEvent')
@@ -409,6 +414,28 @@ class TestMessageHandlers(base.NLTestBase):
         items = list(message_handlers.handle_drop(match, 'window'))
         self.assertEqual(['Belt of Iniquity'], items)
 
+    @mock.patch('ninjalooter.utils.store_state')
+    @mock.patch('wx.PostEvent')
+    def test_handle_drop_fuzzy(self, mock_post_event, mock_store_state):
+        config.PENDING_AUCTIONS = list()
+        config.NODROP_ONLY = False
+        line = ("[Sun Aug 16 22:47:31 2020] Jim says out of character, "
+                "'Belt of Iniquty'")
+        match = config.MATCH_DROP_OOC.match(line)
+
+        # Fuzzy matching off, nothing is found
+        with mock.patch('ninjalooter.config.FUZZY_ITEM_MATCH', False):
+            items = list(message_handlers.handle_drop(match, 'window'))
+        self.assertEqual([], items)
+        self.assertEqual(0, len(config.PENDING_AUCTIONS))
+
+        # Fuzzy matching on, the canonical name is used
+        with mock.patch('ninjalooter.config.FUZZY_ITEM_MATCH', True):
+            items = list(message_handlers.handle_drop(match, 'window'))
+        self.assertEqual(['Belt of Iniquity'], items)
+        self.assertEqual(1, len(config.PENDING_AUCTIONS))
+        self.assertEqual('Belt of Iniquity', config.PENDING_AUCTIONS[0].name)
+
     @mock.patch('ninjalooter.config.AUDIO_ALERTS', True)
     @mock.patch('ninjalooter.config.WX_TASKBAR_ICON')
     @mock.patch('ninjalooter.utils.store_state')
@@ -1,3 +1,4 @@
+import copy
 import json
 
 import dateutil.parser
@@ -20,6 +21,48 @@ class TestModels(base.NLTestBase):
         loaded_player = json.loads(player_json, cls=utils.JSONDecoder)
         self.assertEqual(player, loaded_player)
 
+    def test_slotted_models(self):
+        player = models.Player("Jim", constants.CLERIC, 50, "Guild")
+        self.assertFalse(hasattr(player, '__dict__'))
+        # The JSON layout is the same as when it came from __dict__
+        self.assertEqual(
+            {'json_type': 'Player', 'name': 'Jim', 'pclass': 'Cleric',
+             'level': 50, 'guild': 'Guild'},
+            player.to_json())
+
+        other = copy.copy(player)
+        self.assertEqual(player, other)
+        other.level = 51
+        self.assertNotEqual(player, other)
+        self.assertNotEqual(player, models.KillTimer('time', 'Jim'))
+        # Models with the same fields are still different models
+        self.assertNotEqual(
+            models.CredittLog('time', 'Jim', 'creditt Tim', 'raw'),
+            models.GratssLog('time', 'Jim', 'creditt Tim', 'raw'))
+
+        item = models.ItemDrop('Copper Disc', 'Jim', 'timestamp')
+        self.assertEqual(['json_type', 'name', 'reporter', 'timestamp',
+                          'uuid', 'min_dkp_override'], list(item.to_json()))
+
+    def test_player_snapshot(self):
+        player = models.Player("Jim", constants.CLERIC, 50, "Guild")
+        snapshot = models.PlayerSnapshot.of(player)
+        # Snapshots of the same data are the same record
+        self.assertIs(snapshot, models.PlayerSnapshot(
+            "Jim", constants.CLERIC, "50", "Guild"))
+        self.assertIs(snapshot, models.PlayerSnapshot.of(snapshot))
+        self.assertEqual(player, snapshot)
+        self.assertEqual(snapshot, player)
+        self.assertEqual(player.to_json(), snapshot.to_json())
+        with self.assertRaises(AttributeError):
+            snapshot.guild = "Other"
+
+        # Copies can be changed without touching the shared record
+        other = copy.copy(snapshot)
+        other.guild = "Other"
+        self.assertEqual("Guild", snapshot.guild)
+        self.assertIsNot(snapshot, models.PlayerSnapshot.of(other))
+
     def test_CredittLog_model(self):
         creditt = models.CredittLog('time', 'user', 'cReDiTt john', 'raw')
         self.assertEqual('time', creditt.time)
@@ -155,6 +198,39 @@ class TestModels(base.NLTestBase):
         loaded_auc = json.loads(auc_json, cls=utils.JSONDecoder)
         self.assertEqual(auc, loaded_auc)
 
+    def test_DKPAuction_bid_ledger(self):
+        itemdrop = models.ItemDrop('Copper Disc', "Jim", "timestamp")
+        auc = models.DKPAuction(itemdrop, 'VCR', min_dkp=3)
+        bid_time = dateutil.parser.parse("Sun Aug 16 22:47:31 2020")
+        auc.add(10, 'Peter', bid_time, 'auc')
+        auc.add(12, 'Mary', bid_time, 'gu')
+        auc.add(15, 'Peter', bid_time, 'auc')
+        self.assertEqual(models.Bid(bid_time, 'Peter', 15, 'auc'),
+                         auc.bids.leader())
+        self.assertEqual(12, auc.bids.latest('Mary').number)
+        self.assertEqual({10: 'Peter', 12: 'Mary', 15: 'Peter'}, auc.bids)
+
+        # Editing the bids by hand keeps the history
+        auc.bids[12] = 'Dan'
+        del auc.bids[15]
+        self.assertListEqual([('Dan', 12)], auc.highest())
+        self.assertIsNone(auc.bids.latest('Mary'))
+        self.assertEqual(10, auc.bids.latest('Peter').number)
+        self.assertEqual(5, len(auc.bids.history))
+
+        loaded_auc = json.loads(json.dumps(auc, cls=utils.JSONEncoder),
+                                cls=utils.JSONDecoder)
+        self.assertEqual(auc, loaded_auc)
+        self.assertEqual(auc.bids.history, loaded_auc.bids.history)
+
+        # Auctions saved before the ledger still load their bids
+        old_json = auc.to_json()
+        del old_json['ledger']
+        old_auc = json.loads(json.dumps(old_json, cls=utils.JSONEncoder),
+                             cls=utils.JSONDecoder)
+        self.assertEqual({10.0: 'Peter', 12.0: 'Dan'}, old_auc.bids)
+        self.assertListEqual([('Dan', 12.0)], old_auc.highest())
+
     def test_DKPAuction_model_bid_text(self):
         item_name = 'Copper Disc'
         itemdrop = models.ItemDrop(item_name, "Jim", "timestamp")
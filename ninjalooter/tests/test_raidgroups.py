@@ -1,6 +1,8 @@
 import random
+import threading
 
 from ninjalooter import constants as c
+from ninjalooter import grouptemplates
 from ninjalooter import models
 from ninjalooter.tests import base
 from ninjalooter import raidgroups
@@ -80,10 +82,10 @@ class TestRaidgroups(base.NLTestBase):
         # Test with a defined random seed so we can get predictable results
         expected_groups_1 = [
             ['Mag60', 'Mnk60', 'xMnk60', 'Wiz60', 'xDru60', 'xWar59b'],
-            ['War60b', 'Enc60', 'Brd60', 'xWar60a', 'hClr60', 'xShm60'],
+            ['War60b', 'Enc60', 'Brd60', 'xWar60a', 'Rog60', 'xShm60'],
             ['War60a', 'xBrd60', 'xEnc60', 'Rng60', 'Shm60', 'xWar60b'],
             ['bClr60', 'aClr60', 'fClr60', 'iClr60', 'Brd59', 'Clr60'],
-            ['gClr60', 'Rog60', 'xBrd59', 'eClr60', 'cClr60', 'jClr60'],
+            ['gClr60', 'hClr60', 'xBrd59', 'eClr60', 'cClr60', 'jClr60'],
             ['xShm60torp', 'xBrd57', 'Enc59', 'Shd60', 'xMag60', 'xWar59a'],
             ['Nec60', 'dClr60', 'xNec60', 'xRng60', 'Pal60', 'Shm60torp'],
             ['xWiz60', 'War59a', 'xShm59', 'xEnc59', 'War59b', 'Enc58'],
@@ -91,7 +93,7 @@ class TestRaidgroups(base.NLTestBase):
             ['xClr60', 'xPal60']]
 
         random.seed(1)
-        gb.build_groups(master_player_list)
+        score = gb.build_groups(master_player_list)
         random.setstate(rand_state)
 
         generated_groups = []
@@ -99,6 +101,12 @@ class TestRaidgroups(base.NLTestBase):
             generated_groups.append([p.name for p in group.player_list])
         self.assertListEqual(expected_groups_1, generated_groups)
 
+        # The groups placed are the ones that were scored
+        self.assertEqual(
+            [p.name for p in master_player_list],
+            [name for group in generated_groups for name in group])
+        self.assertEqual(score, sum(group.score() for group in gb.raid.groups))
+
         # Test again with a different seed to ensure the results change
         expected_groups_2 = [
             ['Mnk60', 'Enc58', 'Mag60', 'xWiz60', 'xMnk60', 'xShm60torp'],
@@ -108,9 +116,9 @@ class TestRaidgroups(base.NLTestBase):
             ['iClr60', 'gClr60', 'fClr60', 'eClr60', 'hClr60', 'xBrd60'],
             ['xWar59b', 'xRog60', 'xShm59', 'Dru60', 'Pal60', 'xRng60'],
             ['aClr60', 'xMag60', 'xBrd57', 'Shm59', 'xPal60', 'xEnc58'],
-            ['xEnc59', 'xDru60', 'Wiz60', 'War59a', 'War59b', 'xShm60'],
+            ['Brd57', 'xDru60', 'Wiz60', 'War59a', 'War59b', 'xShm60'],
             ['xWar59a', 'xShd60', 'xNec60', 'Rog60', 'Enc59', 'bClr60'],
-            ['Shd60', 'Brd57']]
+            ['Shd60', 'xEnc59']]
 
         random.seed(2)
         gb.build_groups(master_player_list)
@@ -120,3 +128,268 @@ class TestRaidgroups(base.NLTestBase):
         for group in gb.raid.groups:
             generated_groups.append([p.name for p in group.player_list])
         self.assertListEqual(expected_groups_2, generated_groups)
+
+    def test_groupbuilder_running_score(self):
+        gb = raidgroups.GroupBuilder()
+        master_player_list = list(self.master_player_dict.values())
+
+        rand_state = random.getstate()
+        random.seed(3)
+        score = gb.build_groups(master_player_list)
+        random.setstate(rand_state)
+
+        # The running total matches the groups scored from scratch
+        self.assertEqual(
+            score, sum(group.max_group_score for group in gb.raid.groups))
+        for group_ndx, group in enumerate(gb.raid.groups):
+            group.player_list = master_player_list[
+                group_ndx * 6:(group_ndx + 1) * 6]
+        self.assertEqual(
+            score, sum(group.score() for group in gb.raid.groups))
+
+    def test_group_scorer(self):
+        players = list(self.master_player_dict.values())
+        players.append(models.Player('Unknown', None, None, None))
+        scorer = grouptemplates.GroupScorer(players)
+        positions = {player.name: ndx for ndx, player in enumerate(players)}
+        # Scored by Group.tank_score, cleric_score, pull_score and
+        # general_score before the group templates replaced them
+        cases = [
+            (c.GT_TANK, 210, ['xShd60', 'jClr60', 'xClr60', 'dClr60', 'xEnc60',
+                              'Unknown']),
+            (c.GT_TANK, 120, ['xMag60', 'iClr60', 'xShm60', 'Clr60', 'Wiz60',
+                              'fClr60']),
+            (c.GT_TANK, 290, ['xMag60', 'xEnc59', 'xBrd60', 'xShm59', 'eClr60',
+                              'Wiz60']),
+            (c.GT_TANK, 215, ['Enc60', 'xShd60', 'Brd57', 'Mag60']),
+            (c.GT_CLERIC, 200, ['Shd60', 'xWiz60', 'fClr60', 'xRng60',
+                                'xBrd60', 'War59a']),
+            (c.GT_CLERIC, 270, ['xShm60torp', 'xWar59a', 'xShd60', 'xBrd59',
+                                'bClr60', 'xShm59']),
+            (c.GT_CLERIC, 120, ['xBrd59', 'Nec60', 'xShm59', 'War60a',
+                                'xNec60', 'Pal60']),
+            (c.GT_CLERIC, 100, ['War59b', 'War59a', 'Clr60', 'Unknown']),
+            (c.GT_PULL, 200, ['Shm60torp', 'xShm60torp', 'War60b', 'dClr60',
+                              'xEnc60', 'Mnk60']),
+            (c.GT_PULL, 100, ['xShd60', 'xShm60', 'hClr60', 'Clr60', 'xNec60',
+                              'Shm60']),
+            (c.GT_PULL, 0, ['xBrd60', 'Brd59', 'xEnc58', 'War60a', 'xBrd57',
+                            'Shd60']),
+            (c.GT_PULL, 0, ['xEnc60', 'xBrd59', 'Brd60', 'xWar59b']),
+            (c.GT_GENERAL, 214, ['xClr60', 'hClr60', 'Shd60', 'xRog60',
+                                 'Shm59', 'Mnk60']),
+            (c.GT_GENERAL, 224, ['cClr60', 'Shm60', 'xMag60', 'Brd59',
+                                 'War60b', 'Pal60']),
+            (c.GT_GENERAL, 206, ['xDru60', 'dClr60', 'Enc60', 'xWar59a',
+                                 'iClr60', 'Brd59']),
+            (c.GT_GENERAL, 140, ['xWar60b', 'Pal60', 'War60b', 'iClr60']),
+        ]
+        for group_type, expected_score, members in cases:
+            self.assertEqual(expected_score, scorer.score(
+                group_type, [positions[name] for name in members]),
+                (group_type, members))
+
+    def test_swap_scores(self):
+        players = list(self.master_player_dict.values())
+        scorer = grouptemplates.GroupScorer(players)
+
+        # Candidate swaps are scored without changing the groups
+        groups = [list(range(0, 6)), list(range(6, 12))]
+        group_types = [c.GT_TANK, c.GT_CLERIC]
+        group_scores = [scorer.score(group_type, members)
+                        for group_type, members in zip(group_types, groups)]
+        moves = [(0, 7), (1, 2), (11, 3)]
+        results = scorer.swap_scores(groups, group_types, group_scores, moves)
+        self.assertEqual([list(range(0, 6)), list(range(6, 12))], groups)
+        for (from_pos, to_pos), result in zip(moves, results):
+            order = list(range(12))
+            order[from_pos], order[to_pos] = order[to_pos], order[from_pos]
+            self.assertEqual(
+                scorer.score(c.GT_TANK, order[:6]) +
+                scorer.score(c.GT_CLERIC, order[6:]), result)
+
+        # Groups can be scored through a builder's cache
+        gb = raidgroups.GroupBuilder()
+        gb.scorer = scorer
+        self.assertEqual(results, scorer.swap_scores(
+            groups, group_types, group_scores, moves, score=gb.score_group))
+        self.assertEqual(5, len(gb._score_cache))
+
+    def test_groupbuilder_candidates(self):
+        players = list(self.master_player_dict.values())
+        master_player_list = list(players)
+        gb = raidgroups.GroupBuilder(rng=random.Random(1))
+        score = gb.build_groups(master_player_list, candidates=4)
+        self.assertEqual(
+            [player for gg in gb.raid.groups for player in gg.player_list],
+            master_player_list)
+        self.assertEqual(score, sum(gg.score() for gg in gb.raid.groups))
+
+        # Each chain builds with the same number of candidates
+        result = gb.build_groups_parallel(
+            list(players), chains=2, master_seed=5, processes=1,
+            candidates=4)
+        single = raidgroups.GroupBuilder(rng=random.Random(result.seed))
+        self.assertEqual(result.score, single.build_groups(
+            list(players), keep_best=True, candidates=4))
+        self.assertEqual(single.raid, gb.raid)
+
+    def test_groupbuilder_parallel(self):
+        players = list(self.master_player_dict.values())
+
+        gb = raidgroups.GroupBuilder()
+        result = gb.build_groups_parallel(
+            list(players), chains=3, master_seed=5, processes=1)
+        seeds = raidgroups.chain_seeds(5, 3)
+        self.assertEqual(5, result.master_seed)
+        self.assertEqual(seeds, [seed for seed, _ in result.scores])
+        self.assertEqual(max(score for _, score in result.scores),
+                         result.score)
+        self.assertEqual(0, result.incomplete)
+        self.assertEqual(
+            result.score, sum(gg.max_group_score for gg in gb.raid.groups))
+
+        # Each chain is the same as building with its own seed
+        single = raidgroups.GroupBuilder(rng=random.Random(result.seed))
+        self.assertEqual(result.score, single.build_groups(
+            list(players), keep_best=True))
+        self.assertEqual(single.raid, gb.raid)
+
+        # The same master seed makes the same groups across processes
+        parallel = raidgroups.GroupBuilder()
+        parallel_list = list(players)
+        self.assertEqual(result, parallel.build_groups_parallel(
+            parallel_list, chains=3, master_seed=5, processes=2))
+        self.assertEqual(gb.raid, parallel.raid)
+        self.assertEqual(
+            [player for gg in parallel.raid.groups
+             for player in gg.player_list], parallel_list)
+
+        # Out of time, there are still groups
+        result = gb.build_groups_parallel(
+            list(players), chains=3, master_seed=5, budget=0, processes=1)
+        self.assertEqual(3, result.incomplete)
+        self.assertEqual(1, len(result.scores))
+        self.assertEqual(56, sum(len(gg.player_list)
+                                 for gg in gb.raid.groups))
+
+    def test_groupbuilder_stop_early(self):
+        players = list(self.master_player_dict.values())
+        progress = []
+
+        gb = raidgroups.GroupBuilder(rng=random.Random(1))
+        score = gb.build_groups(
+            list(players), max_moves=1,
+            progress=lambda *args: progress.append(args))
+        self.assertTrue(gb.stopped_early)
+        self.assertEqual(1, len(progress))
+        self.assertEqual(score, progress[0][0])
+        self.assertEqual(progress[0][1], gb.raid)
+
+        # Cancelled, it stops after the level it was cancelled in
+        cancel = threading.Event()
+        cancel.set()
+        gb = raidgroups.GroupBuilder(rng=random.Random(1))
+        self.assertEqual(score, gb.build_groups(list(players), cancel=cancel))
+        self.assertTrue(gb.stopped_early)
+
+        # Left to converge, it does better
+        gb = raidgroups.GroupBuilder(rng=random.Random(1))
+        self.assertLess(score, gb.build_groups(list(players)))
+        self.assertFalse(gb.stopped_early)
+
+    def test_group_solver(self):
+        players = list(self.master_player_dict.values())
+        progress = []
+        done = []
+        solver = raidgroups.GroupSolver(
+            raidgroups.GroupBuilder(), players,
+            progress=lambda score, raid: progress.append(score),
+            done=done.append, chains=2, master_seed=5, processes=1)
+        solver.start()
+        solver.join(30)
+
+        expected = raidgroups.GroupBuilder().build_groups_parallel(
+            list(players), chains=2, master_seed=5, processes=1)
+        self.assertEqual([expected], done)
+        self.assertEqual(sorted(set(progress)), progress)
+        self.assertEqual(expected.score, progress[-1])
+
+    def test_groupbuilder_warm_start(self):
+        players = list(self.master_player_dict.values())
+        gb = raidgroups.GroupBuilder(rng=random.Random(1))
+        gb.build_groups(list(players))
+        previous = gb.raid
+        old_groups = {player.name: group_ndx
+                      for group_ndx, gg in enumerate(previous.groups)
+                      for player in gg.player_list}
+
+        # Two leave and two join
+        roster = [player for player in players
+                  if player.name not in ('War60a', 'Clr60')]
+        roster.extend([models.Player('New60a', c.WARRIOR, 60, 'FoW'),
+                       models.Player('New60b', c.CLERIC, 60, 'FoW')])
+
+        # Starting where everyone was, with moves too costly to make
+        warm = raidgroups.GroupBuilder(rng=random.Random(2))
+        score = warm.build_groups(list(roster), previous=previous,
+                                  move_cost=1000, keep_best=True)
+        self.assertEqual(score, sum(gg.max_group_score
+                                    for gg in warm.raid.groups))
+        self.assertEqual([gg.group_type for gg in previous.groups],
+                         [gg.group_type for gg in warm.raid.groups])
+        new_groups = {player.name: group_ndx
+                      for group_ndx, gg in enumerate(warm.raid.groups)
+                      for player in gg.player_list}
+        self.assertEqual(sorted(p.name for p in roster), sorted(new_groups))
+        for name, group_ndx in new_groups.items():
+            if name in old_groups:
+                self.assertEqual(old_groups[name], group_ndx, name)
+
+        # With a smaller move cost a few players move, but not everyone
+        warm = raidgroups.GroupBuilder(rng=random.Random(2))
+        warm.build_groups(list(roster), previous=previous, move_cost=30)
+        moved = [player.name
+                 for group_ndx, gg in enumerate(warm.raid.groups)
+                 for player in gg.player_list
+                 if old_groups.get(player.name, group_ndx) != group_ndx]
+        self.assertLess(len(moved), 10)
+
+        # It also starts from the builder's own groups
+        gb.build_groups(roster, previous=gb.raid, move_cost=1000)
+        self.assertEqual(sorted(p.name for p in roster),
+                         sorted(p.name for gg in gb.raid.groups
+                                for p in gg.player_list))
+
+    def test_min_cost_assignment(self):
+        self.assertEqual([], raidgroups.min_cost_assignment([]))
+        self.assertEqual([1, 0, 2], raidgroups.min_cost_assignment(
+            [[4, 1, 3], [2, 0, 5], [3, 2, 2]]))
+        # Fewer rows than columns
+        self.assertEqual([2, 0], raidgroups.min_cost_assignment(
+            [[5, 4, 1], [0, 9, 9]]))
+
+    def test_groupbuilder_greedy(self):
+        players = list(self.master_player_dict.values())
+        gb = raidgroups.GroupBuilder()
+        master_player_list = list(players)
+        score = gb.build_groups_greedy(master_player_list)
+
+        self.assertEqual(
+            score, sum(gg.max_group_score for gg in gb.raid.groups))
+        self.assertEqual(
+            master_player_list,
+            [player for gg in gb.raid.groups for player in gg.player_list])
+        self.assertEqual(sorted(p.name for p in players),
+                         sorted(p.name for p in master_player_list))
+        for group_ndx, group in enumerate(gb.raid.groups):
+            group.player_list = master_player_list[
+                group_ndx * 6:(group_ndx + 1) * 6]
+        self.assertEqual(
+            score, sum(group.score() for group in gb.raid.groups))
+
+        # It's deterministic, and polishing never makes it worse
+        again = raidgroups.GroupBuilder(rng=random.Random(1))
+        self.assertEqual(score, again.build_groups_greedy(list(players)))
+        self.assertLessEqual(score, again.build_groups_greedy(
+            list(players), polish_moves=2000))
@@ -0,0 +1,81 @@
+import threading
+from unittest import mock
+
+from ninjalooter import config
+from ninjalooter import message_handlers
+from ninjalooter import models
+from ninjalooter import scheduler
+from ninjalooter.tests import base
+from ninjalooter import utils
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestScheduler(base.NLTestBase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.clock = FakeClock()
+        config.SCHEDULER = scheduler.Scheduler(clock=self.clock)
+
+    def test_run_in_order(self):
+        calls = []
+        sched = utils.get_scheduler()
+        sched.schedule(20, calls.append, 'second')
+        first = sched.schedule(10, calls.append, 'first')
+        cancelled = sched.schedule(5, calls.append, 'cancelled')
+        cancelled.cancel()
+        self.assertEqual(2, len(sched))
+        self.assertEqual(10, sched.next_due())
+
+        self.clock.now = 15
+        self.assertEqual(1, sched.run_pending())
+        self.assertEqual(['first'], calls)
+        self.assertFalse(first.pending)
+
+        # A task can be scheduled again once it has run
+        first.reschedule(10)
+        self.clock.now = 30
+        self.assertEqual(2, sched.run_pending())
+        self.assertEqual(['first', 'second', 'first'], calls)
+        self.assertEqual(0, len(sched))
+
+    def test_auction_alerts(self):
+        threads = threading.active_count()
+        item = models.ItemDrop('Copper Disc', 'Jim', 'timestamp')
+        auctions = [models.DKPAuction(item, 'VCR') for _ in range(100)]
+        self.assertEqual(threads, threading.active_count())
+        self.assertEqual(100, len(utils.get_scheduler()))
+
+        # Extending an auction moves its alert rather than adding one
+        due = auctions[0]._alert_timer.due
+        auctions[0].start_time += models.datetime.timedelta(minutes=1)
+        auctions[0].schedule_alert()
+        self.assertEqual(100, len(utils.get_scheduler()))
+        self.assertGreater(auctions[0]._alert_timer.due, due)
+
+        with mock.patch.object(utils, 'alert_message') as mock_alert:
+            self.clock.now += config.MIN_BID_TIME
+            self.assertEqual(99, utils.get_scheduler().run_pending())
+            self.assertEqual(99, mock_alert.call_count)
+
+        utils.clear_alerts()
+        self.assertEqual(0, len(utils.get_scheduler()))
+
+    @mock.patch('ninjalooter.utils.alert_message')
+    def test_raidtick_reminders(self, mock_alert):
+        config.RAIDTICK_REMINDER_COUNT = 0
+        config.RAIDTICK_ALERT_TIMER = utils.get_scheduler().schedule(
+            60 * 60, message_handlers.raidtick_reminder_alert)
+        self.addCleanup(setattr, config, 'RAIDTICK_ALERT_TIMER', None)
+        for minute in (60, 70, 80, 90, 100, 110):
+            self.clock.now = minute * 60
+            self.assertEqual(1, utils.get_scheduler().run_pending())
+        # Reminders stop after the sixth
+        self.assertEqual(6, mock_alert.call_count)
+        self.assertEqual(0, len(utils.get_scheduler()))
@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import dateutil.parser
+
+from ninjalooter import config
+from ninjalooter import models
+from ninjalooter import sessions
+from ninjalooter.tests import base
+from ninjalooter import utils
+
+
+class TestSessions(base.NLTestBase):
+    def setUp(self) -> None:
+        super().setUp()
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        self.tempdir = tempdir
+        for key, value in (
+                ('SESSIONS_DIR', os.path.join(tempdir, 'sessions')),
+                ('SESSION_ARCHIVE', None),
+                ('SAVE_STATE_FILE', os.path.join(tempdir, 'state.json')),
+                ('JOURNAL_ENABLED', False),
+                ('LAZY_HISTORY', False),
+                ('STATE_WRITER', None)):
+            patcher = mock.patch.object(config, key, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for key in utils.SESSION_KEYS + utils.SESSION_BACKUP_KEYS:
+            patcher = mock.patch.object(
+                config, key, type(getattr(config, key))())
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def start_session(player: str, time: str) -> models.DKPAuction:
+        config.ATTENDANCE_LOGS.append(models.WhoLog(
+            dateutil.parser.parse(time),
+            {player: models.Player(player, 'Cleric', 60, 'Venerate')},
+            raidtick=True))
+        auction = models.DKPAuction(
+            models.ItemDrop('Copper Disc', player, time), 'VCR')
+        auction.add(10, player)
+        config.HISTORICAL_AUCTIONS[auction.item.uuid] = auction
+        config.KILL_TIMERS.append(models.KillTimer(time, 'Vox'))
+        return auction
+
+    def test_archive_index(self):
+        archive = sessions.SessionArchive(
+            os.path.join(self.tempdir, 'archive'),
+            utils.JSONEncoder, utils.JSONDecoder)
+        self.assertEqual([], archive.sessions())
+        first = archive.archive({'KILL_TIMERS': []}, {'kills': 0})
+        second = archive.archive({'KILL_TIMERS': [
+            models.KillTimer('Sun Aug 16 22:47:31 2020', 'Vox')]},
+            {'kills': 1})
+        self.assertNotEqual(first['id'], second['id'])
+        self.assertEqual([first, second], archive.sessions())
+        self.assertEqual(
+            [models.KillTimer('Sun Aug 16 22:47:31 2020', 'Vox')],
+            archive.load(second['id'])['KILL_TIMERS'])
+
+        archive.remove(first['id'])
+        self.assertEqual([second], archive.sessions())
+        self.assertFalse(os.path.exists(archive.segment_file(first['id'])))
+
+    def test_archive_and_restore_session(self):
+        # An empty session isn't worth archiving
+        self.assertIsNone(utils.archive_session())
+
+        first_auction = self.start_session('Jim', "Mon Aug 17 07:15:39 2020")
+        first_logs = list(config.ATTENDANCE_LOGS)
+        entry = utils.archive_session()
+        self.assertEqual(1, entry['raidticks'])
+        self.assertEqual(1, entry['auctions'])
+        self.assertEqual('2020-08-17T07:15:39', entry['start'])
+        for key in utils.SESSION_KEYS:
+            getattr(config, key).clear()
+
+        second_auction = self.start_session('Tim', "Tue Aug 18 07:15:39 2020")
+        loaded = utils.load_session(entry['id'])
+        self.assertEqual(first_logs, loaded['ATTENDANCE_LOGS'])
+        self.assertEqual({first_auction.item.uuid: first_auction},
+                         loaded['HISTORICAL_AUCTIONS'])
+
+        # Switching back archives the session that was current
+        utils.restore_session(entry['id'])
+        self.assertEqual(first_logs, config.ATTENDANCE_LOGS)
+        archived = utils.get_session_archive().sessions()
+        self.assertEqual(1, len(archived))
+        self.assertEqual(
+            {second_auction.item.uuid: second_auction},
+            utils.load_session(archived[0]['id'])['HISTORICAL_AUCTIONS'])
+        self.assertTrue(os.path.exists(config.SAVE_STATE_FILE))
+
+    def test_archive_failure_keeps_session(self):
+        self.start_session('Jim', "Mon Aug 17 07:15:39 2020")
+        entry = utils.archive_session()
+        second_auction = self.start_session('Tim', "Tue Aug 18 07:15:39 2020")
+        config.ACTIVE_AUCTIONS[second_auction.item.uuid] = second_auction
+        current = {key: list(getattr(config, key))
+                   for key in utils.SESSION_KEYS}
+
+        archive = utils.get_session_archive()
+        with mock.patch('gzip.GzipFile.write', side_effect=OSError):
+            self.assertRaises(OSError, utils.store_state, backup=True)
+            self.assertRaises(OSError, utils.restore_session, entry['id'])
+        self.assertEqual(current, {key: list(getattr(config, key))
+                                   for key in utils.SESSION_KEYS})
+        self.assertEqual([entry], archive.sessions())
+        self.assertEqual([os.path.basename(archive.segment_file(
+            entry['id']))], [name for name in os.listdir(archive.directory)
+                             if name != sessions.INDEX_FILE])
+
+        # Auctions that clearing would lose are kept with the session
+        entry = utils.archive_session()
+        self.assertEqual(
+            {second_auction.item.uuid: second_auction},
+            utils.load_session(entry['id'])['ACTIVE_AUCTIONS'])
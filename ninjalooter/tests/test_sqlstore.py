@@ -0,0 +1,251 @@
+import datetime
+import os
+import shutil
+import sqlite3
+import tempfile
+import types
+from unittest import mock
+
+import dateutil.parser
+
+from ninjalooter import config
+from ninjalooter import journal
+from ninjalooter import logreplay
+from ninjalooter import message_handlers
+from ninjalooter import models
+from ninjalooter import sqlstore
+from ninjalooter.tests import base
+from ninjalooter import utils
+
+
+class TestSQLStore(base.NLTestBase):
+    def setUp(self) -> None:
+        super().setUp()
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        self.store = sqlstore.SQLStore(
+            os.path.join(tempdir, 'history.db'), utils.JSONEncoder)
+        self.addCleanup(self.store.close)
+
+    @staticmethod
+    def make_session():
+        jim = models.Player('Jim', 'Cleric', 60, 'Guild')
+        tim = models.Player('Tim', 'Warrior', 60, 'Guild')
+        ticks = [
+            models.WhoLog(dateutil.parser.parse("Mon Aug 17 07:15:39 2020"),
+                          {'Jim': jim, 'Tim': tim}, raidtick=True),
+            models.WhoLog(dateutil.parser.parse("Mon Aug 17 08:15:39 2020"),
+                          {'Jim': jim}, raidtick=True),
+        ]
+        belt = models.DKPAuction(
+            models.ItemDrop('Belt of Iniquity', 'Jim', 'timestamp'), 'VCR')
+        belt.add(10, 'Tim')
+        disc = models.DKPAuction(
+            models.ItemDrop('Copper Disc', 'Jim', 'timestamp'), 'VCR')
+        return types.SimpleNamespace(
+            PLAYER_DB={'Jim': jim, 'Tim': tim},
+            ATTENDANCE_LOGS=ticks,
+            HISTORICAL_AUCTIONS={belt.item.uuid: belt, disc.item.uuid: disc},
+            KILL_TIMERS=[models.KillTimer('Sun Aug 16 22:47:31 2020', 'Vox')],
+            CREDITT_LOG=[models.CredittLog(
+                'Sun Aug 16 22:47:31 2020', 'Jim', 'creditt Tim', 'raw')],
+            GRATSS_LOG=[],
+        )
+
+    def test_sortable_time(self):
+        self.assertEqual("2020-08-16T22:47:31",
+                         sqlstore.sortable_time("Sun Aug 16 22:47:31 2020"))
+        self.assertEqual("2020-08-17T07:15:39", sqlstore.sortable_time(
+            dateutil.parser.parse("Mon Aug 17 07:15:39 2020")))
+        self.assertEqual("timestamp", sqlstore.sortable_time("timestamp"))
+
+    def test_apply_mutations(self):
+        session = self.make_session()
+        belt, disc = session.HISTORICAL_AUCTIONS.values()
+        self.store.apply([
+            journal.Put('PLAYER_DB', 'Jim', session.PLAYER_DB['Jim']),
+            journal.Append('ATTENDANCE_LOGS', session.ATTENDANCE_LOGS[0]),
+            journal.Put('HISTORICAL_AUCTIONS', belt.item.uuid, belt),
+            journal.Put('HISTORICAL_AUCTIONS', disc.item.uuid, disc),
+            journal.Delete('HISTORICAL_AUCTIONS', index=disc.item.uuid),
+            journal.Append('KILL_TIMERS', session.KILL_TIMERS[0]),
+            # Mutations that aren't history are ignored
+            journal.Put('ACTIVE_AUCTIONS', belt.item.uuid, belt),
+        ])
+
+        self.assertEqual('Cleric', self.store.get_player('Jim')['pclass'])
+        self.assertIsNone(self.store.get_player('Tim'))
+        self.assertEqual(1, self.store.count_ticks())
+        self.assertEqual(1, self.store.count_auctions())
+        auction = self.store.auctions_page(0, 10)[0]
+        self.assertEqual('Belt of Iniquity', auction['item'])
+        self.assertEqual('Tim', auction['winner'])
+        self.assertEqual(10, auction['amount'])
+
+    def test_auction_handlers(self):
+        belt = models.ItemDrop('Belt of Iniquity', 'Jim',
+                               'Mon Aug 17 07:00:00 2020')
+        disc = models.ItemDrop('Copper Disc', 'Jim',
+                               'Mon Aug 17 07:05:00 2020')
+        window = mock.MagicMock()
+
+        def say(handler, matcher, line):
+            self.assertTrue(handler(matcher.match(
+                "[Mon Aug 17 %s 2020] You say to your guild, '%s'" % line),
+                window))
+
+        def start(time, item, current=""):
+            say(message_handlers.handle_auc_start,
+                logreplay.MATCH_START_AUCTION_DKP,
+                (time, "[%s] - BID IN /GU. You MUST include the item name "
+                       "in your bid! %sClosing in 2 minutes." % (
+                           item, current)))
+
+        def end(time, item):
+            say(message_handlers.handle_auc_end,
+                logreplay.MATCH_END_AUCTION_DKP,
+                (time, "Gratss Tim on [%s] (10 DKP)!" % item))
+
+        def history():
+            return [(row['item'], row['winner'], row['amount'])
+                    for row in self.store.auctions_page(0, 10)]
+
+        with mock.patch.object(config, 'SQLITE_ENABLED', True), \
+                mock.patch.object(config, 'SQL_STORE', self.store), \
+                mock.patch.object(config, 'JOURNAL_ENABLED', False), \
+                mock.patch.object(config, 'STATE_WRITER', None), \
+                mock.patch.object(config, 'PENDING_AUCTIONS', [belt, disc]), \
+                mock.patch.object(config, 'ACTIVE_AUCTIONS', {}), \
+                mock.patch.object(config, 'HISTORICAL_AUCTIONS', {}), \
+                mock.patch.object(utils, 'checkpoint_state'):
+            start('07:00:00', 'Belt of Iniquity')
+            config.ACTIVE_AUCTIONS[belt.uuid].add(10, 'Tim')
+            self.assertEqual([], history())
+            end('07:02:00', 'Belt of Iniquity')
+            self.assertEqual([('Belt of Iniquity', 'Tim', 10)], history())
+
+            # Reopening an auction takes it out of the history, and
+            # auctions left open too long are completed
+            start('07:05:00', 'Copper Disc')
+            start('07:40:00', 'Belt of Iniquity',
+                  "Currently: `Tim` with 10 DKP - ")
+            self.assertEqual([('Copper Disc', None, None)], history())
+            end('07:42:00', 'Belt of Iniquity')
+            self.assertEqual([('Copper Disc', None, None),
+                              ('Belt of Iniquity', 'Tim', 10)], history())
+
+    def test_import_state(self):
+        session = self.make_session()
+        self.store.import_state(session)
+        # Archiving the same session twice doesn't duplicate anything
+        self.store.import_state(session)
+
+        self.assertEqual(2, self.store.count_ticks())
+        self.assertEqual(1, self.store.count_ticks('Tim'))
+        ticks = self.store.ticks_page(0, 10)
+        self.assertEqual(['2020-08-17T08:15:39', '2020-08-17T07:15:39'],
+                         [tick['time'] for tick in ticks])
+        self.assertEqual([1, 2], [tick['players'] for tick in ticks])
+        self.assertEqual(
+            ['Jim', 'Tim'],
+            [player['name']
+             for player in self.store.tick_players(ticks[1]['id'])])
+        self.assertEqual(
+            [ticks[1]['id']],
+            [tick['id'] for tick in self.store.ticks_page(0, 10, 'Tim')])
+
+        self.assertEqual(2, self.store.count_auctions())
+        self.assertEqual(1, self.store.count_auctions('belt'))
+        self.assertEqual(1, self.store.count_auctions('Tim'))
+        self.assertEqual(
+            ['Copper Disc'],
+            [row['item'] for row in self.store.auctions_page(0, 10, 'disc')])
+
+    def test_import_state_deletions(self):
+        earlier = self.make_session()
+        for who_log in earlier.ATTENDANCE_LOGS:
+            who_log.time -= datetime.timedelta(days=7)
+        for auction in earlier.HISTORICAL_AUCTIONS.values():
+            auction.start_time = who_log.time
+        earlier.KILL_TIMERS = []
+        earlier.CREDITT_LOG = []
+        self.store.import_state(earlier)
+
+        session = self.make_session()
+        for auction in session.HISTORICAL_AUCTIONS.values():
+            auction.start_time = session.ATTENDANCE_LOGS[0].time
+        session.ATTENDANCE_LOGS.append(models.WhoLog(
+            dateutil.parser.parse("Mon Aug 17 07:45:39 2020"), {}))
+        session.CREDITT_LOG.append(models.CredittLog(
+            'Sun Aug 16 22:48:00 2020', 'Tim', 'creditt Jim', 'raw'))
+        self.store.import_state(session)
+        self.assertEqual(5, self.store.count_ticks())
+
+        # Deleted from the session since it was archived
+        del session.ATTENDANCE_LOGS[2]
+        disc = list(session.HISTORICAL_AUCTIONS)[1]
+        del session.HISTORICAL_AUCTIONS[disc]
+        session.CREDITT_LOG.pop()
+        self.store.import_state(session)
+        self.assertEqual(4, self.store.count_ticks())
+        # The earlier session's auctions are kept
+        self.assertEqual(3, self.store.count_auctions())
+        self.assertEqual(1, self.store.count_auctions('disc'))
+        self.assertEqual(
+            1, self.store._query("SELECT COUNT(*) AS count FROM chat")[0][
+                'count'])
+
+        # Edited in place
+        session.ATTENDANCE_LOGS[1].log.pop('Jim')
+        self.store.put_tick(session.ATTENDANCE_LOGS[1])
+        self.assertEqual(3, self.store.count_ticks('Jim'))
+        self.store.delete_chat('CREDITT_LOG', session.CREDITT_LOG[0])
+        self.assertEqual([], self.store._query("SELECT * FROM chat"))
+
+    def test_migrate_amounts(self):
+        filename = self.store.filename + '.v1'
+        db = sqlite3.connect(filename)
+        db.executescript(sqlstore.SCHEMA.replace(
+            "amount INTEGER", "amount TEXT"))
+        db.execute("INSERT INTO meta VALUES ('schema_version', '1')")
+        db.executemany(
+            "INSERT INTO auctions VALUES (?, ?, 'Item', 'Jim', ?, '{}')",
+            (('a', '2020-08-17', '9'), ('b', '2020-08-18', '10'),
+             ('c', '2020-08-19', None)))
+        db.commit()
+        db.close()
+
+        store = sqlstore.SQLStore(filename, utils.JSONEncoder)
+        self.addCleanup(store.close)
+        self.assertEqual(
+            ['b', 'a', 'c'],
+            [row['uuid'] for row in store._query(
+                "SELECT uuid FROM auctions ORDER BY amount DESC")])
+        self.assertEqual(3, store.count_auctions('item'))
+        self.assertEqual('2', store._query(
+            "SELECT value FROM meta WHERE key = 'schema_version'")[0]['value'])
+
+    def test_paged_query(self):
+        rows = list(range(25))
+        fetches = []
+
+        def page_func(offset, limit):
+            fetches.append(offset)
+            return rows[offset:offset + limit]
+
+        paged = sqlstore.PagedQuery(lambda: len(rows), page_func,
+                                    page_size=10, max_pages=2)
+        self.assertEqual(25, len(paged))
+        self.assertEqual([0, 5, 24], [paged[0], paged[5], paged[24]])
+        self.assertEqual([0, 20], fetches)
+        self.assertEqual(15, paged[15])
+        self.assertEqual([0, 20, 10], fetches)
+        # The least recently used page was dropped, so it is fetched again
+        self.assertEqual(0, paged[0])
+        self.assertEqual(10, paged[10])
+        self.assertEqual([0, 20, 10, 0], fetches)
+        self.assertRaises(IndexError, paged.__getitem__, 25)
+
+        rows.append(25)
+        paged.refresh()
+        self.assertEqual(26, len(paged))
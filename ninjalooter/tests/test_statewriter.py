@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from ninjalooter import config
+from ninjalooter import statewriter
+from ninjalooter.tests import base
+from ninjalooter import utils
+
+
+class TestStateWriter(base.NLTestBase):
+    def test_coalesces_changes(self):
+        write_func = mock.Mock(return_value=123)
+        writer = statewriter.StateWriter(write_func, delay=60)
+        writer.start()
+        self.addCleanup(writer.stop, 5)
+
+        for _ in range(5):
+            writer.mark_dirty()
+        # Flushing skips the rest of the delay
+        self.assertTrue(writer.flush(5))
+        write_func.assert_called_once_with()
+        self.assertEqual(1, writer.saves)
+        self.assertEqual(123, writer.last_bytes)
+        self.assertIsNotNone(writer.last_latency)
+
+        # Nothing is pending, so nothing more is written
+        self.assertTrue(writer.flush(5))
+        write_func.assert_called_once_with()
+
+    def test_stop_writes_pending_changes(self):
+        write_func = mock.Mock(return_value=0)
+        writer = statewriter.StateWriter(write_func, delay=60)
+        writer.start()
+        writer.mark_dirty()
+        writer.stop(5)
+        write_func.assert_called_once_with()
+        self.assertFalse(writer.is_alive())
+
+    def test_write_failure_is_logged(self):
+        write_func = mock.Mock(side_effect=[OSError("disk full"), 10])
+        writer = statewriter.StateWriter(write_func, delay=0)
+        writer.start()
+        self.addCleanup(writer.stop, 5)
+
+        writer.mark_dirty()
+        self.assertTrue(writer.flush(5))
+        self.assertEqual(0, writer.saves)
+        writer.mark_dirty()
+        self.assertTrue(writer.flush(5))
+        self.assertEqual(1, writer.saves)
+
+    def test_store_state_uses_writer(self):
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        state_file = os.path.join(tempdir, 'state.json')
+        with mock.patch.object(config, 'SAVE_STATE_FILE', state_file), \
+                mock.patch.object(config, 'JOURNAL_ENABLED', False), \
+                mock.patch.object(config, 'LAZY_HISTORY', False), \
+                mock.patch.object(config, 'STATE_SAVE_DELAY', 60):
+            utils.start_state_writer()
+            utils.store_state()
+            self.assertFalse(os.path.exists(state_file))
+            utils.stop_state_writer()
+            self.assertTrue(os.path.exists(state_file))
+            # The temporary file was moved into place
+            self.assertListEqual(['state.json'], os.listdir(tempdir))
+        self.assertIsNone(config.STATE_WRITER)
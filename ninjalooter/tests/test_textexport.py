@@ -0,0 +1,137 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+import dateutil.parser
+
+from ninjalooter.cmd import export as export_cmd
+from ninjalooter import config
+from ninjalooter import models
+from ninjalooter.tests import base
+from ninjalooter import textexport
+from ninjalooter import utils
+
+
+class TestTextExport(base.NLTestBase):
+    def setUp(self) -> None:
+        super().setUp()
+        bid_time = dateutil.parser.parse("Mon Aug 17 07:20:00 2020")
+        dkp_auction = models.DKPAuction(
+            models.ItemDrop('Copper Disc', 'Jim', 'Mon Aug 17 07:15:39 2020'),
+            'VCR', min_dkp=1)
+        dkp_auction.add(10, 'Peter', bid_time, 'auc')
+        dkp_auction.add(12, 'Mary', bid_time, 'gu')
+        del dkp_auction.bids[12]
+        random_auction = models.RandomAuction(
+            models.ItemDrop('Rusty Dagger', 'Jim', 'Sun Aug 16 17:41:25 2020'),
+            rolls={'Tim': 500, 'Tom': 700})
+        auctions = {auction.item.uuid: auction
+                    for auction in (dkp_auction, random_auction)}
+        logs = [models.WhoLog(
+            dateutil.parser.parse("Mon Aug 17 0%d:00:00 2020" % hour),
+            {'Jim': models.Player('Jim', 'Cleric', 60, 'Venerate'),
+             'Tim': models.Player('Tim', None, 0, '')},
+            raidtick=hour > 6, tick_name='Tick %d' % hour)
+            for hour in (6, 7)]
+        for patcher in (
+                mock.patch.object(config, 'ATTENDANCE_LOGS', logs),
+                mock.patch.object(config, 'HISTORICAL_AUCTIONS', auctions),
+                mock.patch.object(config, 'KILL_TIMERS', [models.KillTimer(
+                    'Sun Aug 16 17:41:25 2020', 'an azarack')]),
+                mock.patch.object(config, 'CREDITT_LOG', [models.CredittLog(
+                    'Mon Aug 17 07:15:39 2020', 'Jim', 'creditt Tim', 'raw')]),
+                mock.patch.object(config, 'GRATSS_LOG', []),
+                mock.patch.object(config, 'EXPORT_TIME_IN_EASTERN', False)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+
+    def test_rows(self):
+        since = dateutil.parser.parse("Mon Aug 17 07:00:00 2020")
+        self.assertListEqual(
+            [('2020-08-17 07:00:00', 'Tick 7', True, None, 'Jim', 60,
+              'Cleric', 'Venerate'),
+             ('2020-08-17 07:00:00', 'Tick 7', True, None, 'Tim', None,
+              None, '')],
+            list(textexport.rows('attendance', since=since)))
+        self.assertEqual(4, len(list(textexport.rows('attendance'))))
+
+        auction_rows = list(textexport.rows('auctions'))
+        self.assertEqual(
+            ('2020-08-17 07:15:39', 'Copper Disc', 'DKP', 'Peter', 10),
+            auction_rows[0][:1] + auction_rows[0][2:])
+        self.assertEqual(('Random', 'Tom', 700), auction_rows[1][3:])
+
+        # Every bid in the ledger, including withdrawals
+        bids = list(textexport.rows('bids', since=since))
+        self.assertListEqual(
+            [('2020-08-17 07:20:00', 'Peter', 10, 'auc'),
+             ('2020-08-17 07:20:00', 'Mary', 12, 'gu'),
+             (None, None, 12, None)],
+            [row[3:] for row in bids])
+        self.assertEqual(5, len(list(textexport.rows('bids'))))
+
+        self.assertListEqual([], list(textexport.rows('kills', since=since)))
+        self.assertListEqual(
+            [('2020-08-17 07:15:39', 'creditt', 'Jim', 'Tim',
+              'creditt Tim')],
+            list(textexport.rows('creditt')))
+
+    def test_export(self):
+        for export_format in textexport.FORMATS:
+            filename = os.path.join(self.tempdir, 'bids.' + export_format)
+            steps = []
+            self.assertTrue(textexport.export(
+                'bids', export_format, filename,
+                progress=lambda *step: steps.append(step)))
+            self.assertListEqual([(2, 2)], steps)
+            with open(filename, newline='') as export_fp:
+                if export_format == 'csv':
+                    lines = list(csv.DictReader(export_fp))
+                else:
+                    lines = [json.loads(line) for line in export_fp]
+            self.assertEqual(5, len(lines))
+            self.assertEqual('Peter', lines[0]['player'])
+
+        # Cancelling removes the file
+        cancel = threading.Event()
+        cancel.set()
+        self.assertIsNone(textexport.export(
+            'kills', 'csv', filename, cancel=cancel))
+        self.assertFalse(os.path.exists(filename))
+        self.assertFalse(textexport.export(
+            'kills', 'csv', os.path.join(self.tempdir, 'nowhere', 'x.csv')))
+
+    def test_export_command(self):
+        filename = os.path.join(self.tempdir, 'kills.jsonl')
+        with mock.patch.object(utils, 'load_state') as load_state:
+            self.assertEqual(0, export_cmd.main(
+                ['kills', filename, '--since', '2020-08-16',
+                 '--state', 'state.json']))
+        load_state.assert_called_once_with('state.json')
+        with open(filename) as export_fp:
+            self.assertDictEqual(
+                {'time': '2020-08-16 17:41:25', 'mob': 'an azarack',
+                 'island': '2'},
+                json.loads(export_fp.readline()))
+
+        # A time with a timezone is compared as local time
+        since = textexport.parse_since('2020-08-16T17:41:25+00:00')
+        self.assertIsNone(since.tzinfo)
+        self.assertEqual(dateutil.parser.parse(
+            '2020-08-16T17:41:25+00:00').astimezone().replace(tzinfo=None),
+            since)
+        with mock.patch.object(utils, 'load_state'):
+            self.assertEqual(0, export_cmd.main(
+                ['kills', filename, '--since', '2020-08-16T00:00:00Z']))
+
+        # Nothing is exported without a state to export
+        os.remove(filename)
+        with mock.patch.object(utils, 'load_state', return_value=False):
+            self.assertEqual(1, export_cmd.main(['kills', filename]))
+        self.assertFalse(os.path.exists(filename))
@@ -1,6 +1,15 @@
+import json
+import os
+import shutil
+import tempfile
 from unittest import mock
+
+import dateutil.parser
 import requests_mock
+import xlsxwriter
+import xlsxwriter.exceptions
 
+from ninjalooter import config
 from ninjalooter import models
 from ninjalooter.tests import base
 from ninjalooter import utils
@@ -126,3 +135,270 @@ class TestUtils(base.NLTestBase):
         data = utils.translate_sheet_csv_to_mindkp_json(
             base.SAMPLE_GSHEETS_DATA)
         self.assertEqual(base.SAMPLE_GSHEETS_MINDKP_JSON, data)
+
+    def test_pack_attendance(self):
+        jim = models.Player('Jim', 'Cleric', 59, 'Guild')
+        tim = models.Player('Tim', 'Warrior', 60, None)
+        jim_dinged = models.Player('Jim', 'Cleric', 60, 'Guild')
+        logs = [
+            models.WhoLog(
+                dateutil.parser.parse("Mon Aug 17 07:15:39 2020"),
+                {'Jim': jim, 'Tim': tim}, raidtick=True, zone="Sky"),
+            models.WhoLog(
+                dateutil.parser.parse("Mon Aug 17 08:15:39 2020"),
+                {'Jim': jim_dinged, 'Tim': tim}, tick_name="Second"),
+        ]
+
+        packed = json.loads(json.dumps(utils.pack_attendance(logs),
+                                       cls=utils.JSONEncoder))
+        self.assertEqual(utils.ATTENDANCE_FORMAT_VERSION, packed['version'])
+        self.assertEqual([['Jim', 'Cleric', 59, 'Guild'],
+                          ['Tim', 'Warrior', 60, None]], packed['players'])
+        # Unchanged players are bare ids, changed ones carry the difference
+        self.assertEqual([0, 1], packed['ticks'][0]['log'])
+        self.assertEqual([[0, {'level': 60}], 1], packed['ticks'][1]['log'])
+
+        self.assertEqual(logs, utils.unpack_attendance(packed))
+        self.assertEqual(
+            [], utils.unpack_attendance(utils.pack_attendance([])))
+        self.assertRaises(ValueError, utils.unpack_attendance,
+                          {'version': 0, 'players': [], 'ticks': []})
+
+    def test_load_state_unpacked_attendance(self):
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        state_file = os.path.join(tempdir, 'state_old.json')
+        logs = [models.WhoLog(
+            dateutil.parser.parse("Mon Aug 17 07:15:39 2020"),
+            {'Jim': models.Player('Jim', 'Cleric', 60, 'Guild')})]
+        # State files from older versions store every player in every tick
+        with open(state_file, 'w') as ssfp:
+            json.dump({'ATTENDANCE_LOGS': logs}, ssfp, cls=utils.JSONEncoder)
+
+        with mock.patch.object(config, 'ATTENDANCE_LOGS', []):
+            utils.load_state(state_file)
+            self.assertEqual(logs, config.ATTENDANCE_LOGS)
+
+    def test_load_state_round_trip(self):
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        state_file = os.path.join(tempdir, 'state.json')
+        item = models.ItemDrop('Copper Disc', 'Jim', 'timestamp')
+        auction = models.DKPAuction(item, 'VCR')
+        auction.add(10, 'Tim')
+        logs = [models.WhoLog(
+            dateutil.parser.parse("Mon Aug 17 07:15:39 2020"),
+            {'Jim': models.Player('Jim', 'Cleric', 60, 'Guild')})]
+
+        with mock.patch.object(config, 'HISTORICAL_AUCTIONS',
+                               {item.uuid: auction}), \
+                mock.patch.object(config, 'ATTENDANCE_LOGS', logs):
+            data = utils.serialize_state()
+        self.assertEqual(utils.STATE_VERSION,
+                         json.loads(data)['STATE_VERSION'])
+        with open(state_file, 'w') as ssfp:
+            ssfp.write(data)
+
+        with mock.patch.object(config, 'HISTORICAL_AUCTIONS', {}), \
+                mock.patch.object(config, 'ATTENDANCE_LOGS', []), \
+                mock.patch.object(config, 'JOURNAL_ENABLED', False):
+            self.assertFalse(utils.load_state(
+                os.path.join(tempdir, 'missing.json')))
+            self.assertTrue(utils.load_state(state_file))
+            # Nested models are restored by the same single decoding pass
+            self.assertEqual({item.uuid: auction}, config.HISTORICAL_AUCTIONS)
+            self.assertEqual(item, config.HISTORICAL_AUCTIONS[item.uuid].item)
+            self.assertEqual(logs, config.ATTENDANCE_LOGS)
+            self.assertFalse(hasattr(config, 'STATE_VERSION'))
+
+    def test_place_by_time(self):
+        def line(minute):
+            return "[Mon Aug 17 07:%02d:00 2020] You say, 'LOOT: %d'" % (
+                minute, minute)
+
+        ticks = [dateutil.parser.parse("Mon Aug 17 07:%02d:00 2020" % minute)
+                 for minute in (10, 30, 20)]
+        lines = [line(minute) for minute in (35, 5, 15, 25, 10, 31)]
+        # After the last listed tick earlier than each line
+        placed, unplaced = utils._place_by_time(lines, ticks, after=True)
+        self.assertListEqual(
+            [[line(15)], [], [line(35), line(25), line(31)]], placed)
+        self.assertListEqual([line(5), line(10)], unplaced)
+        # Before the first listed tick later than each line
+        placed, unplaced = utils._place_by_time(lines, ticks, after=False)
+        self.assertListEqual(
+            [[line(5)], [line(15), line(25), line(10)], []], placed)
+        self.assertListEqual([line(35), line(31)], unplaced)
+
+    def test_unused_sheet_name(self):
+        sheetnames = {}
+        renamed = {}
+        for expected in ('Tick', 'Tick 2', 'Tick 3', 'Tick 4'):
+            name = utils._unused_sheet_name('Tick', sheetnames, renamed)
+            self.assertEqual(expected, name)
+            sheetnames[name] = None
+        self.assertEqual(
+            'Tick 5', utils._unused_sheet_name('Tick 2', sheetnames, renamed))
+
+    def test_parse_tick_for_export_cached(self):
+        wholog = models.WhoLog(
+            dateutil.parser.parse("Mon Aug 17 07:15:39 2020"),
+            {'Jim': models.Player('Jim', 'Cleric', 60, 'Guild'),
+             'Tim': models.Player('Tim', None, 0, 'Other')},
+            raidtick=True)
+        with mock.patch.object(config, 'ALLIANCES', {'A': ('Guild',)}), \
+                mock.patch.object(config, 'DEFAULT_ALLIANCE', 'A'), \
+                mock.patch.object(config, 'EXPORT_TIME_IN_EASTERN', False):
+            with mock.patch.object(config, 'RESTRICT_EXPORT', True):
+                lines = utils.parse_tick_for_export(wholog)
+                self.assertListEqual(
+                    ["[Mon Aug 17 07:15:39 2020] [ANONYMOUS] Jim <Guild> "
+                     "{60 Cleric}"], lines)
+                with mock.patch.object(utils, '_render_tick') as render:
+                    self.assertListEqual(
+                        lines, utils.parse_tick_for_export(wholog))
+                    render.assert_not_called()
+
+                wholog.log['Bob'] = models.Player('Bob', 'Monk', 60, 'Guild')
+                wholog.changed()
+                self.assertEqual(2, len(utils.parse_tick_for_export(wholog)))
+            with mock.patch.object(config, 'RESTRICT_EXPORT', False):
+                self.assertListEqual(
+                    ["[Mon Aug 17 07:15:39 2020] [ANONYMOUS] Jim <Guild> "
+                     "{60 Cleric}",
+                     "[Mon Aug 17 07:15:39 2020] [ANONYMOUS] Tim <Other>",
+                     "[Mon Aug 17 07:15:39 2020] [ANONYMOUS] Bob <Guild> "
+                     "{60 Monk}"],
+                    utils.parse_tick_for_export(wholog))
+
+    def test_export_to_eqdkp_empty(self):
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        for tick_before_loot in (True, False):
+            with mock.patch.object(config, 'TICK_BEFORE_LOOT',
+                                   tick_before_loot), \
+                    mock.patch.object(config, 'ATTENDANCE_LOGS', []), \
+                    mock.patch.object(config, 'HISTORICAL_AUCTIONS', {}):
+                self.assertTrue(utils.export_to_eqdkp(
+                    os.path.join(tempdir, 'export.xlsx')))
+
+    def test_export_async(self):
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        filename = os.path.join(tempdir, 'export.xlsx')
+        logs = [models.WhoLog(
+            dateutil.parser.parse("Mon Aug 17 07:%02d:39 2020" % minute),
+            {'Jim': models.Player('Jim', 'Cleric', 60, 'Guild')},
+            raidtick=True) for minute in range(10)]
+        for export in (utils.export_to_excel, utils.export_to_eqdkp):
+            with mock.patch.object(config, 'ATTENDANCE_LOGS', logs), \
+                    mock.patch.object(config, 'HISTORICAL_AUCTIONS', {}), \
+                    mock.patch.object(config, 'KILL_TIMERS', []), \
+                    mock.patch.object(config, 'RESTRICT_EXPORT', False):
+                results = []
+                steps = []
+                self.assertTrue(utils.export_async(
+                    export, filename, lambda *step: steps.append(step),
+                    results.append))
+                utils.EXPORT_THREAD.join()
+                self.assertEqual([True], results)
+                self.assertTrue(os.path.exists(filename))
+                self.assertEqual(steps[-1][1], steps[-1][0])
+
+                # Cancelling stops the export and removes the file
+                results.clear()
+                self.assertTrue(utils.export_async(
+                    export, filename, lambda *step: utils.cancel_export(),
+                    results.append))
+                utils.EXPORT_THREAD.join()
+                self.assertEqual([None], results)
+                self.assertFalse(os.path.exists(filename))
+
+    def test_export_to_excel_failures(self):
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        filename = os.path.join(tempdir, 'export.xlsx')
+        logs = [models.WhoLog(
+            dateutil.parser.parse("Mon Aug 17 07:%02d:39 2020" % minute),
+            {'Jim': models.Player('Jim', 'Cleric', 60, 'Guild')})
+            for minute in range(3)]
+        add_worksheet = xlsxwriter.Workbook.add_worksheet
+        make_workbook = utils._new_workbook
+        workbooks = []
+
+        def keep_workbook(*args, **kwargs):
+            workbooks.append(make_workbook(*args, **kwargs))
+            return workbooks[-1]
+
+        def bad_sheet_name(workbook, name=None):
+            if name.startswith('2020'):
+                raise xlsxwriter.exceptions.InvalidWorksheetName(name)
+            return add_worksheet(workbook, name)
+
+        with mock.patch.object(config, 'ATTENDANCE_LOGS', logs), \
+                mock.patch.object(config, 'HISTORICAL_AUCTIONS', {}), \
+                mock.patch.object(config, 'KILL_TIMERS', []), \
+                mock.patch.object(utils, '_new_workbook',
+                                  side_effect=keep_workbook) as new_workbook:
+            # Only the attendance table is written out as it goes
+            for table in (False, True):
+                with mock.patch.object(
+                        config, 'EXPORT_ATTENDANCE_TABLE', table):
+                    self.assertTrue(utils.export_to_excel(filename))
+                new_workbook.assert_called_with(
+                    filename, constant_memory=table)
+
+            # A sheet that can't be added fails the export
+            with mock.patch.object(config, 'EXPORT_ATTENDANCE_TABLE', False), \
+                    mock.patch.object(xlsxwriter.Workbook, 'add_worksheet',
+                                      bad_sheet_name):
+                os.remove(filename)
+                self.assertFalse(utils.export_to_excel(filename))
+                self.assertFalse(os.path.exists(filename))
+
+            # Failing part way, the sheets' temporary files are removed
+            with mock.patch.object(config, 'EXPORT_ATTENDANCE_TABLE', True), \
+                    mock.patch.object(utils, '_attendance_rows',
+                                      side_effect=ValueError):
+                self.assertRaises(
+                    ValueError, utils.export_to_excel, filename)
+                self.assertTrue(workbooks[-1].fileclosed)
+                for worksheet in workbooks[-1].worksheets():
+                    self.assertFalse(
+                        os.path.exists(worksheet.row_data_filename))
+
+    def test_attendance_table(self):
+        logs = [models.WhoLog(
+            dateutil.parser.parse("Mon Aug 17 07:%02d:00 2020" % minute),
+            {'Jim': models.Player('Jim', 'Cleric', 60 if minute else 0,
+                                  'Guild'),
+             'Tim': models.Player('Tim', 'Warrior', 59, '')},
+            raidtick=minute > 0, zone='Plane of Fear')
+            for minute in range(3)]
+        summary = {}
+        rows = []
+        for entry in logs:
+            rows.extend(utils._attendance_rows(entry, entry.time, summary))
+        self.assertEqual(6, len(rows))
+        self.assertEqual(
+            (logs[0].time, 'Plane of Fear', False, 'Jim', '', 'Cleric',
+             'Guild', ''), rows[0])
+        self.assertListEqual(
+            [('Jim', 60, 'Cleric', 'Guild', '', 2, 1.0, 3, logs[0].time,
+              logs[2].time),
+             ('Tim', 59, 'Warrior', '', '', 2, 1.0, 3, logs[0].time,
+              logs[2].time)],
+            list(utils._attendance_summary_rows(summary, 2)))
+
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        steps = []
+        with mock.patch.object(config, 'ATTENDANCE_LOGS', logs), \
+                mock.patch.object(config, 'HISTORICAL_AUCTIONS', {}), \
+                mock.patch.object(config, 'KILL_TIMERS', []), \
+                mock.patch.object(config, 'EXPORT_ATTENDANCE_TABLE', True):
+            self.assertTrue(utils.export_to_excel(
+                os.path.join(tempdir, 'export.xlsx'),
+                progress=lambda *step: steps.append(step)))
+        # a step for each /who log and one for the summary
+        self.assertEqual((7, 7), steps[-1])
@@ -0,0 +1,230 @@
+"""Line-oriented exports of the raid history, as CSV or JSON Lines.
+
+The Excel exports are meant to be read by people; these are meant to be read
+by other tools, such as DKP scripts. Each kind of export is a flat table:
+attendance has a row per player per /who, bids a row per entry in each
+auction's bid ledger (or roll), and so on. Rows are generated and written
+one at a time, so exporting a long history doesn't build it up in memory.
+
+Times are written in ISO 8601, shifted to Eastern time if exports are. The
+optional `since` filter is compared with the times as they were recorded.
+"""
+import collections
+import csv
+import datetime
+import itertools
+import json
+import os
+import threading
+
+import dateutil.parser
+
+from ninjalooter import config
+from ninjalooter import logger
+from ninjalooter import models
+from ninjalooter import utils
+
+# This is the app logger, not related to EQ logs
+LOG = logger.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+# Report progress after this many records, rather than after every one
+PROGRESS_EVERY = 100
+
+
+def _eq_time(some_time: str) -> datetime.datetime:
+    return utils.datetime_from_eq_format(some_time, allow_eastern=False)
+
+
+def _auction_time(auction) -> datetime.datetime:
+    return _eq_time(auction.item.timestamp)
+
+
+def _attendance_items() -> list:
+    return list(config.ATTENDANCE_LOGS)
+
+
+def _attendance_rows(wholog):
+    for name, player in list(wholog.log.items()):
+        yield (wholog.time, wholog.tick_name, wholog.raidtick, wholog.zone,
+               name, player.level or None, player.pclass, player.guild)
+
+
+def _auction_items() -> list:
+    return list(config.HISTORICAL_AUCTIONS.values())
+
+
+def _auction_type(auction) -> str:
+    return 'DKP' if isinstance(auction, models.DKPAuction) else 'Random'
+
+
+def _auction_rows(auction):
+    highest = auction.highest()
+    yield (_auction_time(auction), auction.item.uuid, auction.name(),
+           _auction_type(auction),
+           ', '.join(player for player, _ in highest),
+           highest[0][1] if highest else None)
+
+
+def _bid_rows(auction):
+    auction_time = _auction_time(auction)
+    if isinstance(auction, models.DKPAuction):
+        # A withdrawal has no player
+        for entry in auction.bids.history:
+            yield (auction_time, auction.item.uuid, auction.name(),
+                   entry.time, entry.player, entry.number, entry.channel)
+    else:
+        for player, number in list(auction.rolls.items()):
+            yield (auction_time, auction.item.uuid, auction.name(),
+                   None, player, number, None)
+
+
+def _kill_items() -> list:
+    return list(config.KILL_TIMERS)
+
+
+def _kill_rows(killtime):
+    yield (_eq_time(killtime.time), killtime.name, killtime.island())
+
+
+def _creditt_items() -> list:
+    return list(itertools.chain(config.CREDITT_LOG, config.GRATSS_LOG))
+
+
+def _creditt_rows(message):
+    message_type = ('creditt' if isinstance(message, models.CredittLog)
+                    else 'gratss')
+    yield (_eq_time(message.time), message_type, message.user,
+           message.target(), message.message)
+
+
+# One kind of export:
+# - fields: the name of each column, the first of which is a time
+# - items: copies the list of records to export
+# - time: when a record was made, for the `since` filter
+# - rows: the rows for a record, as tuples of `fields`
+Kind = collections.namedtuple('Kind', ('fields', 'items', 'time', 'rows'))
+
+KINDS = collections.OrderedDict((
+    ('attendance', Kind(
+        ('time', 'tick_name', 'raidtick', 'zone', 'name', 'level', 'class',
+         'guild'),
+        _attendance_items, lambda wholog: wholog.time, _attendance_rows)),
+    ('auctions', Kind(
+        ('time', 'auction', 'item', 'type', 'winner', 'number'),
+        _auction_items, _auction_time, _auction_rows)),
+    ('bids', Kind(
+        ('time', 'auction', 'item', 'bid_time', 'player', 'number',
+         'channel'),
+        _auction_items, _auction_time, _bid_rows)),
+    ('kills', Kind(
+        ('time', 'mob', 'island'),
+        _kill_items, lambda killtime: _eq_time(killtime.time), _kill_rows)),
+    ('creditt', Kind(
+        ('time', 'type', 'user', 'target', 'message'),
+        _creditt_items, lambda message: _eq_time(message.time),
+        _creditt_rows)),
+))
+
+
+def parse_since(value: str) -> datetime.datetime:
+    """Parse a `since` time as local time, like the times in EQ logs
+
+    A time given with a timezone is converted to local time, as naive and
+    aware times can't be compared.
+    """
+    since = dateutil.parser.parse(value)
+    if since.tzinfo is not None:
+        since = since.astimezone().replace(tzinfo=None)
+    return since
+
+
+def guess_format(filename: str) -> str:
+    """The format to write a file in, from its extension"""
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    return extension if extension in FORMATS else 'csv'
+
+
+def rows(kind: str, since: datetime.datetime = None, progress=None,
+         cancel=None):
+    """Generate the rows of an export, with their times formatted
+
+    :param since: leave out records from before this time
+    :param progress: called with how many records are done, of how many
+    :param cancel: a threading.Event to stop early
+    """
+    kind = KINDS[kind]
+    # Copy the list, as it may change while it's being exported
+    with utils.STATE_LOCK:
+        items = kind.items()
+    offset = (utils.eastern_time_offset() if config.EXPORT_TIME_IN_EASTERN
+              else datetime.timedelta())
+
+    def export_time(some_time):
+        if some_time is None:
+            return None
+        return (some_time + offset).isoformat(sep=' ')
+
+    for done, item in enumerate(items, 1):
+        if cancel is not None and cancel.is_set():
+            return
+        if since is None or kind.time(item) >= since:
+            for row in kind.rows(item):
+                yield tuple(export_time(value)
+                            if isinstance(value, datetime.datetime)
+                            else value for value in row)
+        if progress and (done % PROGRESS_EVERY == 0 or done == len(items)):
+            progress(done, len(items))
+
+
+def write_csv(file_pointer, fields, export_rows) -> None:
+    writer = csv.writer(file_pointer)
+    writer.writerow(fields)
+    for row in export_rows:
+        writer.writerow(row)
+
+
+def write_jsonl(file_pointer, fields, export_rows) -> None:
+    for row in export_rows:
+        file_pointer.write(json.dumps(dict(zip(fields, row))))
+        file_pointer.write("\n")
+
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl}
+
+
+def write(kind: str, export_format: str, file_pointer, since=None,
+          progress=None, cancel=None) -> None:
+    """Write an export to an open text file, as it's generated"""
+    WRITERS[export_format](
+        file_pointer, KINDS[kind].fields,
+        rows(kind, since=since, progress=progress, cancel=cancel))
+
+
+def export(kind: str, export_format: str, filename: str, since=None,
+           progress=None, cancel=None):
+    """Export one kind of record to a CSV or JSON Lines file
+
+    Takes the same progress and cancel arguments as utils.export_to_excel,
+    so it can be run with utils.export_async.
+
+    :return: True if the file was written, False if it couldn't be, or
+        None if the export was cancelled
+    """
+    LOG.info("Exporting %s to %s file: %s", kind, export_format, filename)
+    cancel = cancel or threading.Event()
+    try:
+        with open(filename, 'w', newline='', encoding='utf-8') as export_fp:
+            write(kind, export_format, export_fp, since=since,
+                  progress=progress, cancel=cancel)
+    except OSError:
+        LOG.exception("Failed to export to %s.", filename)
+        return False
+    if cancel.is_set():
+        LOG.info("Export to %s was cancelled.", filename)
+        try:
+            os.remove(filename)
+        except OSError:
+            LOG.exception("Failed to remove cancelled export: %s", filename)
+        return None
+    return True
@@ -7,6 +7,7 @@ import wx.lib.splitter
 
 from ninjalooter import config
 from ninjalooter import models
+from ninjalooter import raidgroups
 from ninjalooter import utils
 
 
@@ -203,6 +204,7 @@ class AttendanceFrame(wx.Window):
         if not selected_object:
             return
         config.CREDITT_LOG.remove(selected_object)
+        utils.forget_chat('CREDITT_LOG', selected_object)
         self.creditt_list.SetObjects(config.CREDITT_LOG)
         item_count = self.creditt_list.GetItemCount()
         if item_count > 0:
@@ -215,6 +217,7 @@ class AttendanceFrame(wx.Window):
         if not selected_object:
             return
         config.GRATSS_LOG.remove(selected_object)
+        utils.forget_chat('GRATSS_LOG', selected_object)
         self.gratss_list.SetObjects(config.GRATSS_LOG)
         item_count = self.gratss_list.GetItemCount()
         if item_count > 0:
@@ -255,16 +258,50 @@ class AttendanceFrame(wx.Window):
     def OnCalcRaidGroups(self, e: wx.Event):
         selected_tick = self.attendance_list.GetSelectedObject()
         if selected_tick:
-            config.RAID_GROUPS.build_groups(list(selected_tick.log.values()))
-            wx.PostEvent(self.GetGrandParent(), models.CalcRaidGroupsEvent())
-        print("raidgroups")
+            if config.RAID_GROUP_SOLVER:
+                config.RAID_GROUP_SOLVER.cancel()
+            window = self.GetGrandParent()
+            if config.RAID_GROUP_STRATEGY == "greedy":
+                # Quick enough to do right here
+                config.RAID_GROUP_SOLVER = None
+                config.RAID_GROUPS = raidgroups.GroupBuilder()
+                score = config.RAID_GROUPS.build_groups_greedy(
+                    list(selected_tick.log.values()),
+                    polish_moves=config.RAID_GROUP_POLISH_MOVES)
+                wx.PostEvent(window, models.CalcRaidGroupsEvent(score=score))
+            else:
+                self.StartRaidGroupSolver(selected_tick, window)
+
+    @staticmethod
+    def StartRaidGroupSolver(selected_tick: models.WhoLog,
+                             window: wx.Window):
+        previous = None
+        if config.RAID_GROUP_WARM_START and config.RAID_GROUPS.raid.groups:
+            # Only place who joined or left since the last groups
+            previous = config.RAID_GROUPS.raid
+        solver = raidgroups.GroupSolver(
+            raidgroups.GroupBuilder(), selected_tick.log.values(),
+            chains=config.RAID_GROUP_CHAINS,
+            master_seed=config.RAID_GROUP_SEED,
+            budget=config.RAID_GROUP_TIME_BUDGET,
+            processes=config.RAID_GROUP_PROCESSES,
+            previous=previous, move_cost=config.RAID_GROUP_MOVE_COST,
+            candidates=config.RAID_GROUP_SWAP_CANDIDATES)
+        # Groups are shown as they improve, from the solver's thread
+        solver.progress = lambda score, raid: wx.PostEvent(
+            window, models.CalcRaidGroupsEvent(
+                raid, score, solver, done=False))
+        solver.done = lambda result: wx.PostEvent(
+            window, models.CalcRaidGroupsEvent(
+                solver.builder.raid, result.score, solver))
+        config.RAID_GROUP_SOLVER = solver
+        solver.start()
 
     def OnShowRaidOverview(self, e: wx.Event):
         selected_tick = self.attendance_list.GetSelectedObject()
         if selected_tick:
             wx.PostEvent(self.GetGrandParent(),
                          models.ShowRaidOverviewEvent(selected_tick))
-        print("raid overview")
 
     def OnWhoHistory(self, e: models.WhoHistoryEvent):
         if self.attendance_button_raidtick.GetValue():
@@ -308,6 +345,7 @@ class AttendanceFrame(wx.Window):
         if not selected_object:
             return
         selected_object.raidtick = not selected_object.raidtick
+        utils.record_tick(selected_object)
         self.OnRaidtickOnly(e)
         self.attendance_list.SelectObject(selected_object)
         utils.store_state()
@@ -413,8 +451,10 @@ class AttendanceDetailWindow(wx.Frame):
             self.item.log.pop(selected_player.name)
         except KeyError:
             pass  # already removed a duplicate -- shouldn't happen anymore
+        self.item.changed()
         self.attendance_record.RemoveObject(selected_player)
         self.Update()
+        utils.record_tick(self.item)
         utils.store_state()
 
     def OnAddPlayer(self, e: wx.EVT_BUTTON):
@@ -435,8 +475,10 @@ class AttendanceDetailWindow(wx.Frame):
 
         if player_name not in self.item.log:
             self.item.log[player_name] = player_record
+            self.item.changed()
             self.attendance_record.AddObject(player_record)
             self.attendance_record.Update()
+            utils.record_tick(self.item)
             utils.store_state()
 
     def OnClose(self, e: wx.EVT_CLOSE):
@@ -447,5 +489,6 @@ class AttendanceDetailWindow(wx.Frame):
             self.item.tick_name = self.item.tick_name.replace(c, '-')
         self.item.tick_name = self.item.tick_name.replace('*', '')
         self.GetParent().RefreshList()
+        utils.record_tick(self.item)
         utils.store_state()
         self.Destroy()
@@ -7,6 +7,7 @@ import wx
 import wx.lib.splitter
 
 from ninjalooter import config
+from ninjalooter import journal
 from ninjalooter import models
 from ninjalooter import utils
 
@@ -334,12 +335,15 @@ class BiddingFrame(wx.Window):
         selected_index = self.pending_list.GetFirstSelected()
         if not selected_object:
             return
-        utils.ignore_pending_item(selected_object)
+        with utils.STATE_LOCK:
+            utils.ignore_pending_item(selected_object)
+            utils.store_state(mutations=[
+                journal.Remove('PENDING_AUCTIONS', index=selected_object.uuid),
+                journal.Append('IGNORED_AUCTIONS', selected_object)])
         self.pending_list.SetObjects(config.PENDING_AUCTIONS)
         item_count = self.pending_list.GetItemCount()
         if item_count > 0:
             self.pending_list.Select(min(selected_index, item_count - 1))
-        utils.store_state()
         wx.PostEvent(self.GetGrandParent(), models.IgnoreEvent())
 
     def DialogDuplicate(self):
@@ -356,13 +360,17 @@ class BiddingFrame(wx.Window):
         if not selected_object:
             return
         selected_object.cancel()
-        config.PENDING_AUCTIONS.append(selected_object.item)
-        config.ACTIVE_AUCTIONS.pop(selected_object.item.uuid)
+        with utils.STATE_LOCK:
+            config.PENDING_AUCTIONS.append(selected_object.item)
+            config.ACTIVE_AUCTIONS.pop(selected_object.item.uuid)
+            utils.store_state(mutations=[
+                journal.Delete('ACTIVE_AUCTIONS',
+                               index=selected_object.item.uuid),
+                journal.Append('PENDING_AUCTIONS', selected_object.item)])
         self.pending_list.SetObjects(config.PENDING_AUCTIONS)
         self.active_list.SetObjects(
             list(config.ACTIVE_AUCTIONS.values()))
         self.pending_list.SelectObject(selected_object.item)
-        utils.store_state()
 
     def OnMinDkpSpin(self, e: wx.SpinEvent):
         min_dkp = self.min_dkp_spinner.GetValue()
@@ -394,7 +402,14 @@ class BiddingFrame(wx.Window):
         selected_object = self.pending_list.GetSelectedObject()
         if not selected_object:
             return
-        auc = utils.start_auction_dkp(selected_object, config.DEFAULT_ALLIANCE)
+        with utils.STATE_LOCK:
+            auc = utils.start_auction_dkp(
+                selected_object, config.DEFAULT_ALLIANCE)
+            if auc:
+                utils.store_state(mutations=[
+                    journal.Remove('PENDING_AUCTIONS',
+                                   index=selected_object.uuid),
+                    journal.Put('ACTIVE_AUCTIONS', selected_object.uuid, auc)])
         if not auc:
             self.DialogDuplicate()
             return
@@ -403,13 +418,18 @@ class BiddingFrame(wx.Window):
             list(config.ACTIVE_AUCTIONS.values()))
         self.active_list.SelectObject(auc)
         self.CopyBidText(e)
-        utils.store_state()
 
     def StartAuctionRandom(self, e: wx.Event):
         selected_object = self.pending_list.GetSelectedObject()
         if not selected_object:
             return
-        auc = utils.start_auction_random(selected_object)
+        with utils.STATE_LOCK:
+            auc = utils.start_auction_random(selected_object)
+            if auc:
+                utils.store_state(mutations=[
+                    journal.Remove('PENDING_AUCTIONS',
+                                   index=selected_object.uuid),
+                    journal.Put('ACTIVE_AUCTIONS', selected_object.uuid, auc)])
         if not auc:
             self.DialogDuplicate()
             return
@@ -418,16 +438,19 @@ class BiddingFrame(wx.Window):
             list(config.ACTIVE_AUCTIONS.values()))
         self.active_list.SelectObject(auc)
         self.CopyBidText(e)
-        utils.store_state()
 
     def CompleteAuction(self, e: wx.Event):
         selected_object = self.active_list.GetSelectedObject()
         if not selected_object:
             return
         selected_object.complete()
-        config.HISTORICAL_AUCTIONS[selected_object.item.uuid] = (
-            selected_object)
-        config.ACTIVE_AUCTIONS.pop(selected_object.item.uuid)
+        uuid = selected_object.item.uuid
+        with utils.STATE_LOCK:
+            config.HISTORICAL_AUCTIONS[uuid] = selected_object
+            config.ACTIVE_AUCTIONS.pop(uuid)
+            utils.store_state(mutations=[
+                journal.Delete('ACTIVE_AUCTIONS', index=uuid),
+                journal.Put('HISTORICAL_AUCTIONS', uuid, selected_object)])
         self.active_list.SetObjects(
             list(config.ACTIVE_AUCTIONS.values()))
         self.history_list.SetObjects(
@@ -435,21 +458,23 @@ class BiddingFrame(wx.Window):
         self.OnHideRot(None)
         self.history_list.SelectObject(selected_object)
         self.CopyWinText(e)
-        utils.store_state()
 
     def UndoComplete(self, e: wx.Event):
         selected_object = self.history_list.GetSelectedObject()
         if not selected_object:
             return
-        config.ACTIVE_AUCTIONS[selected_object.item.uuid] = (
-            selected_object)
-        config.HISTORICAL_AUCTIONS.pop(selected_object.item.uuid)
+        uuid = selected_object.item.uuid
+        with utils.STATE_LOCK:
+            config.ACTIVE_AUCTIONS[uuid] = selected_object
+            config.HISTORICAL_AUCTIONS.pop(uuid)
+            utils.store_state(mutations=[
+                journal.Delete('HISTORICAL_AUCTIONS', index=uuid),
+                journal.Put('ACTIVE_AUCTIONS', uuid, selected_object)])
         self.active_list.SetObjects(
             list(config.ACTIVE_AUCTIONS.values()))
         self.history_list.SetObjects(
             list(config.HISTORICAL_AUCTIONS.values()))
         self.active_list.SelectObject(selected_object)
-        utils.store_state()
 
     def AucTimeDelta(self, e: wx.Event):
         selected_object = self.active_list.GetSelectedObject()
@@ -465,6 +490,7 @@ class BiddingFrame(wx.Window):
                         datetime.datetime.now() -
                         datetime.timedelta(seconds=config.MIN_BID_TIME))
             selected_object.start_time += delta
+        selected_object.schedule_alert()
 
     def CopyBidText(self, e: wx.Event):
         selected_object = self.active_list.GetSelectedObject()
@@ -0,0 +1,140 @@
+# pylint: disable=no-member,invalid-name,unused-argument
+import ObjectListView
+import wx
+
+from ninjalooter import config
+from ninjalooter import sqlstore
+from ninjalooter import utils
+
+
+class HistoryWindow(wx.Frame):
+    def __init__(self, parent=None, title="Raid History"):
+        wx.Frame.__init__(self, parent, title=title, size=(720, 600))
+        store = utils.get_sql_store()
+        self.auction_search = ""
+        self.player_search = ""
+        self.auctions = sqlstore.PagedQuery(
+            lambda: store.count_auctions(self.auction_search),
+            lambda offset, limit: store.auctions_page(
+                offset, limit, self.auction_search))
+        self.ticks = sqlstore.PagedQuery(
+            lambda: store.count_ticks(self.player_search),
+            lambda offset, limit: store.ticks_page(
+                offset, limit, self.player_search))
+
+        notebook = wx.Notebook(self)
+
+        ################
+        # Auctions Tab #
+        ################
+        auctions_panel = wx.Panel(notebook)
+        auctions_box = wx.BoxSizer(wx.VERTICAL)
+        auction_search = wx.SearchCtrl(
+            auctions_panel, style=wx.TE_PROCESS_ENTER)
+        auction_search.SetDescriptiveText("Item or winner")
+        auction_search.Bind(wx.EVT_TEXT_ENTER, self.OnSearchAuctions)
+        auction_search.Bind(wx.EVT_SEARCHCTRL_SEARCH_BTN,
+                            self.OnSearchAuctions)
+        auctions_box.Add(auction_search, flag=wx.EXPAND | wx.ALL, border=5)
+        self.auction_search_ctrl = auction_search
+
+        auction_list = ObjectListView.VirtualObjectListView(
+            auctions_panel, wx.ID_ANY,
+            style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        auction_list.SetColumns([
+            ObjectListView.ColumnDefn("Start Time", "left", 170, "time",
+                                      fixedWidth=170),
+            ObjectListView.ColumnDefn("Item", "left", 250, "item",
+                                      fixedWidth=250),
+            ObjectListView.ColumnDefn("Winner", "left", 120, "winner",
+                                      fixedWidth=120),
+            ObjectListView.ColumnDefn("Amount", "left", 80, "amount",
+                                      fixedWidth=80),
+        ])
+        auction_list.SetObjectGetter(self.auctions.__getitem__)
+        auction_list.SetEmptyListMsg("No auctions in history.")
+        auctions_box.Add(auction_list, proportion=1, flag=wx.EXPAND)
+        self.auction_list = auction_list
+        auctions_panel.SetSizer(auctions_box)
+        notebook.AddPage(auctions_panel, "Auctions")
+
+        ##################
+        # Attendance Tab #
+        ##################
+        attendance_panel = wx.Panel(notebook)
+        attendance_box = wx.BoxSizer(wx.VERTICAL)
+        player_search = wx.SearchCtrl(
+            attendance_panel, style=wx.TE_PROCESS_ENTER)
+        player_search.SetDescriptiveText("Exact player name")
+        player_search.Bind(wx.EVT_TEXT_ENTER, self.OnSearchPlayer)
+        player_search.Bind(wx.EVT_SEARCHCTRL_SEARCH_BTN, self.OnSearchPlayer)
+        attendance_box.Add(player_search, flag=wx.EXPAND | wx.ALL, border=5)
+        self.player_search_ctrl = player_search
+
+        lists_box = wx.BoxSizer(wx.HORIZONTAL)
+        tick_list = ObjectListView.VirtualObjectListView(
+            attendance_panel, wx.ID_ANY,
+            style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        tick_list.SetColumns([
+            ObjectListView.ColumnDefn("Time", "left", 150, "time",
+                                      fixedWidth=150),
+            ObjectListView.ColumnDefn("Tick", "left", 120, "tick_name",
+                                      fixedWidth=120),
+            ObjectListView.ColumnDefn("Zone", "left", 110, "zone",
+                                      fixedWidth=110),
+            ObjectListView.ColumnDefn("Players", "left", 55, "players",
+                                      fixedWidth=55),
+        ])
+        tick_list.SetObjectGetter(self.ticks.__getitem__)
+        tick_list.SetEmptyListMsg("No attendance in history.")
+        tick_list.Bind(wx.EVT_LIST_ITEM_SELECTED, self.OnSelectTick)
+        lists_box.Add(tick_list, proportion=3, flag=wx.EXPAND)
+        self.tick_list = tick_list
+
+        player_list = ObjectListView.ObjectListView(
+            attendance_panel, wx.ID_ANY,
+            style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        player_list.SetColumns([
+            ObjectListView.ColumnDefn("Name", "left", 100, "name",
+                                      fixedWidth=100),
+            ObjectListView.ColumnDefn("Guild", "left", 120, "guild",
+                                      fixedWidth=120),
+        ])
+        player_list.SetEmptyListMsg("Select a tick.")
+        lists_box.Add(player_list, proportion=2, flag=wx.EXPAND)
+        self.player_list = player_list
+
+        attendance_box.Add(lists_box, proportion=1, flag=wx.EXPAND)
+        attendance_panel.SetSizer(attendance_box)
+        notebook.AddPage(attendance_panel, "Attendance")
+
+        self.RefreshLists()
+        if config.ALWAYS_ON_TOP:
+            self.SetWindowStyle(
+                self.GetWindowStyle() | wx.STAY_ON_TOP)
+        self.Show()
+
+    def RefreshLists(self):
+        self.auctions.refresh()
+        self.auction_list.SetItemCount(len(self.auctions))
+        self.auction_list.RefreshObjects()
+        self.ticks.refresh()
+        self.tick_list.SetItemCount(len(self.ticks))
+        self.tick_list.RefreshObjects()
+        self.player_list.SetObjects([])
+
+    def OnSearchAuctions(self, e: wx.Event):
+        self.auction_search = self.auction_search_ctrl.GetValue().strip()
+        self.RefreshLists()
+
+    def OnSearchPlayer(self, e: wx.Event):
+        self.player_search = (
+            self.player_search_ctrl.GetValue().strip().capitalize())
+        self.RefreshLists()
+
+    def OnSelectTick(self, e: wx.Event):
+        tick = self.tick_list.GetSelectedObject()
+        if not tick:
+            return
+        self.player_list.SetObjects(
+            utils.get_sql_store().tick_players(tick['id']))
@@ -2,6 +2,7 @@
 # pylint: disable=too-many-instance-attributes
 
 import datetime
+import functools
 import os.path
 
 import wx
@@ -12,12 +13,17 @@ from ninjalooter import logger
 from ninjalooter import logparse
 from ninjalooter import logreplay
 from ninjalooter import models
+from ninjalooter import textexport
 from ninjalooter.ui import bidding_frame
+from ninjalooter.ui import history_frame
+from ninjalooter.ui import sessions_frame
 from ninjalooter import utils
 
 # This is the app logger, not related to EQ logs
 LOG = logger.getLogger(__name__)
 
+TEXT_EXPORT_LABELS = {'creditt': 'Creditt && Gratss'}
+
 
 class MenuBar(wx.MenuBar):
     def __init__(self, parent, *args, **kwargs):
@@ -66,6 +72,15 @@ class MenuBar(wx.MenuBar):
         self.export_tz_mi.Check(config.EXPORT_TIME_IN_EASTERN)
         self.Bind(wx.EVT_MENU, self.OnExportTimezone, self.export_tz_mi)
 
+        self.export_table_mi = wx.MenuItem(
+            file_menu, wx.ID_ANY, 'Export Attendance as One Table',
+            kind=wx.ITEM_CHECK)
+        file_menu.Append(self.export_table_mi)
+        self.export_table_mi.Check(config.EXPORT_ATTENDANCE_TABLE)
+        self.export_table_mi.Enable(config.ALLOW_EXCEL_EXPORT)
+        self.Bind(wx.EVT_MENU, self.OnExportAttendanceTable,
+                  self.export_table_mi)
+
         export_excel_mi = wx.MenuItem(
             file_menu, wx.ID_FLOPPY, '&Export to Excel\tCtrl+E')
         export_bitmap = wx.Bitmap(os.path.join(
@@ -83,6 +98,17 @@ class MenuBar(wx.MenuBar):
         file_menu.Append(export_dkp_mi)
         self.Bind(wx.EVT_MENU, self.OnExportEQDKP, export_dkp_mi)
 
+        text_export_menu = wx.Menu()
+        self.text_export_kinds = {}
+        for kind in textexport.KINDS:
+            kind_item = wx.MenuItem(
+                text_export_menu, wx.ID_ANY,
+                TEXT_EXPORT_LABELS.get(kind, kind.capitalize()))
+            text_export_menu.Append(kind_item)
+            self.text_export_kinds[kind_item.GetId()] = kind
+            self.Bind(wx.EVT_MENU, self.OnExportText, kind_item)
+        file_menu.AppendSubMenu(text_export_menu, 'Export to CSV/JSON &Lines')
+
         file_menu.AppendSeparator()
 
         load_state_mi = wx.MenuItem(file_menu, wx.ID_ANY, '&Load State')
@@ -92,6 +118,15 @@ class MenuBar(wx.MenuBar):
         file_menu.Append(load_state_mi)
         self.Bind(wx.EVT_MENU, self.OnLoadState, load_state_mi)
 
+        history_mi = wx.MenuItem(file_menu, wx.ID_ANY, 'Browse &History...')
+        file_menu.Append(history_mi)
+        history_mi.Enable(config.SQLITE_ENABLED)
+        self.Bind(wx.EVT_MENU, self.OnShowHistory, history_mi)
+
+        sessions_mi = wx.MenuItem(file_menu, wx.ID_ANY, 'Raid &Sessions...')
+        file_menu.Append(sessions_mi)
+        self.Bind(wx.EVT_MENU, self.OnShowSessions, sessions_mi)
+
         replay_mi = wx.MenuItem(file_menu, wx.ID_OPEN, '&Replay Log File')
         replay_mi.Enable(False)
         replay_bitmap = wx.Bitmap(os.path.join(
@@ -181,6 +216,14 @@ class MenuBar(wx.MenuBar):
         self.nodrop_only_mi.Check(config.NODROP_ONLY)
         self.Bind(wx.EVT_MENU, self.OnNodropOnly, self.nodrop_only_mi)
 
+        self.fuzzy_item_match_mi = wx.MenuItem(
+            bidding_menu, wx.ID_ANY, 'Detect &Misspelled Items',
+            kind=wx.ITEM_CHECK)
+        bidding_menu.Append(self.fuzzy_item_match_mi)
+        self.fuzzy_item_match_mi.Check(config.FUZZY_ITEM_MATCH)
+        self.Bind(wx.EVT_MENU, self.OnFuzzyItemMatch,
+                  self.fuzzy_item_match_mi)
+
         self.tick_before_loot_mi = wx.MenuItem(
             bidding_menu, wx.ID_ANY, 'Tick Before Loot (Quake Mode)',
             kind=wx.ITEM_CHECK)
@@ -228,8 +271,16 @@ class MenuBar(wx.MenuBar):
         if result != wx.ID_OK:
             return
         utils.load_state(filename)
+        # Later journal records must build on the loaded state
+        utils.checkpoint_state()
         wx.PostEvent(self.GetParent(), models.AppReloadEvent())
 
+    def OnShowHistory(self, e: wx.MenuEvent):
+        history_frame.HistoryWindow(parent=self.GetParent())
+
+    def OnShowSessions(self, e: wx.MenuEvent):
+        sessions_frame.SessionsWindow(parent=self.GetParent())
+
     def OnReplayLog(self, e: wx.MenuEvent):
         LOG.info("Attempting to replay an eqlog...")
         openFileDialog = wx.FileDialog(
@@ -433,6 +484,13 @@ class MenuBar(wx.MenuBar):
             str(config.EXPORT_TIME_IN_EASTERN))
         config.write()
 
+    def OnExportAttendanceTable(self, e: wx.MenuEvent):
+        config.EXPORT_ATTENDANCE_TABLE = self.export_table_mi.IsChecked()
+        config.CONF.set(
+            'default', 'export_attendance_table',
+            str(config.EXPORT_ATTENDANCE_TABLE))
+        config.write()
+
     def OnExportExcel(self, e: wx.MenuEvent):
         LOG.info("Exporting to Excel format.")
         saveFileDialog = wx.FileDialog(
@@ -445,23 +503,8 @@ class MenuBar(wx.MenuBar):
             filename = filename + ".xlsx"
         saveFileDialog.Destroy()
         if result == wx.ID_OK:
-            result = utils.export_to_excel(filename)
-            if not result:
-                dlg = wx.MessageDialog(
-                    self,
-                    "Failed to export data. The most common cause of this\n"
-                    "error is attempting to export to a file that is still "
-                    "open\nin Excel.",
-                    "Failed to Export", wx.OK | wx.ICON_ERROR)
-                dlg.ShowModal()
-                dlg.Destroy()
-            else:
-                dlg = wx.MessageDialog(
-                    self,
-                    "Successfully exported data to:\n%s" % filename,
-                    "Export Complete", wx.OK | wx.ICON_INFORMATION)
-                dlg.ShowModal()
-                dlg.Destroy()
+            self.StartExport(
+                utils.export_to_excel, filename, "Export to Excel")
 
     def OnExportEQDKP(self, e: wx.MenuEvent):
         LOG.info("Exporting to EQDKPlus format.")
@@ -475,23 +518,110 @@ class MenuBar(wx.MenuBar):
             filename = filename + ".xlsx"
         saveFileDialog.Destroy()
         if result == wx.ID_OK:
-            result = utils.export_to_eqdkp(filename)
-            if not result:
+            self.StartExport(
+                utils.export_to_eqdkp, filename, "Export to EQDKPlus")
+
+    def OnExportText(self, e: wx.MenuEvent):
+        kind = self.text_export_kinds[e.GetId()]
+        LOG.info("Exporting %s to CSV/JSON Lines.", kind)
+        saveFileDialog = wx.FileDialog(
+            self.GetParent(), "Export %s" % kind.capitalize(), "", "",
+            "CSV (*.csv)|*.csv|JSON Lines (*.jsonl)|*.jsonl", wx.FD_SAVE)
+
+        result = saveFileDialog.ShowModal()
+        filename = saveFileDialog.GetPath()
+        extension = os.path.splitext(filename)[1].lstrip(".").lower()
+        if extension in textexport.FORMATS:
+            export_format = extension
+        else:
+            export_format = textexport.FORMATS[
+                saveFileDialog.GetFilterIndex()]
+            filename = filename + "." + export_format
+        saveFileDialog.Destroy()
+        if result != wx.ID_OK:
+            return
+
+        since_dialog = wx.TextEntryDialog(
+            self.GetParent(),
+            "Only export records since (e.g. 2021-03-14 19:00),\n"
+            "or leave blank to export everything:", "Export Since")
+        result = since_dialog.ShowModal()
+        since_text = since_dialog.GetValue().strip()
+        since_dialog.Destroy()
+        if result != wx.ID_OK:
+            return
+        since = None
+        if since_text:
+            try:
+                since = textexport.parse_since(since_text)
+            except (ValueError, OverflowError):
                 dlg = wx.MessageDialog(
-                    self,
-                    "Failed to export data. The most common cause of this\n"
-                    "error is attempting to export to a file that is still "
-                    "open\nin Excel.",
+                    self, "Couldn't read the time: %s" % since_text,
                     "Failed to Export", wx.OK | wx.ICON_ERROR)
                 dlg.ShowModal()
                 dlg.Destroy()
-            else:
-                dlg = wx.MessageDialog(
-                    self,
-                    "Successfully exported data to:\n%s" % filename,
-                    "Export Complete", wx.OK | wx.ICON_INFORMATION)
-                dlg.ShowModal()
-                dlg.Destroy()
+                return
+
+        self.StartExport(
+            functools.partial(textexport.export, kind, export_format,
+                              since=since),
+            filename, "Export %s" % kind.capitalize())
+
+    def StartExport(self, export, filename, title):
+        """Run an export in the background, showing its progress
+
+        The dialog's Cancel button stops the export.
+        """
+        progress_dialog = wx.ProgressDialog(
+            title, "Exporting to %s" % filename, parent=self.GetParent(),
+            style=wx.PD_CAN_ABORT | wx.PD_ELAPSED_TIME | wx.PD_AUTO_HIDE)
+
+        def progress(done, total):
+            wx.CallAfter(self.OnExportProgress, progress_dialog, done, total)
+
+        def done(result):
+            wx.CallAfter(self.OnExportDone, progress_dialog, filename, result)
+
+        if not utils.export_async(export, filename, progress, done):
+            progress_dialog.Destroy()
+            dlg = wx.MessageDialog(
+                self,
+                "Another export is still running. Please wait for it to "
+                "finish.",
+                "Export Running", wx.OK | wx.ICON_WARNING)
+            dlg.ShowModal()
+            dlg.Destroy()
+
+    def OnExportProgress(self, progress_dialog, done, total):
+        if not progress_dialog:
+            return
+        progress_dialog.SetRange(max(total, 1))
+        keep_going, _ = progress_dialog.Update(min(done, total))
+        if not keep_going:
+            utils.cancel_export()
+
+    def OnExportDone(self, progress_dialog, filename, result):
+        if progress_dialog:
+            progress_dialog.Destroy()
+        if result is None:
+            # Cancelled
+            return
+        if not result:
+            dlg = wx.MessageDialog(
+                self,
+                "Failed to export data. The most common cause of this\n"
+                "error is attempting to export to a file that is still "
+                "open\nin Excel.",
+                "Failed to Export", wx.OK | wx.ICON_ERROR)
+            dlg.ShowModal()
+            dlg.Destroy()
+        else:
+            dlg = wx.MessageDialog(
+                self,
+                "Successfully exported data to:\n%s" % filename,
+                "Export Complete", wx.OK | wx.ICON_INFORMATION)
+            dlg.ShowModal()
+            dlg.Destroy()
 
     def OnClearApp(self, e: wx.MenuEvent):
         dlg = wx.MessageDialog(
@@ -501,9 +631,24 @@ class MenuBar(wx.MenuBar):
         result = dlg.ShowModal()
         dlg.Destroy()
         if result == wx.ID_OK:
-            utils.store_state(backup=True)
+            utils.archive_history()
+            try:
+                utils.store_state(backup=True)
+            except (OSError, RuntimeError):
+                LOG.exception("Failed to archive the session, not clearing.")
+                dlg = wx.MessageDialog(
+                    self,
+                    "Failed to archive the current session, so it was not "
+                    "cleared.\nCheck that there is space to write to:\n%s"
+                    % config.SESSIONS_DIR,
+                    "Failed to Clear", wx.OK | wx.ICON_ERROR)
+                dlg.ShowModal()
+                dlg.Destroy()
+                return
             wx.PostEvent(self.GetParent(), models.AppClearEvent())
             utils.clear_alerts()
+            # Snapshot the cleared state once the frames have handled it
+            wx.CallAfter(utils.checkpoint_state)
 
     def OnRestrictBids(self, e: wx.MenuEvent):
         config.RESTRICT_BIDS = self.restrict_bids_mi.IsChecked()
@@ -523,6 +668,14 @@ class MenuBar(wx.MenuBar):
             'default', 'nodrop_only', str(config.NODROP_ONLY))
         config.write()
 
+    def OnFuzzyItemMatch(self, e: wx.MenuEvent):
+        config.FUZZY_ITEM_MATCH = self.fuzzy_item_match_mi.IsChecked()
+        config.CONF.set(
+            'default', 'fuzzy_item_match', str(config.FUZZY_ITEM_MATCH))
+        if config.FUZZY_ITEM_MATCH and config.ITEMS:
+            utils.setup_fuzzy_index()
+        config.write()
+
     def OnTickBeforeLoot(self, e: wx.MenuEvent):
         config.TICK_BEFORE_LOOT = self.tick_before_loot_mi.IsChecked()
         config.CONF.set(
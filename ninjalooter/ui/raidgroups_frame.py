@@ -20,9 +20,22 @@ class RaidGroupsFrame(wx.Window):
         ###########################
         # Raid Groups Frame (Tab 5)
         ###########################
+        raidgroups_box = wx.BoxSizer(wx.VERTICAL)
         self.raidgroups_main_box = wx.WrapSizer()
         self.label_font = wx.Font(11, wx.DEFAULT, wx.DEFAULT, wx.BOLD)
 
+        # Progress of the search for groups, which can be stopped early
+        status_box = wx.BoxSizer(wx.HORIZONTAL)
+        self.status_text = wx.StaticText(self, label="")
+        self.stop_button = wx.Button(self, label="Stop", size=(60, 22))
+        self.stop_button.Bind(wx.EVT_BUTTON, self.OnStopRaidGroups)
+        self.stop_button.Hide()
+        status_box.Add(self.stop_button, flag=wx.RIGHT, border=10)
+        status_box.Add(self.status_text, flag=wx.ALIGN_CENTER_VERTICAL)
+        raidgroups_box.Add(status_box, flag=wx.TOP | wx.LEFT, border=10)
+        raidgroups_box.Add(self.raidgroups_main_box)
+        self.shown_solver = None
+
         self.no_groups_text = wx.StaticText(
             self,
             label="No raid groups have been calculated.\n\n"
@@ -33,15 +46,34 @@ class RaidGroupsFrame(wx.Window):
                                      flag=wx.TOP | wx.LEFT, border=10)
 
         # Finalize Tab
-        self.SetSizer(self.raidgroups_main_box)
+        self.SetSizer(raidgroups_box)
         parent.AddPage(self, 'Raid Groups')
 
     def OnCalcRaidGroups(self, e: models.CalcRaidGroupsEvent):
         print("Calc raidgroups")
+        if e.solver is not None:
+            if e.solver is not config.RAID_GROUP_SOLVER:
+                # Left over from a search that has been replaced
+                e.Skip()
+                return
+            if e.done:
+                config.RAID_GROUPS = e.solver.builder
+                self.stop_button.Hide()
+                self.status_text.SetLabel(
+                    "Best score: %d (seed %d)" % (
+                        e.score, e.solver.result.master_seed))
+            else:
+                self.stop_button.Show()
+                self.status_text.SetLabel(
+                    "Searching... best score so far: %d" % e.score)
+        elif e.score is not None:
+            self.stop_button.Hide()
+            self.status_text.SetLabel("Score: %d" % e.score)
+        raid = e.raid or config.RAID_GROUPS.raid
         for child in self.raidgroups_main_box.GetChildren():
             child.Show(False)
         self.raidgroups_main_box.Clear()
-        for group in config.RAID_GROUPS.raid.groups:
+        for group in raid.groups:
             group_box = wx.BoxSizer(wx.VERTICAL)
             group_type_label = wx.StaticText(
                 self, label="%s Group" % group.group_type)
@@ -64,11 +96,23 @@ class RaidGroupsFrame(wx.Window):
                 group_box, flag=wx.TOP | wx.LEFT, border=10)
         self.raidgroups_main_box.Layout()
         self.Layout()
-        self.GetParent().SetSelection(4)
+        if e.solver is None or e.solver is not self.shown_solver:
+            self.shown_solver = e.solver
+            self.GetParent().SetSelection(4)
         e.Skip()
 
+    def OnStopRaidGroups(self, e: wx.Event):
+        # Keeps the best groups found so far
+        if config.RAID_GROUP_SOLVER:
+            config.RAID_GROUP_SOLVER.cancel()
+
     def OnClearApp(self, e: models.AppClearEvent):
+        if config.RAID_GROUP_SOLVER:
+            config.RAID_GROUP_SOLVER.cancel()
+            config.RAID_GROUP_SOLVER = None
         config.RAID_GROUPS = raidgroups.GroupBuilder()
+        self.stop_button.Hide()
+        self.status_text.SetLabel("")
         for child in self.raidgroups_main_box.GetChildren():
             child.Show(False)
         self.raidgroups_main_box.Clear()
@@ -0,0 +1,134 @@
+# pylint: disable=no-member,invalid-name,unused-argument
+import ObjectListView
+import wx
+
+from ninjalooter import config
+from ninjalooter import logger
+from ninjalooter import models
+from ninjalooter import utils
+
+# This is the app logger, not related to EQ logs
+LOG = logger.getLogger(__name__)
+
+
+class SessionsWindow(wx.Frame):
+    def __init__(self, parent=None, title="Raid Sessions"):
+        wx.Frame.__init__(self, parent, title=title, size=(760, 600))
+        self.main_window = parent
+        main_box = wx.BoxSizer(wx.VERTICAL)
+
+        button_box = wx.BoxSizer(wx.HORIZONTAL)
+        restore_button = wx.Button(self, label="Switch to Session")
+        restore_button.Bind(wx.EVT_BUTTON, self.OnRestoreSession)
+        button_box.Add(restore_button, border=5, flag=wx.ALL)
+        main_box.Add(button_box)
+
+        session_list = ObjectListView.ObjectListView(
+            self, wx.ID_ANY, style=wx.LC_REPORT | wx.LC_SINGLE_SEL,
+            size=wx.Size(740, 200))
+        session_list.SetColumns([
+            ObjectListView.ColumnDefn("Start", "left", 150, "start",
+                                      fixedWidth=150),
+            ObjectListView.ColumnDefn("End", "left", 150, "end",
+                                      fixedWidth=150),
+            ObjectListView.ColumnDefn("Ticks", "left", 70, "raidticks",
+                                      fixedWidth=70),
+            ObjectListView.ColumnDefn("Auctions", "left", 70, "auctions",
+                                      fixedWidth=70),
+            ObjectListView.ColumnDefn("Kills", "left", 70, "kills",
+                                      fixedWidth=70),
+            ObjectListView.ColumnDefn("Archived", "left", 150, "archived",
+                                      fixedWidth=150),
+        ])
+        session_list.SetEmptyListMsg("No archived sessions.")
+        session_list.Bind(wx.EVT_LIST_ITEM_SELECTED, self.OnSelectSession)
+        main_box.Add(session_list, flag=wx.EXPAND | wx.ALL)
+        self.session_list = session_list
+
+        notebook = wx.Notebook(self)
+        auction_list = ObjectListView.ObjectListView(
+            notebook, wx.ID_ANY, style=wx.LC_REPORT)
+        auction_list.SetColumns([
+            ObjectListView.ColumnDefn("Item", "left", 250, "name",
+                                      fixedWidth=250),
+            ObjectListView.ColumnDefn("Winner", "left", 150,
+                                      "highest_players", fixedWidth=150),
+            ObjectListView.ColumnDefn("Price", "left", 80,
+                                      "highest_number", fixedWidth=80),
+            ObjectListView.ColumnDefn("Time", "left", 150,
+                                      "start_time", fixedWidth=150),
+        ])
+        auction_list.SetEmptyListMsg("Select a session.")
+        notebook.AddPage(auction_list, "Auctions")
+        self.auction_list = auction_list
+
+        attendance_list = ObjectListView.ObjectListView(
+            notebook, wx.ID_ANY, style=wx.LC_REPORT)
+        attendance_list.SetColumns([
+            ObjectListView.ColumnDefn("Time", "left", 140, "time",
+                                      fixedWidth=140),
+            ObjectListView.ColumnDefn("Name", "left", 140, "tick_name",
+                                      fixedWidth=140),
+            ObjectListView.ColumnDefn("RT", "left", 25, "raidtick_display",
+                                      fixedWidth=25),
+            ObjectListView.ColumnDefn("Populations", "left", 357,
+                                      "populations", fixedWidth=357),
+        ])
+        attendance_list.SetEmptyListMsg("Select a session.")
+        notebook.AddPage(attendance_list, "Attendance")
+        self.attendance_list = attendance_list
+        main_box.Add(notebook, proportion=1, flag=wx.EXPAND)
+
+        self.SetSizer(main_box)
+        self.RefreshSessions()
+        if config.ALWAYS_ON_TOP:
+            self.SetWindowStyle(
+                self.GetWindowStyle() | wx.STAY_ON_TOP)
+        self.Show()
+
+    def RefreshSessions(self):
+        # Newest first
+        self.session_list.SetObjects(
+            list(reversed(utils.get_session_archive().sessions())))
+        self.auction_list.SetObjects([])
+        self.attendance_list.SetObjects([])
+
+    def OnSelectSession(self, e: wx.Event):
+        entry = self.session_list.GetSelectedObject()
+        if not entry:
+            return
+        try:
+            session = utils.load_session(entry['id'])
+        except (OSError, ValueError):
+            LOG.exception("Failed to load archived session %s.", entry['id'])
+            return
+        self.auction_list.SetObjects(
+            list(session['HISTORICAL_AUCTIONS'].values()))
+        self.attendance_list.SetObjects(session['ATTENDANCE_LOGS'])
+
+    def OnRestoreSession(self, e: wx.Event):
+        entry = self.session_list.GetSelectedObject()
+        if not entry:
+            return
+        dlg = wx.MessageDialog(
+            self,
+            "Switch to the session from {}? The current session will be "
+            "archived.".format(entry['start']),
+            "Confirm Switch", wx.OK | wx.CANCEL | wx.ICON_QUESTION)
+        result = dlg.ShowModal()
+        dlg.Destroy()
+        if result != wx.ID_OK:
+            return
+        try:
+            utils.restore_session(entry['id'])
+        except (OSError, RuntimeError, ValueError):
+            LOG.exception("Failed to switch to session %s.", entry['id'])
+            dlg = wx.MessageDialog(
+                self,
+                "Failed to switch sessions. The current session was kept.",
+                "Failed to Switch", wx.OK | wx.ICON_ERROR)
+            dlg.ShowModal()
+            dlg.Destroy()
+            return
+        wx.PostEvent(self.main_window, models.AppReloadEvent())
+        self.RefreshSessions()
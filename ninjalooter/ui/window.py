@@ -13,6 +13,7 @@ from ninjalooter import autoupdate
 from ninjalooter import config
 from ninjalooter import logger
 from ninjalooter import logparse
+from ninjalooter import models
 from ninjalooter import overrides
 from ninjalooter.ui import attendance_frame
 from ninjalooter.ui import bidding_frame
@@ -80,6 +81,7 @@ class MainWindow(wx.Frame):
                       wx.BITMAP_TYPE_ANY))
         self.SetIcon(icon)
         self.Bind(wx.EVT_CLOSE, self.OnClose)
+        self.Connect(-1, -1, models.EVT_SCHEDULED_TASK, self.OnScheduledTask)
 
         # Set up menubar
         menu_bar.MenuBar(self)
@@ -119,6 +121,8 @@ class MainWindow(wx.Frame):
         self.Show(True)
         if config.ALWAYS_ON_TOP:
             self.SetWindowStyle(self.GetWindowStyle() | wx.STAY_ON_TOP)
+        utils.start_state_writer()
+        utils.start_scheduler(self.PostScheduledTask)
         self.parser_thread = logparse.ParseThread(self)
         self.parser_thread.start()
 
@@ -143,6 +147,14 @@ class MainWindow(wx.Frame):
             config.CONF.set("default", "last_run_version", config.VERSION)
             config.write()
 
+    def PostScheduledTask(self, func, args):
+        # Alerts are called on the UI thread, like everything else
+        wx.PostEvent(self, models.ScheduledTaskEvent(func, args))
+
+    def OnScheduledTask(self, e: models.ScheduledTaskEvent):
+        with utils.STATE_LOCK:
+            e.func(*e.args)
+
     def OnFilesystemEvent(self, e: wx.FileSystemWatcherEvent):
         if not config.AUTO_SWAP_LOGFILE:
             return
@@ -175,9 +187,14 @@ class MainWindow(wx.Frame):
         if result == wx.ID_OK:
             config.TAB_SELECTION = self._notebook.GetSelection()
             utils.clear_alerts()
+            if config.RAID_GROUP_SOLVER:
+                config.RAID_GROUP_SOLVER.cancel()
+            utils.cancel_export()
             config.WX_TASKBAR_ICON.Destroy()
             self.parser_thread.abort()
             utils.store_state()
+            utils.stop_state_writer()
+            utils.stop_scheduler()
             self.Destroy()
 
 
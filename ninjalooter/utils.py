@@ -5,9 +5,12 @@ import csv
 import datetime
 import distutils.util
 import inspect
+import itertools
 import json
 import os
 import re
+import sqlite3
+import threading
 import webbrowser
 
 from ahocorapy import keywordtree
@@ -20,15 +23,45 @@ import xlsxwriter
 import xlsxwriter.exceptions
 
 from ninjalooter import config
+from ninjalooter import detail
+from ninjalooter import fuzzymatch
+from ninjalooter import journal
 from ninjalooter import logger
 from ninjalooter import models
+from ninjalooter import scheduler
+from ninjalooter import sessions
+from ninjalooter import sqlstore
+from ninjalooter import statewriter
 
 # This is the app logger, not related to EQ logs
 LOG = logger.getLogger(__name__)
 
 RE_EQ_LOGFILE = re.compile(r'.*_(.*)_.*\.txt')
 RE_TIMESTAMP = re.compile(config.TIMESTAMP)
+RE_DETAIL_FILE = re.compile(r'\.(?P<generation>\d+)\.records$')
 LOG.info("Project working directory: %s", config.PROJECT_DIR)
+# Held by the parse thread while handling a line, and while a snapshot of the
+# state is serialized, so a checkpoint never sees a half-handled line
+STATE_LOCK = threading.RLock()
+CHECKPOINT_LOCK = threading.Lock()
+# Version 2 packs attendance logs and drops the pre-1.14 keys, version 3
+# may keep history detail in a separate records file, version 4 stores the
+# bid ledger of packed DKP auctions as the record, next to their bids
+STATE_VERSION = 4
+# Version 2 ticks may refer to their players in the records file
+ATTENDANCE_FORMAT_VERSION = 2
+# The order of player fields in the packed attendance player table
+ATTENDANCE_FIELDS = ('name', 'pclass', 'level', 'guild')
+COMPACTION_THREAD = None
+EXPORT_THREAD = None
+EXPORT_CANCEL = threading.Event()
+# The state that belongs to one raid session, which is archived on clear
+SESSION_KEYS = ('ATTENDANCE_LOGS', 'HISTORICAL_AUCTIONS', 'KILL_TIMERS',
+                'CREDITT_LOG', 'GRATSS_LOG')
+# Also cleared by "Clear Data", so kept with an archived session, though
+# switching back to it doesn't bring them back
+SESSION_BACKUP_KEYS = ('PENDING_AUCTIONS', 'ACTIVE_AUCTIONS',
+                       'IGNORED_AUCTIONS')
 
 
 def ignore_pending_item(item: models.ItemDrop) -> None:
@@ -63,12 +96,21 @@ def start_auction_random(item: models.ItemDrop) -> models.RandomAuction:
     return auc
 
 
-def complete_old_auctions(cutoff_time: datetime.datetime):
+def complete_old_auctions(cutoff_time: datetime.datetime) -> list:
+    """Complete active auctions started before the cutoff
+
+    :return: the journal mutations for the auctions that were completed
+    """
+    mutations = []
     for auc in list(config.ACTIVE_AUCTIONS.values()):
         if auc.start_time < cutoff_time:
             LOG.debug("Completing old auction")
             config.ACTIVE_AUCTIONS.pop(auc.item.uuid)
             config.HISTORICAL_AUCTIONS[auc.item.uuid] = auc
+            mutations.extend([
+                journal.Delete('ACTIVE_AUCTIONS', index=auc.item.uuid),
+                journal.Put('HISTORICAL_AUCTIONS', auc.item.uuid, auc)])
+    return mutations
 
 
 def get_pop_numbers(source=None, extras=None) -> dict:
@@ -191,6 +233,14 @@ def setup_aho():
     for spell in config.SPELLS:
         config.TRIE.add("SONG: %s" % spell)
     config.TRIE.finalize()
+    config.FUZZY_INDEX = None
+    if config.FUZZY_ITEM_MATCH:
+        setup_fuzzy_index()
+
+
+def setup_fuzzy_index():
+    config.FUZZY_INDEX = fuzzymatch.TrigramIndex(
+        config.ITEMS, max_distance=config.FUZZY_MAX_DISTANCE)
 
 
 def open_wiki_url(item: models.ItemDrop) -> None:
@@ -226,8 +276,28 @@ def clear_alerts():
     if config.RAIDTICK_ALERT_TIMER:
         config.RAIDTICK_ALERT_TIMER.cancel()
         config.RAIDTICK_REMINDER_COUNT = 0
-    for timer in config.AUCTION_ALERT_TIMERS:
-        timer.cancel()
+    get_scheduler().clear()
+
+
+def get_scheduler() -> scheduler.Scheduler:
+    """The scheduler for alerts, which runs nothing until it's started."""
+    if config.SCHEDULER is None:
+        config.SCHEDULER = scheduler.Scheduler()
+    return config.SCHEDULER
+
+
+def start_scheduler(dispatch=None) -> None:
+    sched = get_scheduler()
+    if dispatch:
+        sched.dispatch = dispatch
+    if not sched.is_alive():
+        sched.start()
+
+
+def stop_scheduler() -> None:
+    if config.SCHEDULER:
+        config.SCHEDULER.stop()
+        config.SCHEDULER = None
 
 
 # Thanks rici from StackOverflow for saving me time!
@@ -271,6 +341,13 @@ def get_items_from_text(text: str) -> list:
     return item_names
 
 
+def get_fuzzy_items_from_text(text: str) -> list:
+    """Return items that appear misspelled in the text, by canonical name."""
+    if config.FUZZY_INDEX is None:
+        setup_fuzzy_index()
+    return config.FUZZY_INDEX.search(text)
+
+
 def get_pending_item_names() -> list:
     """Return all pending item drops as a list of lowercase item names."""
     pending_items = []
@@ -380,27 +457,37 @@ def get_first_timestamp(iterable_obj) -> datetime.datetime:
     return datetime.datetime.fromtimestamp(0)
 
 
-def load_state(state_file=config.SAVE_STATE_FILE):
+def load_state(state_file=config.SAVE_STATE_FILE) -> bool:
+    """Load a saved state into config, and replay the journal after it.
+
+    :return: whether the state file was loaded
+    """
+    journal_seq = 0
+    loaded = False
     try:
+        # Detail references are decoded before the records file is named
+        records = new_detail_records()
         with open(state_file, 'r') as ssfp:
-            json_state = json.load(ssfp, cls=JSONDecoder)
+            json_state = json.load(ssfp, cls=JSONDecoder, records=records)
+        journal_seq = json_state.pop('JOURNAL_SEQ', 0)
+        detail_file = json_state.pop('DETAIL_FILE', None)
+        if detail_file:
+            records.set_filename(os.path.join(
+                os.path.dirname(state_file), detail_file))
+            if config.DETAIL_RECORDS is not None:
+                config.DETAIL_RECORDS.close()
+            config.DETAIL_RECORDS = records
+        version = json_state.pop('STATE_VERSION', 1)
+        if version < STATE_VERSION:
+            LOG.info("Migrating state from version %d to %d.",
+                     version, STATE_VERSION)
+            json_state = migrate_state(json_state)
+        elif 'ATTENDANCE_LOGS' in json_state:
+            json_state['ATTENDANCE_LOGS'] = unpack_attendance(
+                json_state['ATTENDANCE_LOGS'])
         for key, value in json_state.items():
-            # Handle conversion of history data prior to v1.14
-            if key == 'PLAYER_AFFILIATIONS':
-                key = 'LAST_WHO_SNAPSHOT'
-                value = {name: models.Player(name, guild=guild)
-                         for name, guild in value.items()}
-            elif key == 'HISTORICAL_AFFILIATIONS':
-                key = 'PLAYER_DB'
-                value = {name: models.Player(name, guild=guild)
-                         for name, guild in value.items()}
-            elif key == 'WHO_LOG':
-                key = 'ATTENDANCE_LOGS'
-                for entry in value:
-                    entry.log = {name: models.Player(name, guild=guild)
-                                 for name, guild in entry.log.items()}
-
             setattr(config, key, value)
+        loaded = True
         LOG.info("Loaded state.")
     except FileNotFoundError:
         LOG.info("Failed to load state, no state file found.")
@@ -408,24 +495,115 @@ def load_state(state_file=config.SAVE_STATE_FILE):
         LOG.exception("Failed to load state, couldn't parse JSON.")
     except Exception:
         LOG.exception("Failed to load state, unknown exception.")
+    if state_file == config.SAVE_STATE_FILE and config.JOURNAL_ENABLED:
+        replay_journal(journal_seq)
+    return loaded
+
+
+def migrate_state(json_state: dict) -> dict:
+    """Convert a state saved before STATE_VERSION 2 to the current layout."""
+    migrated = {}
+    for key, value in json_state.items():
+        # Handle conversion of history data prior to v1.14
+        if key == 'PLAYER_AFFILIATIONS':
+            key = 'LAST_WHO_SNAPSHOT'
+            value = {name: models.Player(name, guild=guild)
+                     for name, guild in value.items()}
+        elif key == 'HISTORICAL_AFFILIATIONS':
+            key = 'PLAYER_DB'
+            value = {name: models.Player(name, guild=guild)
+                     for name, guild in value.items()}
+        elif key == 'WHO_LOG':
+            key = 'ATTENDANCE_LOGS'
+            for entry in value:
+                entry.log = {name: models.Player(name, guild=guild)
+                             for name, guild in entry.log.items()}
+        elif key == 'ATTENDANCE_LOGS' and isinstance(value, dict):
+            value = unpack_attendance(value)
+        migrated[key] = value
+    return migrated
+
+
+def get_journal() -> journal.StateJournal:
+    if config.JOURNAL is None:
+        config.JOURNAL = journal.StateJournal(
+            config.SAVE_JOURNAL_FILE, JSONEncoder, JSONDecoder,
+            sync_records=config.JOURNAL_SYNC_RECORDS,
+            sync_seconds=config.JOURNAL_SYNC_SECONDS)
+    return config.JOURNAL
+
+
+def replay_journal(after_seq: int = 0) -> None:
+    try:
+        count = get_journal().replay(config, after_seq)
+    except Exception:
+        LOG.exception("Failed to replay state journal.")
+        return
+    if count:
+        LOG.info("Replayed %d journal records newer than the saved state.",
+                 count)
+        # Fold the replayed records into a fresh snapshot right away
+        store_state()
 
 
-def store_state(backup=False):
-    statefile_name = config.SAVE_STATE_FILE
-    if backup and config.BACKUP_ON_CLEAR:
-        now = datetime.datetime.now()
-        timestr = now.isoformat().replace(':', '-').split('.')[0]
-        statefile_name = "state_{}.json".format(timestr)
+def new_detail_records(filename: str = None) -> detail.RecordFile:
+    return detail.RecordFile(JSONEncoder, JSONDecoder,
+                             cache_size=config.DETAIL_CACHE_SIZE,
+                             filename=filename)
 
-    json_state = {
+
+def start_detail_checkpoint() -> detail.RecordWriter:
+    """Pick the records file for the next checkpoint's history detail.
+
+    The current file is appended to, unless it belongs to a state loaded
+    from elsewhere or is mostly unused, in which case the live records are
+    copied to the next generation of the file.
+    """
+    records = config.DETAIL_RECORDS
+    state_dir = os.path.dirname(os.path.abspath(config.SAVE_STATE_FILE))
+    if (records is None or records.should_compact() or
+            os.path.dirname(os.path.abspath(records.filename)) != state_dir):
+        generation = 1
+        if records is not None:
+            match = RE_DETAIL_FILE.search(records.filename)
+            if match:
+                generation = int(match.group('generation')) + 1
+        records = new_detail_records("{}.{}.records".format(
+            os.path.splitext(config.SAVE_STATE_FILE)[0], generation))
+    return detail.RecordWriter(records)
+
+
+def finish_detail_checkpoint(writer: detail.RecordWriter) -> None:
+    writer.commit()
+    old_records = config.DETAIL_RECORDS
+    config.DETAIL_RECORDS = writer.records
+    if old_records is None or old_records is writer.records:
+        return
+    old_records.close()
+    state_dir = os.path.dirname(os.path.abspath(config.SAVE_STATE_FILE))
+    # Never remove the records of a state that was loaded from elsewhere
+    if os.path.dirname(os.path.abspath(old_records.filename)) == state_dir:
+        try:
+            os.remove(old_records.filename)
+        except OSError:
+            LOG.warning("Couldn't remove old records file %s.",
+                        old_records.filename)
+
+
+def get_state_dict(writer: detail.RecordWriter = None) -> dict:
+    historical_auctions = config.HISTORICAL_AUCTIONS
+    if writer is not None:
+        historical_auctions = pack_auctions(historical_auctions, writer)
+    return {
+        "STATE_VERSION": STATE_VERSION,
         "PENDING_AUCTIONS": config.PENDING_AUCTIONS,
         "IGNORED_AUCTIONS": config.IGNORED_AUCTIONS,
         "ACTIVE_AUCTIONS": config.ACTIVE_AUCTIONS,
-        "HISTORICAL_AUCTIONS": config.HISTORICAL_AUCTIONS,
+        "HISTORICAL_AUCTIONS": historical_auctions,
         "LAST_WHO_SNAPSHOT": config.LAST_WHO_SNAPSHOT,
         "WX_LAST_WHO_SNAPSHOT": config.WX_LAST_WHO_SNAPSHOT,
         "PLAYER_DB": config.PLAYER_DB,
-        "ATTENDANCE_LOGS": config.ATTENDANCE_LOGS,
+        "ATTENDANCE_LOGS": pack_attendance(config.ATTENDANCE_LOGS, writer),
         "KILL_TIMERS": config.KILL_TIMERS,
         "CREDITT_LOG": config.CREDITT_LOG,
         "GRATSS_LOG": config.GRATSS_LOG,
@@ -437,8 +615,227 @@ def store_state(backup=False):
             config.RAID_OVERVIEW_GUILDS_ENABLED_CACHE,
         "TAB_SELECTION": config.TAB_SELECTION,
     }
-    with open(statefile_name, 'w') as ssfp:
-        json.dump(json_state, ssfp, cls=JSONEncoder)
+
+
+def serialize_state(extra: dict = None, attempts: int = 3,
+                    writer: detail.RecordWriter = None) -> str:
+    # The GUI thread doesn't take STATE_LOCK for its own edits, so a list or
+    # dict can occasionally change size while it is being walked
+    for attempt in range(1, attempts + 1):
+        try:
+            json_state = get_state_dict(writer)
+            json_state.update(extra or {})
+            return json.dumps(json_state, cls=JSONEncoder)
+        except RuntimeError:
+            if attempt == attempts:
+                raise
+            LOG.warning("State changed while serializing, retrying.")
+    return None
+
+
+def write_file_atomic(filename: str, data: str) -> None:
+    temp_name = filename + '.tmp'
+    with open(temp_name, 'w') as tfp:
+        tfp.write(data)
+        tfp.flush()
+        os.fsync(tfp.fileno())
+    os.replace(temp_name, filename)
+
+
+def store_state(backup=False, mutations=None):
+    """Persist the current state.
+
+    With `mutations`, only those records are appended to the state journal.
+    Otherwise a full snapshot is written, which also compacts the journal.
+    While the state writer is running, snapshots are left to it so that
+    bursts of changes are saved once, off the calling thread. With `backup`,
+    the current raid session is archived instead, ahead of being cleared,
+    and any failure to archive it is raised (see archive_session).
+    """
+    if mutations and config.SQLITE_ENABLED:
+        record_history(mutations)
+    if mutations is not None and config.JOURNAL_ENABLED:
+        if mutations:
+            state_journal = get_journal()
+            with STATE_LOCK:
+                state_journal.append(mutations)
+            if state_journal.records >= config.JOURNAL_COMPACT_RECORDS:
+                compact_state_async()
+        return
+
+    if backup and config.BACKUP_ON_CLEAR:
+        archive_session()
+        return
+
+    if config.STATE_WRITER and config.STATE_WRITER.is_alive():
+        config.STATE_WRITER.mark_dirty()
+    else:
+        checkpoint_state()
+
+
+def checkpoint_state() -> int:
+    """Write a full snapshot of the state, and return its size in bytes."""
+    with CHECKPOINT_LOCK:
+        with STATE_LOCK:
+            extra = {}
+            if config.JOURNAL_ENABLED:
+                extra["JOURNAL_SEQ"] = get_journal().rotate()
+            writer = None
+            if config.LAZY_HISTORY:
+                writer = start_detail_checkpoint()
+                extra["DETAIL_FILE"] = os.path.basename(
+                    writer.records.filename)
+            data = serialize_state(extra, writer=writer)
+        if writer is not None:
+            # The records must be on disk before anything refers to them
+            writer.records.sync()
+        write_file_atomic(config.SAVE_STATE_FILE, data)
+        if writer is not None:
+            with STATE_LOCK:
+                finish_detail_checkpoint(writer)
+        if config.JOURNAL_ENABLED:
+            # Only now is everything in the rotated journal in the snapshot
+            get_journal().discard_rotated()
+    # JSONEncoder escapes non-ASCII, so characters and bytes are the same
+    return len(data)
+
+
+def compact_state_async() -> None:
+    global COMPACTION_THREAD  # pylint: disable=global-statement
+    if config.STATE_WRITER and config.STATE_WRITER.is_alive():
+        config.STATE_WRITER.mark_dirty()
+        return
+    if COMPACTION_THREAD and COMPACTION_THREAD.is_alive():
+        return
+    LOG.info("Compacting state journal in the background.")
+    COMPACTION_THREAD = threading.Thread(
+        target=checkpoint_state, name="StateCompaction", daemon=True)
+    COMPACTION_THREAD.start()
+
+
+def get_sql_store() -> sqlstore.SQLStore:
+    if config.SQL_STORE is None:
+        config.SQL_STORE = sqlstore.SQLStore(config.SQLITE_FILE, JSONEncoder)
+    return config.SQL_STORE
+
+
+def record_history(mutations: list) -> None:
+    try:
+        get_sql_store().apply(mutations)
+    except sqlite3.Error:
+        LOG.exception("Failed to record history in %s.", config.SQLITE_FILE)
+
+
+def record_tick(who_log) -> None:
+    """Write a tick to the history again, after it was edited in place"""
+    if not config.SQLITE_ENABLED:
+        return
+    try:
+        get_sql_store().put_tick(who_log)
+    except sqlite3.Error:
+        LOG.exception("Failed to record history in %s.", config.SQLITE_FILE)
+
+
+def forget_chat(key: str, entry) -> None:
+    """Remove an ignored creditt or gratss message from the history"""
+    if not config.SQLITE_ENABLED:
+        return
+    try:
+        get_sql_store().delete_chat(key, entry)
+    except sqlite3.Error:
+        LOG.exception("Failed to record history in %s.", config.SQLITE_FILE)
+
+
+def archive_history() -> None:
+    if not config.SQLITE_ENABLED:
+        return
+    try:
+        get_sql_store().import_state(config)
+    except sqlite3.Error:
+        LOG.exception("Failed to archive history in %s.",
+                      config.SQLITE_FILE)
+
+
+def get_session_archive() -> sessions.SessionArchive:
+    if config.SESSION_ARCHIVE is None:
+        config.SESSION_ARCHIVE = sessions.SessionArchive(
+            config.SESSIONS_DIR, JSONEncoder, JSONDecoder)
+    return config.SESSION_ARCHIVE
+
+
+def summarize_session() -> dict:
+    times = [who_log.time for who_log in config.ATTENDANCE_LOGS]
+    times.extend(auction.start_time
+                 for auction in config.HISTORICAL_AUCTIONS.values())
+    return {
+        'start': min(times).isoformat() if times else None,
+        'end': max(times).isoformat() if times else None,
+        'raidticks': sum(1 for who_log in config.ATTENDANCE_LOGS
+                         if who_log.raidtick),
+        'attendance': len(config.ATTENDANCE_LOGS),
+        'auctions': len(config.HISTORICAL_AUCTIONS),
+        'kills': len(config.KILL_TIMERS),
+        'chat': len(config.CREDITT_LOG) + len(config.GRATSS_LOG),
+    }
+
+
+def archive_session() -> dict:
+    """Archive the current raid session, returning its index entry.
+
+    Nothing is archived for an empty session.
+
+    :raises OSError: if it couldn't be written, or RuntimeError if it changed
+        while it was being written. Either way, the session must not be
+        cleared or replaced.
+    """
+    with STATE_LOCK:
+        keys = SESSION_KEYS + SESSION_BACKUP_KEYS
+        if not any(getattr(config, key) for key in keys):
+            return None
+        segment = {key: getattr(config, key) for key in keys}
+        segment['STATE_VERSION'] = STATE_VERSION
+        segment['ATTENDANCE_LOGS'] = pack_attendance(config.ATTENDANCE_LOGS)
+        return get_session_archive().archive(segment, summarize_session())
+
+
+def unpack_session(segment: dict) -> dict:
+    segment['ATTENDANCE_LOGS'] = unpack_attendance(
+        segment['ATTENDANCE_LOGS'])
+    return segment
+
+
+def load_session(session_id: str) -> dict:
+    """Read an archived session, keyed like the state in `config`."""
+    return get_session_archive().load(session_id, prepare=unpack_session)
+
+
+def restore_session(session_id: str) -> None:
+    """Make an archived session current, archiving the current one.
+
+    :raises OSError: if either session couldn't be read or written, in
+        which case the current session is left as it was
+    """
+    segment = load_session(session_id)
+    with STATE_LOCK:
+        archive_session()
+        for key in SESSION_KEYS:
+            setattr(config, key, segment[key])
+        get_session_archive().remove(session_id)
+    checkpoint_state()
+
+
+def start_state_writer() -> None:
+    if config.STATE_WRITER and config.STATE_WRITER.is_alive():
+        return
+    config.STATE_WRITER = statewriter.StateWriter(
+        checkpoint_state, delay=config.STATE_SAVE_DELAY)
+    config.STATE_WRITER.start()
+
+
+def stop_state_writer() -> None:
+    if config.STATE_WRITER:
+        config.STATE_WRITER.stop()
+        config.STATE_WRITER = None
 
 
 def eastern_time_offset():
@@ -449,124 +846,353 @@ def eastern_time_offset():
     return datetime.timedelta(seconds=seconds)
 
 
-def export_to_excel(filename):
-    LOG.info("Exporting to Excel file: %s", filename)
+def _export_messages(log, pattern):
+    """The raw creditt or gratss messages, with times as exported"""
+    for message in log:
+        adjusted_message = message.raw_message
+        if config.EXPORT_TIME_IN_EASTERN:
+            m = pattern.match(adjusted_message)
+            time_part = m.groupdict()['time']
+            new_time = datetime_to_eq_format(
+                datetime_from_eq_format(time_part, allow_eastern=False))
+            adjusted_message = adjusted_message.replace(time_part, new_time)
+        yield adjusted_message
 
-    # Completed Auctions
-    excel_data = {
-        'Completed Auctions': [],
-        'Kill Times': [],
-        'Creditt & Gratss': [],
-    }
 
-    # Prepare Completed Auctions
-    for auc in config.HISTORICAL_AUCTIONS.values():
+def _completed_auction_rows(auctions):
+    for auc in auctions:
         dkp_auc = isinstance(auc, models.DKPAuction)
-        auc_data = {
+        yield {
             'time': datetime_from_eq_format(auc.item.timestamp),
             'item': auc.name(),
             'winner': auc.highest_players(),
             'type': 'DKP' if dkp_auc else 'Random',
             'bid': auc.highest_number() if dkp_auc else 'N/A',
         }
-        excel_data['Completed Auctions'].append(auc_data)
 
-    # Prepare Kill Times
-    for killtime in config.KILL_TIMERS:
-        killtime_data = {
+
+def _kill_time_rows(kill_timers):
+    for killtime in kill_timers:
+        yield {
             'time': datetime_from_eq_format(killtime.time),
             'mob': killtime.name,
             'island': killtime.island(),
         }
-        excel_data['Kill Times'].append(killtime_data)
 
-    # Get all raw creditt/gratss messages
-    for creditt in config.CREDITT_LOG:
-        adjusted_message = creditt.raw_message
-        if config.EXPORT_TIME_IN_EASTERN:
-            m = config.MATCH_CREDITT.match(adjusted_message)
-            time_part = m.groupdict()['time']
-            new_time = datetime_to_eq_format(
-                datetime_from_eq_format(time_part, allow_eastern=False))
-            adjusted_message = adjusted_message.replace(time_part, new_time)
-        creditt_data = {'creditt/gratss': adjusted_message}
-        excel_data['Creditt & Gratss'].append(creditt_data)
-    # Get all raw creditt/gratss messages
-    for gratss in config.GRATSS_LOG:
-        adjusted_message = gratss.raw_message
-        if config.EXPORT_TIME_IN_EASTERN:
-            m = config.MATCH_GRATSS.match(adjusted_message)
-            time_part = m.groupdict()['time']
-            new_time = datetime_to_eq_format(
-                datetime_from_eq_format(time_part, allow_eastern=False))
-            adjusted_message = adjusted_message.replace(time_part, new_time)
-        gratss_data = {'creditt/gratss': adjusted_message}
-        excel_data['Creditt & Gratss'].append(gratss_data)
 
-    # Set up the workbook
-    workbook = xlsxwriter.Workbook(
-        filename, {'default_date_format': 'm/d/yyyy h:mm:ss AM/PM'})
-    bold = workbook.add_format({'bold': True})
-
-    # Write "Basic Data" into the workbook
-    for page, data in excel_data.items():
-        if data:
-            worksheet = workbook.add_worksheet(page)
-            worksheet.write_row(0, 0, data[0].keys(), bold)
-            worksheet.set_column(0, 0, 22)
-            worksheet.set_column(1, 1, 30)
-            worksheet.set_column(2, 2, 16)
-            row_num = 1
-            for row in data:
-                worksheet.write_row(row_num, 0, row.values())
-                row_num += 1
-            worksheet.autofilter(0, 0, len(data[0]), len(data[0].keys()) - 1)
-
-    # Write Attendance Logs
-    for entry in config.ATTENDANCE_LOGS:
-        if entry.log:
-            if config.EXPORT_TIME_IN_EASTERN:
-                time_str = (
-                        entry.time + eastern_time_offset()
-                ).strftime('%Y.%m.%d %I.%M.%S %p')
-            else:
-                time_str = entry.time.strftime('%Y.%m.%d %I.%M.%S %p')
-            worksheet_name = time_str
-            worksheet_name_append = 0
-            attendance_sheet = None
-            while attendance_sheet is None:
-                try:
-                    if worksheet_name_append > 0:
-                        worksheet_name = "{0} ({1})".format(
-                            time_str, worksheet_name_append)
-                    attendance_sheet = workbook.add_worksheet(worksheet_name)
-                except xlsxwriter.exceptions.DuplicateWorksheetName:
-                    worksheet_name_append += 1
-                except Exception:
-                    return False
+def _write_table(workbook, page, rows, bold, cancel):
+    """Write dicts to a new sheet as rows, under a header of their keys
 
-            attendance_sheet.write_row(
-                0, 0, ('name', 'level', 'class', 'guild'), bold)
-            attendance_sheet.set_column(0, 0, 18)
-            attendance_sheet.set_column(1, 1, 8)
-            attendance_sheet.set_column(2, 3, 18)
-            row_num = 1
-            for name, player_obj in entry.log.items():
-                attendance_sheet.write_row(
-                    row_num, 0,
-                    (name,
-                     player_obj.level if player_obj.level != 0 else "",
-                     player_obj.pclass,
-                     player_obj.guild))
-                row_num += 1
-            attendance_sheet.autofilter(0, 0, row_num - 1, 3)
+    Nothing is written, not even the sheet, if there are no rows.
+    """
+    first_row = next(rows, None)
+    if first_row is None:
+        return
+    worksheet = workbook.add_worksheet(page)
+    worksheet.write_row(0, 0, first_row.keys(), bold)
+    worksheet.set_column(0, 0, 22)
+    worksheet.set_column(1, 1, 30)
+    worksheet.set_column(2, 2, 16)
+    row_num = 0
+    for row_num, row in enumerate(itertools.chain([first_row], rows), 1):
+        if cancel.is_set():
+            return
+        worksheet.write_row(row_num, 0, row.values())
+    worksheet.autofilter(0, 0, row_num, len(first_row) - 1)
+
+
+def _new_workbook(filename, constant_memory=False):
+    """A workbook to export to
+
+    In constant memory mode each sheet only holds its current row, so rows
+    have to be written to a sheet in order. Each sheet also holds a
+    temporary file open until the workbook is closed, so this is only for
+    workbooks with a few sheets, not one per /who log or raidtick.
+    """
+    return xlsxwriter.Workbook(
+        filename, {'default_date_format': 'm/d/yyyy h:mm:ss AM/PM',
+                   'constant_memory': constant_memory})
 
-    # Save the workbook
+
+def _discard_workbook(workbook):
+    """Let go of a workbook without saving it
+
+    Nothing is written to the file until the workbook is closed, but in
+    constant memory mode the temporary file of each sheet has to be closed
+    and removed.
+    """
+    workbook.fileclosed = True
+    if not workbook.constant_memory:
+        return
+    for worksheet in workbook.worksheets():
+        worksheet._opt_close()  # pylint: disable=protected-access
+        try:
+            os.remove(worksheet.row_data_filename)
+        except OSError:
+            pass
+
+
+def _close_workbook(workbook, filename, cancel):
+    """Save the workbook, or remove it if the export was cancelled"""
     try:
         workbook.close()
-        return True
-    except xlsxwriter.exceptions.FileCreateError:
+    except xlsxwriter.exceptions.XlsxFileError:
+        LOG.exception("Failed to export to %s.", filename)
+        _discard_workbook(workbook)
+        return False
+    if cancel.is_set():
+        LOG.info("Export to %s was cancelled.", filename)
+        try:
+            os.remove(filename)
+        except OSError:
+            LOG.exception("Failed to remove cancelled export: %s", filename)
+        return None
+    return True
+
+
+ATTENDANCE_TABLE_HEADER = ('time', 'zone', 'raidtick', 'name', 'level',
+                           'class', 'guild', 'alliance')
+ATTENDANCE_SUMMARY_HEADER = ('name', 'level', 'class', 'guild', 'alliance',
+                             'raidticks', 'raidtick %', '/who logs',
+                             'first seen', 'last seen')
+
+
+def _attendance_rows(entry, tick_time, summary):
+    """Rows of the attendance table for each player in a /who
+
+    Also counts up each player's attendance in `summary`, by name, as a
+    list of their latest level, class and guild, how many raidticks and
+    /who logs they were in, and when they were first and last seen.
+    """
+    for name, player_obj in list(entry.log.items()):
+        level = player_obj.level if player_obj.level != 0 else ""
+        yield (tick_time, entry.zone or "", bool(entry.raidtick), name,
+               level, player_obj.pclass, player_obj.guild,
+               config.ALLIANCE_MAP.get(player_obj.guild, ""))
+        stats = summary.get(name)
+        if stats is None:
+            stats = summary[name] = ["", "", "", 0, 0, tick_time, tick_time]
+        # keep what's known from the latest /who
+        latest = tick_time >= stats[6]
+        for ndx, value in enumerate(
+                (level, player_obj.pclass, player_obj.guild)):
+            if value and (latest or not stats[ndx]):
+                stats[ndx] = value
+        stats[3] += bool(entry.raidtick)
+        stats[4] += 1
+        stats[5] = min(stats[5], tick_time)
+        stats[6] = max(stats[6], tick_time)
+
+
+def _attendance_summary_rows(summary, raidticks):
+    """Rows of the attendance summary, most raidticks first"""
+    for name, (level, pclass, guild, ticks, whos, first, last) in sorted(
+            summary.items(), key=lambda item: (-item[1][3], item[0])):
+        yield (name, level, pclass, guild, config.ALLIANCE_MAP.get(guild, ""),
+               ticks, ticks / raidticks if raidticks else 0, whos, first,
+               last)
+
+
+def _write_attendance_table(workbook, attendance_logs, bold, cancel, step):
+    """Write all attendance to one sheet, and a summary per player
+
+    Both are filled in the same pass over the /who logs.
+    """
+    table_sheet = workbook.add_worksheet('Attendance')
+    summary_sheet = workbook.add_worksheet('Attendance Summary')
+    table_sheet.write_row(0, 0, ATTENDANCE_TABLE_HEADER, bold)
+    table_sheet.set_column(0, 0, 22)
+    table_sheet.set_column(1, 1, 16)
+    table_sheet.set_column(2, 2, 9)
+    table_sheet.set_column(3, 3, 18)
+    table_sheet.set_column(4, 4, 8)
+    table_sheet.set_column(5, 7, 18)
+    table_sheet.freeze_panes(1, 0)
+    offset = (eastern_time_offset() if config.EXPORT_TIME_IN_EASTERN
+              else datetime.timedelta())
+    summary = {}
+    row_num = 0
+    for entry in attendance_logs:
+        if cancel.is_set():
+            return
+        for row in _attendance_rows(entry, entry.time + offset, summary):
+            row_num += 1
+            table_sheet.write_row(row_num, 0, row)
+        step()
+    table_sheet.autofilter(0, 0, row_num, len(ATTENDANCE_TABLE_HEADER) - 1)
+
+    percent = workbook.add_format({'num_format': '0%'})
+    summary_sheet.write_row(0, 0, ATTENDANCE_SUMMARY_HEADER, bold)
+    summary_sheet.set_column(0, 0, 18)
+    summary_sheet.set_column(1, 1, 8)
+    summary_sheet.set_column(2, 4, 18)
+    summary_sheet.set_column(5, 5, 10)
+    summary_sheet.set_column(6, 6, 10, percent)
+    summary_sheet.set_column(7, 7, 10)
+    summary_sheet.set_column(8, 9, 22)
+    summary_sheet.freeze_panes(1, 0)
+    raidticks = sum(1 for entry in attendance_logs if entry.raidtick)
+    row_num = 0
+    for row_num, row in enumerate(
+            _attendance_summary_rows(summary, raidticks), 1):
+        summary_sheet.write_row(row_num, 0, row)
+    summary_sheet.autofilter(
+        0, 0, row_num, len(ATTENDANCE_SUMMARY_HEADER) - 1)
+    step()
+
+
+def _write_attendance_sheets(workbook, attendance_logs, bold, cancel, step):
+    """Write each /who log to its own sheet
+
+    :return: False if a sheet couldn't be added
+    """
+    for entry in attendance_logs:
+        if cancel.is_set():
+            break
+        if config.EXPORT_TIME_IN_EASTERN:
+            time_str = (
+                    entry.time + eastern_time_offset()
+            ).strftime('%Y.%m.%d %I.%M.%S %p')
+        else:
+            time_str = entry.time.strftime('%Y.%m.%d %I.%M.%S %p')
+        worksheet_name = time_str
+        worksheet_name_append = 0
+        attendance_sheet = None
+        while attendance_sheet is None:
+            try:
+                if worksheet_name_append > 0:
+                    worksheet_name = "{0} ({1})".format(
+                        time_str, worksheet_name_append)
+                attendance_sheet = workbook.add_worksheet(worksheet_name)
+            except xlsxwriter.exceptions.DuplicateWorksheetName:
+                worksheet_name_append += 1
+            except xlsxwriter.exceptions.InvalidWorksheetName:
+                LOG.exception("Failed to add a sheet for %s.", time_str)
+                return False
+
+        attendance_sheet.write_row(
+            0, 0, ('name', 'level', 'class', 'guild'), bold)
+        attendance_sheet.set_column(0, 0, 18)
+        attendance_sheet.set_column(1, 1, 8)
+        attendance_sheet.set_column(2, 3, 18)
+        row_num = 1
+        for name, player_obj in list(entry.log.items()):
+            attendance_sheet.write_row(
+                row_num, 0,
+                (name,
+                 player_obj.level if player_obj.level != 0 else "",
+                 player_obj.pclass,
+                 player_obj.guild))
+            row_num += 1
+        attendance_sheet.autofilter(0, 0, row_num - 1, 3)
+        step()
+    return True
+
+
+def export_to_excel(filename, progress=None, cancel=None):
+    """Export auctions, kills, creditts, gratss and attendance
+
+    Rows are generated as they are written. With the attendance table the
+    workbook is also written out as it goes, so memory use stays flat
+    however much there is to export; a sheet per /who log is kept in
+    memory until it's saved, as each sheet would hold a file open.
+
+    :param progress: called with how many sheets are done, of how many
+    :param cancel: a threading.Event to stop the export early
+    :return: True if the file was written, False if it couldn't be, or
+        None if the export was cancelled
+    """
+    LOG.info("Exporting to Excel file: %s", filename)
+    cancel = cancel or threading.Event()
+
+    # Copy the lists, as they may change while they're being exported
+    with STATE_LOCK:
+        auctions = list(config.HISTORICAL_AUCTIONS.values())
+        kill_timers = list(config.KILL_TIMERS)
+        creditts = list(config.CREDITT_LOG)
+        gratss = list(config.GRATSS_LOG)
+        attendance_logs = list(config.ATTENDANCE_LOGS)
+    pages = (
+        ('Completed Auctions', _completed_auction_rows(auctions)),
+        ('Kill Times', _kill_time_rows(kill_timers)),
+        ('Creditt & Gratss', (
+            {'creditt/gratss': message} for message in itertools.chain(
+                _export_messages(creditts, config.MATCH_CREDITT),
+                _export_messages(gratss, config.MATCH_GRATSS)))),
+    )
+    attendance_logs = [entry for entry in attendance_logs if entry.log]
+    total = len(pages) + len(attendance_logs)
+    if config.EXPORT_ATTENDANCE_TABLE:
+        # and one for the summary
+        total += 1
+    done = 0
+
+    def step():
+        nonlocal done
+        done += 1
+        if progress:
+            progress(done, total)
+
+    # Set up the workbook; only the attendance table has few enough sheets
+    # to write out as it goes
+    workbook = _new_workbook(
+        filename, constant_memory=config.EXPORT_ATTENDANCE_TABLE)
+    try:
+        bold = workbook.add_format({'bold': True})
+
+        # Write "Basic Data" into the workbook
+        for page, rows in pages:
+            if cancel.is_set():
+                break
+            _write_table(workbook, page, rows, bold, cancel)
+            step()
+
+        # Write Attendance Logs
+        if config.EXPORT_ATTENDANCE_TABLE:
+            _write_attendance_table(
+                workbook, attendance_logs, bold, cancel, step)
+        elif not _write_attendance_sheets(
+                workbook, attendance_logs, bold, cancel, step):
+            _discard_workbook(workbook)
+            return False
+    except Exception:
+        _discard_workbook(workbook)
+        raise
+
+    # Save the workbook
+    return _close_workbook(workbook, filename, cancel)
+
+
+def export_async(export, filename, progress=None, done=None) -> bool:
+    """Run an export on its own thread
+
+    :param export: export_to_excel or export_to_eqdkp
+    :param progress: passed on to the export
+    :param done: called with the result of the export
+    Both are called from the export's thread.
+    :return: False if another export is still running
+    """
+    global EXPORT_THREAD, EXPORT_CANCEL  # pylint: disable=global-statement
+    if EXPORT_THREAD and EXPORT_THREAD.is_alive():
         return False
+    cancel = EXPORT_CANCEL = threading.Event()
+
+    def run():
+        try:
+            result = export(filename, progress=progress, cancel=cancel)
+        except Exception:
+            LOG.exception("Failed to export to %s.", filename)
+            result = False
+        if done:
+            done(result)
+
+    EXPORT_THREAD = threading.Thread(target=run, name="Export", daemon=True)
+    EXPORT_THREAD.start()
+    return True
+
+
+def cancel_export() -> None:
+    EXPORT_CANCEL.set()
 
 
 def parse_auction_for_loot_export(auction):
@@ -594,12 +1220,30 @@ def parse_auction_for_loot_export(auction):
 
 
 def parse_tick_for_export(wholog):
+    """The /who lines of a raidtick, as exported
+
+    Rendering them is kept on the tick, and reused until its players (see
+    WhoLog.changed), its name, its exported time or the alliance it's
+    restricted to change.
+    """
     tick_time = wholog.eqtime(allow_eastern=True)
+    alliance = (config.ALLIANCES[config.DEFAULT_ALLIANCE]
+                if config.RESTRICT_EXPORT else None)
+    settings = (tick_time, wholog.tick_name, alliance,
+                getattr(wholog.log, 'version', None))
+    cached = wholog.export_cache
+    if cached is not None and cached[0] == settings:
+        return list(cached[1])
+    tick_lines = _render_tick(wholog.log, tick_time, alliance)
+    wholog.export_cache = (settings, tuple(tick_lines))
+    return tick_lines
+
+
+def _render_tick(log, tick_time, alliance):
     tick_lines = []
-    for member, player_obj in wholog.log.items():
+    for member, player_obj in log.items():
         guild = player_obj.guild
-        if config.RESTRICT_EXPORT and guild not in \
-                config.ALLIANCES[config.DEFAULT_ALLIANCE]:
+        if alliance is not None and guild not in alliance:
             continue
         level_class = None
         if player_obj.level:
@@ -613,49 +1257,46 @@ def parse_tick_for_export(wholog):
     return tick_lines
 
 
-def export_to_eqdkp(filename):
-    LOG.info("Exporting to EQDKP file: %s", filename)
+def export_to_eqdkp(filename, progress=None, cancel=None):
+    """Export raidticks, creditts, gratss and loot for EQDKPlus
 
-    # Recreate /who lines for each recorded raidtick
-    raidtick_logs = []
-    for wholog in config.ATTENDANCE_LOGS:
-        if wholog.raidtick:
-            tick_lines = parse_tick_for_export(wholog)
-            if tick_lines:
-                raidtick_logs.append((wholog.tick_name, tick_lines))
+    Each raidtick gets a sheet of the /who lines it was made from, followed
+    by the creditts and loots that go with it. Tick lines are generated as
+    each sheet is written. Creditts and loots are added to the tick sheets
+    after all of them are made, and there is a sheet per raidtick, so the
+    workbook is kept in memory until it's saved.
+
+    :param progress: called with how many steps are done, of how many
+    :param cancel: a threading.Event to stop the export early
+    :return: True if the file was written, False if it couldn't be, or
+        None if the export was cancelled
+    """
+    LOG.info("Exporting to EQDKP file: %s", filename)
+    cancel = cancel or threading.Event()
+
+    # Copy the lists, as they may change while they're being exported
+    with STATE_LOCK:
+        raidticks = [wholog for wholog in config.ATTENDANCE_LOGS
+                     if wholog.raidtick]
+        creditts = list(config.CREDITT_LOG)
+        gratss = list(config.GRATSS_LOG)
+        auctions = list(config.HISTORICAL_AUCTIONS.values())
+    total = len(raidticks) + 2
+    done = 0
 
     # Get all raw creditt/gratss messages
-    creditt_messages = []
-    for message in config.CREDITT_LOG:
-        adjusted_message = message.raw_message
-        if config.EXPORT_TIME_IN_EASTERN:
-            m = config.MATCH_CREDITT.match(adjusted_message)
-            time_part = m.groupdict()['time']
-            new_time = datetime_to_eq_format(
-                datetime_from_eq_format(time_part, allow_eastern=False))
-            adjusted_message = adjusted_message.replace(time_part, new_time)
-        creditt_messages.append(adjusted_message)
-    gratss_messages = []
-    for message in config.GRATSS_LOG:
-        adjusted_message = message.raw_message
-        if config.EXPORT_TIME_IN_EASTERN:
-            m = config.MATCH_GRATSS.match(adjusted_message)
-            time_part = m.groupdict()['time']
-            new_time = datetime_to_eq_format(
-                datetime_from_eq_format(time_part, allow_eastern=False))
-            adjusted_message = adjusted_message.replace(time_part, new_time)
-        gratss_messages.append(adjusted_message)
+    creditt_messages = list(_export_messages(creditts, config.MATCH_CREDITT))
+    gratss_messages = list(_export_messages(gratss, config.MATCH_GRATSS))
 
     # Assemble all recorded loots into parsable format
     closed_loots = []
-    for auction in config.HISTORICAL_AUCTIONS.values():
+    for auction in auctions:
         loot_text = parse_auction_for_loot_export(auction)
         if loot_text:
             closed_loots.append(loot_text)
 
     # Set up the workbook
-    workbook = xlsxwriter.Workbook(
-        filename, {'default_date_format': 'm/d/yyyy h:mm:ss AM/PM'})
+    workbook = _new_workbook(filename)
     sheets = collections.OrderedDict()
     sheet_rows = {}
 
@@ -665,11 +1306,21 @@ def export_to_eqdkp(filename):
         creditt_sheet.write_string(row, 0, creditt)
     for row, gratss in enumerate(gratss_messages):
         creditt_sheet.write_string(len(creditt_messages) + row + 1, 0, gratss)
-
-    # Create a page per raidtick
-    for tick_name, tick in raidtick_logs:
-        tick_timestamp = re.match(config.TIMESTAMP, tick[0]).group('time')
-        parsed_time = datetime_from_eq_format(tick_timestamp)
+    done += 1
+    if progress:
+        progress(done, total)
+
+    # Create a page per raidtick, recreating its /who lines
+    renamed = {}
+    for wholog in raidticks:
+        if cancel.is_set():
+            return _close_workbook(workbook, filename, cancel)
+        tick = parse_tick_for_export(wholog)
+        done += 1
+        if not tick:
+            continue
+        tick_name = wholog.tick_name
+        parsed_time = _export_line_time(tick[0])
         alt_sheet_name = parsed_time.strftime('%Y.%m.%d %I.%M.%S %p')
         if tick_name:
             sheet_name = tick_name[:32]
@@ -679,11 +1330,8 @@ def export_to_eqdkp(filename):
             sheet_name = sheet_name.replace('*', '')
         else:
             sheet_name = alt_sheet_name
-        while sheet_name in workbook.sheetnames:
-            if sheet_name[-1] in map(str, range(10)):
-                sheet_name = sheet_name[:-1] + str(int(sheet_name[-1]) + 1)
-            else:
-                sheet_name += " 2"
+        sheet_name = _unused_sheet_name(sheet_name, workbook.sheetnames,
+                                        renamed)
         try:
             worksheet = workbook.add_worksheet(sheet_name)
         except xlsxwriter.exceptions.InvalidWorksheetName:
@@ -692,77 +1340,120 @@ def export_to_eqdkp(filename):
         # Write /who logs
         for row, line in enumerate(tick):
             worksheet.write_string(row, 0, line)
-            sheet_rows[sheet_name] = row + 1
+        sheet_rows[worksheet] = len(tick)
+        if progress:
+            progress(done, total)
+    tick_times = list(sheets)
+    tick_sheets = list(sheets.values())
     # If there weren't any ticks, just make one sheet to hold loot
+    loot_sheet = None
     if not sheets and closed_loots:
-        sheets["Loot"] = workbook.add_worksheet("Loot")
-        sheet_rows["Loot"] = -1
-    try:
-        first_sheet = list(sheets.values())[0]
-        last_sheet = list(sheets.values())[-1]
-    except IndexError:
-        first_sheet = last_sheet = creditt_sheet
-
-    # Loop through sheets and add creditts to them
-    for sheet_timestamp in reversed(sheets):
-        if sheet_timestamp == "Loot":
-            continue
-        sheet = sheets[sheet_timestamp]
-        # Write creditts after each tick, working backwards
-        for creditt in creditt_messages.copy():
-            cred_timestamp = re.match(config.TIMESTAMP, creditt).group('time')
-            parsed_time = datetime_from_eq_format(cred_timestamp)
-            if parsed_time > sheet_timestamp:
-                sheet_rows[sheet.name] += 1
-                sheet.write_string(sheet_rows[sheet.name], 0, creditt)
-                creditt_messages.remove(creditt)
-
-    # Write any remaining creditts to the first sheet -- do we want this?
-    for creditt in creditt_messages:
-        if first_sheet.name == "Loot":
-            break
-        sheet_rows[first_sheet.name] += 1
-        first_sheet.write_string(sheet_rows[first_sheet.name], 0, creditt)
-
-    # Loop through sheets and add loots to them
-    if config.TICK_BEFORE_LOOT:
-        for sheet_timestamp in reversed(sheets):
-            sheet = sheets[sheet_timestamp]
-            # Write loots after each tick, working backwards
-            for loot in closed_loots.copy():
-                loot_timestamp = re.match(config.TIMESTAMP, loot).group('time')
-                parsed_time = datetime_from_eq_format(loot_timestamp)
-                if sheet_timestamp == "Loot" or parsed_time > sheet_timestamp:
-                    sheet_rows[sheet.name] += 1
-                    sheet.write_string(sheet_rows[sheet.name], 0, loot)
-                    closed_loots.remove(loot)
-        # Write any remaining loots to the earliest sheet
-        first_sheet = list(sheets.values())[0]
-        for loot in closed_loots:
-            sheet_rows[first_sheet.name] += 1
-            first_sheet.write_string(sheet_rows[first_sheet.name], 0, loot)
-    else:
-        for sheet_timestamp in sheets:
-            sheet = sheets[sheet_timestamp]
-            # Write loots to the current sheet
-            for loot in closed_loots.copy():
-                loot_timestamp = re.match(config.TIMESTAMP, loot).group('time')
-                parsed_time = datetime_from_eq_format(loot_timestamp)
-                if sheet_timestamp == "Loot" or parsed_time < sheet_timestamp:
-                    sheet_rows[sheet.name] += 1
-                    sheet.write_string(sheet_rows[sheet.name], 0, loot)
-                    closed_loots.remove(loot)
-        # Write any remaining loots to the last sheet
-        for loot in closed_loots:
-            sheet_rows[last_sheet.name] += 1
-            last_sheet.write_string(sheet_rows[last_sheet.name], 0, loot)
+        loot_sheet = workbook.add_worksheet("Loot")
+        sheet_rows[loot_sheet] = -1
+
+    def write_lines(sheet, lines):
+        for line in lines:
+            sheet_rows[sheet] += 1
+            sheet.write_string(sheet_rows[sheet], 0, line)
+
+    # Write creditts after the tick before them, and any before the first
+    # tick to the first sheet -- do we want this?
+    if tick_sheets:
+        placed, unplaced = _place_by_time(
+            creditt_messages, tick_times, after=True)
+        for sheet, lines in reversed(list(zip(tick_sheets, placed))):
+            write_lines(sheet, lines)
+        write_lines(tick_sheets[0], unplaced)
+
+    # Write loots after the tick before them, and any before the first tick
+    # to the first sheet, or else before the tick after them, and any after
+    # the last tick to the last sheet
+    if loot_sheet:
+        write_lines(loot_sheet, closed_loots)
+    elif tick_sheets and config.TICK_BEFORE_LOOT:
+        placed, unplaced = _place_by_time(
+            closed_loots, tick_times, after=True)
+        for sheet, lines in reversed(list(zip(tick_sheets, placed))):
+            write_lines(sheet, lines)
+        write_lines(tick_sheets[0], unplaced)
+    elif tick_sheets:
+        placed, unplaced = _place_by_time(
+            closed_loots, tick_times, after=False)
+        for sheet, lines in zip(tick_sheets, placed):
+            write_lines(sheet, lines)
+        write_lines(tick_sheets[-1], unplaced)
+    if progress:
+        progress(total, total)
 
     # Save the workbook
-    try:
-        workbook.close()
-        return True
-    except xlsxwriter.exceptions.FileCreateError:
-        return False
+    return _close_workbook(workbook, filename, cancel)
+
+
+def _export_line_time(line):
+    """The time of an exported log line, to match it up with ticks"""
+    return datetime_from_eq_format(
+        re.match(config.TIMESTAMP, line).group('time'))
+
+
+def _unused_sheet_name(sheet_name, sheetnames, renamed):
+    """Rename a sheet until its name isn't taken
+
+    The last digit of the name is counted up, or " 2" is added. Names are
+    only ever added, so `renamed` remembers how far each name got and the
+    next duplicate carries on from there, rather than trying every name
+    again.
+    """
+    original = sheet_name
+    sheet_name = renamed.get(original, sheet_name)
+    while sheet_name in sheetnames:
+        if sheet_name[-1] in map(str, range(10)):
+            sheet_name = sheet_name[:-1] + str(int(sheet_name[-1]) + 1)
+        else:
+            sheet_name += " 2"
+    renamed[original] = sheet_name
+    return sheet_name
+
+
+def _place_by_time(lines, tick_times, after):
+    """Match log lines up with the tick sheets they belong on
+
+    Each line's time is parsed once. Then the lines and ticks are both
+    sorted by time and walked through together. With `after`, a line goes
+    to the last listed tick earlier than it, otherwise to the first listed
+    tick later than it. Ticks are normally listed in order of time, so this
+    is the tick just before or after the line.
+
+    :return: the lines for each tick, in their original order, and the lines
+        with no tick to go to
+    """
+    times = [_export_line_time(line) for line in lines]
+    by_time = sorted(range(len(tick_times)), key=tick_times.__getitem__)
+    place = [None] * len(lines)
+    tick = None
+    if after:
+        ticks = iter(by_time)
+        next_tick = next(ticks, None)
+        for ndx in sorted(range(len(lines)), key=times.__getitem__):
+            while (next_tick is not None and
+                   tick_times[next_tick] < times[ndx]):
+                tick = next_tick if tick is None else max(tick, next_tick)
+                next_tick = next(ticks, None)
+            place[ndx] = tick
+    else:
+        ticks = reversed(by_time)
+        next_tick = next(ticks, None)
+        for ndx in sorted(range(len(lines)), key=times.__getitem__,
+                          reverse=True):
+            while (next_tick is not None and
+                   tick_times[next_tick] > times[ndx]):
+                tick = next_tick if tick is None else min(tick, next_tick)
+                next_tick = next(ticks, None)
+            place[ndx] = tick
+    placed = [[] for _ in tick_times]
+    unplaced = []
+    for line, tick in zip(lines, place):
+        (unplaced if tick is None else placed[tick]).append(line)
+    return placed, unplaced
 
 
 def fetch_google_sheet_data(url):
@@ -844,8 +1535,100 @@ def add_sample_data():
     config.PENDING_AUCTIONS.append(platinum_disc2)
 
 
+def pack_attendance(attendance_logs: list,
+                    writer: detail.RecordWriter = None) -> dict:
+    """Pack attendance logs so that each player is only stored once.
+
+    Ticks refer to players by their id in a shared table. A reference only
+    carries the player's class, level or guild when it differs from the
+    table, e.g. after they levelled during the raid. With a `writer`, each
+    tick's players are stored as a record instead, and the tick only keeps
+    a reference to it with the player count for each guild.
+    """
+    player_ids = {}
+    players = []
+    ticks = []
+    for who_log in attendance_logs:
+        tick = who_log.to_json()
+        del tick['json_type']
+        if writer is not None and who_log.log:
+            tick['log'] = writer.store(who_log.log,
+                                       who_log.detail_summary())
+            ticks.append(tick)
+            continue
+        refs = []
+        for name, player in who_log.log.items():
+            player_id = player_ids.get(name)
+            if player_id is None:
+                player_id = player_ids[name] = len(players)
+                players.append(
+                    [name, player.pclass, player.level, player.guild])
+            entry = players[player_id]
+            changed = {field: getattr(player, field)
+                       for index, field in enumerate(ATTENDANCE_FIELDS)
+                       if getattr(player, field) != entry[index]}
+            refs.append([player_id, changed] if changed else player_id)
+        tick['log'] = refs
+        ticks.append(tick)
+    return {
+        'version': ATTENDANCE_FORMAT_VERSION,
+        'players': players,
+        'ticks': ticks,
+    }
+
+
+def unpack_attendance(packed: dict) -> list:
+    if packed.get('version') not in (1, ATTENDANCE_FORMAT_VERSION):
+        raise ValueError("Unknown attendance format version: %s" %
+                         packed.get('version'))
+    players = packed['players']
+    attendance_logs = []
+    for tick in packed['ticks']:
+        if isinstance(tick['log'], detail.LazyDict):
+            attendance_logs.append(models.WhoLog.from_json(**tick))
+            continue
+        log = {}
+        for ref in tick['log']:
+            changed = None
+            if isinstance(ref, list):
+                ref, changed = ref
+            if changed:
+                player = models.Player(*players[ref])
+                for field, value in changed.items():
+                    setattr(player, field, value)
+                player = models.PlayerSnapshot.of(player)
+            else:
+                player = models.PlayerSnapshot(*players[ref])
+            log[player.name] = player
+        tick['log'] = log
+        attendance_logs.append(models.WhoLog.from_json(**tick))
+    return attendance_logs
+
+
+def pack_auctions(auctions: dict, writer: detail.RecordWriter) -> dict:
+    """Store the bid ledger or rolls of each auction as a record."""
+    packed = {}
+    for uuid, auction in auctions.items():
+        auction_json = auction.to_json()
+        if isinstance(auction, models.DKPAuction):
+            # The bids are rebuilt from the ledger, but are still written
+            # for older versions, which only know about those
+            history = auction.bids.stored_history()
+            if not isinstance(history, detail.LazyDict):
+                history = dict(enumerate(history))
+            auction_json['ledger'] = writer.store(history,
+                                                  auction.detail_summary())
+        else:
+            auction_json['rolls'] = writer.store(auction.rolls,
+                                                 auction.detail_summary())
+        packed[uuid] = auction_json
+    return packed
+
+
 class JSONEncoder(json.JSONEncoder):
     def default(self, o):  # pylint: disable=arguments-differ
+        if isinstance(o, (detail.LazyDict, models.BidLedger)):
+            return dict(o)
         try:
             return o.to_json()
         except AttributeError:
@@ -854,23 +1637,26 @@ class JSONEncoder(json.JSONEncoder):
             return json.JSONEncoder.default(self, o)
 
 
+# Types that can be restored from the `json_type` tag written by to_json
+MODEL_TYPES = {
+    name: model for name, model in inspect.getmembers(models, inspect.isclass)
+    if issubclass(model, models.DictEquals)
+}
+
+
 # Mutated from https://github.com/AlexisGomes/JsonEncoder/
 class JSONDecoder(json.JSONDecoder):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, records: detail.RecordFile = None, **kwargs):
+        self.records = records
         json.JSONDecoder.__init__(
             self, object_hook=self.object_hook, *args, **kwargs)
 
     def object_hook(self, obj):  # pylint: disable=method-hidden
-        if isinstance(obj, dict):
-            if 'json_type' in obj:
-                json_type = obj.pop('json_type')
-                model_type = getattr(models, json_type)
-                if model_type and issubclass(model_type, models.DictEquals):
-                    return model_type.from_json(**obj)
-
-        # handling the resolution of nested objects
-        if isinstance(obj, dict):
-            for key in list(obj):
-                obj[key] = self.object_hook(obj[key])
-
-        return obj
+        # json calls this for the innermost objects first, so any nested
+        # models have already been restored by the time a parent is seen
+        json_type = obj.pop('json_type', None)
+        if json_type is None:
+            return obj
+        if json_type == detail.REF_TYPE:
+            return detail.LazyDict(self.records, **obj)
+        return MODEL_TYPES[json_type].from_json(**obj)
@@ -20,6 +20,7 @@ a.datas += [(filename, filename, '.') for filename in glob('data/icons/*')]
 a.datas += [(filename, filename, '.') for filename in glob('data/sounds/*.mp3')]
 a.datas += [('data/items.json', 'data/items.json', '.')]
 a.datas += [('data/spells.json', 'data/spells.json', '.')]
+a.datas += [('data/group_templates.ini', 'data/group_templates.ini', '.')]
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 from ninjalooter import config
 CONSOLE_BUILD = bool(config.SEMVER.build)